@@ -14,14 +14,29 @@ def create_app():
     
     # Create standalone SQLAlchemy engine
     DATABASE_URL = (
-        f"postgresql+psycopg2://{Config.SUPABASE_USER}:{Config.SUPABASE_PASSWORD}@"
+        f"postgresql+psycopg2://{Config.SUPABASE_USER}:{Config.require('SUPABASE_PASSWORD')}@"
         f"{Config.SUPABASE_HOST}:{Config.SUPABASE_PORT}/{Config.SUPABASE_DBNAME}"
     )
     engine = create_engine(DATABASE_URL, pool_pre_ping=True, pool_size=10, max_overflow=20)
     
-    # Import and register routes, passing the engine
+    # Gemini and S3 clients are built on first use, not at worker boot
+    from services.registry import ServiceRegistry, set_registry
+    from services.gemini_service import create_gemini_client
+    from services.image_service import create_s3_client, create_s3_transfer_config
+    from services.derivative_service import create_image_process_pool
+    services = ServiceRegistry()
+    services.register('gemini', create_gemini_client)
+    services.register('s3', create_s3_client)
+    services.register('s3_transfer', create_s3_transfer_config)
+    services.register('image_pool', create_image_process_pool)
+    set_registry(services)
+    app.extensions['services'] = services
+
+    # Import and register routes and CLI commands, passing the engine
     from routes import init_routes
+    from commands import init_commands
     init_routes(app, engine)
+    init_commands(app, engine)
     
     return app
 
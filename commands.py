@@ -0,0 +1,140 @@
+import subprocess
+import sys
+import click
+from config import Config
+from services.backfill_service import backfill_explanations
+from services.derivative_service import generate_missing_derivatives
+from services.explanation_service import recover_explanation_jobs
+from services.catalog_service import refresh_image_source_aliases
+from services.question_service import (
+    invalidate_question_details, invalidate_questions_details, rebuild_question_consensus, recompute_consensus
+)
+from services.search_service import rebuild_search_index
+
+# Modules that must stay out of worker boot; they are imported on first use
+LAZY_MODULES = ('google.genai', 'boto3')
+
+
+def _measure_import_time(module):
+    """Import `module` in a fresh interpreter under -X importtime and parse the report."""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise click.ClickException(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+    timings = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = (part for part in line.replace('import time:', '|', 1).split('|'))
+        timings.append({
+            'name': name.strip(),
+            'top_level': not name[1:].startswith(' '),
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us)
+        })
+    return timings
+
+
+def init_commands(app, engine):
+    @app.cli.command('rebuild-consensus')
+    def rebuild_consensus_command():
+        """Recompute the question_consensus summary for every question."""
+        result = rebuild_question_consensus(engine)
+        if 'error' in result:
+            raise click.ClickException(result['error'])
+        click.echo(f"Rebuilt consensus for {result['rebuilt']} questions")
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Rebuild question_search documents for every question."""
+        result = rebuild_search_index(engine)
+        if 'error' in result:
+            raise click.ClickException(result['error'])
+        click.echo(f"Indexed {result['indexed']} questions")
+
+    @app.cli.command('rebuild-image-aliases')
+    def rebuild_image_aliases_command():
+        """Map question file paths to extracted_images source files now instead of on the next lookup."""
+        count = refresh_image_source_aliases(engine)
+        click.echo(f"Image source aliases cover {count} names")
+
+    @app.cli.command('recompute-consensus')
+    @click.option('--apply', 'apply_changes', is_flag=True, help='Write the new statuses (default is a dry run).')
+    @click.option('--verified-ratio', type=float, help='Share of agreeing models for verified.')
+    @click.option('--likely-ratio', type=float, help='Share of agreeing models above which a question is likely_correct.')
+    @click.option('--incorrect-ratio', type=float, help='Share of agreeing models at or below which a question is incorrect.')
+    def recompute_consensus_command(apply_changes, verified_ratio, likely_ratio, incorrect_ratio):
+        """Reclassify every question from its verification results."""
+        overrides = {
+            key: value for key, value in (
+                ('verified', verified_ratio),
+                ('likely_correct', likely_ratio),
+                ('incorrect', incorrect_ratio)
+            ) if value is not None
+        }
+        result = recompute_consensus(engine, overrides, dry_run=not apply_changes)
+        if 'error' in result:
+            raise click.ClickException(result['error'])
+        click.echo(f"{'Dry run' if result['dry_run'] else 'Applied'}: "
+                   f"{result['changed']} of {result['total']} questions change status")
+        for transition in result['transitions']:
+            click.echo(f"  {transition['from']} -> {transition['to']}: {transition['count']}")
+        click.echo("Timings: " + ", ".join(f"{key}={value}" for key, value in result['timings'].items()))
+
+    @app.cli.command('backfill-explanations')
+    @click.option('--chunk-size', default=100, show_default=True, help='Questions selected and written per batch.')
+    @click.option('--concurrency', default=4, show_default=True, help='Concurrent model calls.')
+    @click.option('--rate', default=5.0, show_default=True, help='Maximum model calls per second (0 for unlimited).')
+    @click.option('--max-retries', default=5, show_default=True, help='Retries per question with exponential backoff.')
+    @click.option('--limit', type=int, help='Stop after this many questions.')
+    @click.option('--restart', is_flag=True, help='Ignore the saved checkpoint and start from the first question.')
+    def backfill_explanations_command(chunk_size, concurrency, rate, max_retries, limit, restart):
+        """Generate explanations for every question that has none, resuming from the last checkpoint."""
+        stats = backfill_explanations(
+            engine, chunk_size=chunk_size, concurrency=concurrency, rate=rate,
+            max_retries=max_retries, restart=restart, limit=limit,
+            on_written=invalidate_questions_details
+        )
+        click.echo(f"Processed {stats['processed']} questions in {stats['elapsed_s']}s "
+                   f"({stats['per_second']} questions/s): {stats['written']} written, "
+                   f"{stats['failed']} failed, {stats['skipped']} skipped without a correct choice")
+        click.echo(f"Checkpoint at question {stats['last_id']}")
+
+    @app.cli.command('recover-explanation-jobs')
+    def recover_explanation_jobs_command():
+        """Requeue explanation jobs left pending by a stopped worker; run after a restart or deploy."""
+        stats = recover_explanation_jobs(engine, on_written=invalidate_question_details)
+        # Requeued jobs run on this process's executor, which finishes them before exit
+        click.echo(f"Requeued {stats['requeued']} stale explanation jobs, failed {stats['failed']} "
+                   f"too old to retry, {stats['superseded']} no longer needed")
+
+    @app.cli.command('check-import-time')
+    @click.option('--module', default='app', show_default=True, help='Module to import cold.')
+    @click.option('--budget-ms', type=int, default=Config.IMPORT_TIME_BUDGET_MS, show_default=True,
+                  help='Fail when the cold import takes longer than this.')
+    @click.option('--top', default=10, show_default=True, help='Slowest imports to list.')
+    def check_import_time_command(module, budget_ms, top):
+        """Fail if a cold import of the app exceeds the budget or loads a lazy-only module."""
+        timings = _measure_import_time(module)
+        total_ms = sum(item['cumulative_us'] for item in timings if item['top_level']) / 1000
+        click.echo(f"Cold import of {module}: {total_ms:.0f}ms (budget {budget_ms}ms)")
+        for item in sorted(timings, key=lambda item: item['self_us'], reverse=True)[:top]:
+            click.echo(f"  {item['self_us'] / 1000:8.1f}ms  {item['name']}")
+
+        eager = sorted({item['name'] for item in timings
+                        if any(item['name'] == lazy or item['name'].startswith(lazy + '.') for lazy in LAZY_MODULES)})
+        if eager:
+            raise click.ClickException(f"Imported at boot but should be lazy: {', '.join(eager)}")
+        if total_ms > budget_ms:
+            raise click.ClickException(f"Import time {total_ms:.0f}ms exceeds the {budget_ms}ms budget")
+
+    @app.cli.command('generate-image-derivatives')
+    @click.option('--limit', type=int, help='Process at most this many images.')
+    @click.option('--retry-failed', is_flag=True, help='Also retry images whose previous attempt failed.')
+    def generate_image_derivatives_command(limit, retry_failed):
+        """Create thumbnails and WebP copies for extracted images that have none."""
+        stats = generate_missing_derivatives(engine, limit=limit, retry_failed=retry_failed)
+        click.echo(f"Processed {stats['total']} images in {stats['elapsed_s']}s: "
+                   f"{stats['done']} done, {stats['failed']} failed, {stats['skipped']} skipped")
@@ -9,19 +9,66 @@ class Config:
     SUPABASE_PORT = os.environ.get("SUPABASE_PORT")
     SUPABASE_DBNAME = os.environ.get("SUPABASE_DBNAME")
     GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
+    GEMINI_BASE_URL = os.environ.get("GEMINI_BASE_URL")
     AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
     AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
     AWS_REGION = os.environ.get('AWS_REGION')
     S3_BUCKET = os.environ.get('S3_BUCKET')
     CLOUDFRONT_DOMAIN = os.environ.get('CLOUDFRONT_DOMAIN')
-
-    if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY is not set")
-    if not SUPABASE_PASSWORD:
-        raise ValueError("SUPABASE_PASSWORD is not set")
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')
+    # S3 connection pool and multipart upload tuning
+    S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS', 20))
+    S3_MULTIPART_THRESHOLD_MB = int(os.environ.get('S3_MULTIPART_THRESHOLD_MB', 8))
+    S3_MULTIPART_CHUNKSIZE_MB = int(os.environ.get('S3_MULTIPART_CHUNKSIZE_MB', 8))
+    S3_MAX_CONCURRENCY = int(os.environ.get('S3_MAX_CONCURRENCY', 4))
+    # Presigned browser uploads: seconds the form stays valid and the largest accepted file
+    S3_UPLOAD_EXPIRY = int(os.environ.get('S3_UPLOAD_EXPIRY', 300))
+    MAX_IMAGE_UPLOAD_MB = int(os.environ.get('MAX_IMAGE_UPLOAD_MB', 10))
+    # Image derivatives: I/O threads, resizing processes, thumbnail width in pixels and WebP quality
+    IMAGE_DERIVATIVE_WORKERS = int(os.environ.get('IMAGE_DERIVATIVE_WORKERS', 4))
+    IMAGE_PROCESS_WORKERS = int(os.environ.get('IMAGE_PROCESS_WORKERS', 2))
+    THUMBNAIL_WIDTH = int(os.environ.get('THUMBNAIL_WIDTH', 320))
+    WEBP_QUALITY = int(os.environ.get('WEBP_QUALITY', 80))
+    # Seconds between checks for imports that make the image source aliases stale
+    IMAGE_ALIAS_CHECK_INTERVAL = float(os.environ.get('IMAGE_ALIAS_CHECK_INTERVAL', 30))
+    # Postgres text search configuration used for question_search documents
+    SEARCH_TEXT_CONFIG = os.environ.get('SEARCH_TEXT_CONFIG', 'simple')
+    # Server-side question details cache
+    DETAILS_CACHE_SIZE = int(os.environ.get('DETAILS_CACHE_SIZE', 2048))
+    DETAILS_CACHE_TTL = int(os.environ.get('DETAILS_CACHE_TTL', 60))
+    # Optional second cache tier shared by all workers: sqlite:///path/to/cache.db or redis://host:6379/0
+    SHARED_CACHE_URL = os.environ.get('SHARED_CACHE_URL')
+    SHARED_CACHE_PREFIX = os.environ.get('SHARED_CACHE_PREFIX', 'consensus-dashboard')
+    # Background Gemini explanation jobs per worker process
+    EXPLANATION_WORKERS = int(os.environ.get('EXPLANATION_WORKERS', 4))
+    # Seconds a pending or running explanation job may go untouched before it is
+    # treated as orphaned and requeued, and the age after which it is failed instead
+    EXPLANATION_JOB_TIMEOUT = int(os.environ.get('EXPLANATION_JOB_TIMEOUT', 120))
+    EXPLANATION_JOB_MAX_AGE = int(os.environ.get('EXPLANATION_JOB_MAX_AGE', 3600))
+    # In-process entries in front of the explanation_cache table
+    EXPLANATION_CACHE_SIZE = int(os.environ.get('EXPLANATION_CACHE_SIZE', 1024))
+    # Share of agreeing models required for each consensus status
+    CONSENSUS_VERIFIED_RATIO = float(os.environ.get('CONSENSUS_VERIFIED_RATIO', 1.0))
+    CONSENSUS_LIKELY_RATIO = float(os.environ.get('CONSENSUS_LIKELY_RATIO', 0.5))
+    CONSENSUS_INCORRECT_RATIO = float(os.environ.get('CONSENSUS_INCORRECT_RATIO', 0.0))
+    # Statuses set by reviewers that a consensus recompute must not overwrite
+    CONSENSUS_PROTECTED_STATUSES = tuple(
+        status.strip() for status in os.environ.get('CONSENSUS_PROTECTED_STATUSES', 'corrected').split(',')
+        if status.strip()
+    )
+    # Upper bound for `flask check-import-time`
+    IMPORT_TIME_BUDGET_MS = int(os.environ.get('IMPORT_TIME_BUDGET_MS', 1500))
 
     SQLALCHEMY_DATABASE_URI = (
         f"postgresql+psycopg2://{SUPABASE_USER}:{SUPABASE_PASSWORD}@"
         f"{SUPABASE_HOST}:{SUPABASE_PORT}/{SUPABASE_DBNAME}"
     )
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    @classmethod
+    def require(cls, name):
+        """Return a setting, raising only when a feature that needs it is actually used."""
+        value = getattr(cls, name)
+        if not value:
+            raise ValueError(f"{name} is not set")
+        return value
\ No newline at end of file
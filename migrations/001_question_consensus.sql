@@ -0,0 +1,10 @@
+-- One summary row per enhanced question so list queries do not aggregate
+-- verification_results on every request. Maintained by update_question;
+-- run `flask rebuild-consensus` after importing new verification results.
+CREATE TABLE IF NOT EXISTS question_consensus (
+    question_id INTEGER PRIMARY KEY REFERENCES enhanced_questions(id) ON DELETE CASCADE,
+    models_count INTEGER NOT NULL DEFAULT 0,
+    matching_models INTEGER NOT NULL DEFAULT 0,
+    consensus_status TEXT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
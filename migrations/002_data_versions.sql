@@ -0,0 +1,33 @@
+-- Monotonic counters bumped by triggers whenever imported data changes, so
+-- the app can cache derived data and hand out ETags without rescanning.
+CREATE TABLE IF NOT EXISTS data_versions (
+    name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO data_versions (name) VALUES ('file_catalog') ON CONFLICT (name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE data_versions
+    SET version = version + 1, updated_at = NOW()
+    WHERE name = TG_ARGV[0];
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS questions_file_catalog_version ON questions;
+CREATE TRIGGER questions_file_catalog_version
+    AFTER INSERT OR DELETE OR TRUNCATE OR UPDATE OF file_path ON questions
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('file_catalog');
+
+DROP TRIGGER IF EXISTS duplicates_file_catalog_version ON duplicates;
+CREATE TRIGGER duplicates_file_catalog_version
+    AFTER INSERT OR DELETE OR TRUNCATE OR UPDATE OF file_path, representative_id ON duplicates
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('file_catalog');
+
+DROP TRIGGER IF EXISTS enhanced_questions_file_catalog_version ON enhanced_questions;
+CREATE TRIGGER enhanced_questions_file_catalog_version
+    AFTER INSERT OR DELETE OR TRUNCATE OR UPDATE OF question_id ON enhanced_questions
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('file_catalog');
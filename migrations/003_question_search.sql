@@ -0,0 +1,19 @@
+-- Search document per enhanced question covering the enhanced text, the
+-- original text and every duplicate's text. Maintained by update_question
+-- and, for imports, by the insert triggers in 010_question_search_sync.sql.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE TABLE IF NOT EXISTS question_search (
+    question_id INTEGER PRIMARY KEY REFERENCES enhanced_questions(id) ON DELETE CASCADE,
+    search_text TEXT NOT NULL DEFAULT '',
+    document TSVECTOR NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Ranked full-text search (/api/search)
+CREATE INDEX IF NOT EXISTS question_search_document_idx
+    ON question_search USING GIN (document);
+
+-- Substring filtering (ILIKE) for the question list
+CREATE INDEX IF NOT EXISTS question_search_text_trgm_idx
+    ON question_search USING GIN (search_text gin_trgm_ops);
@@ -0,0 +1,14 @@
+-- Background explanation generation queued by update_question. Rows are
+-- shared across workers so any of them can answer status polls.
+CREATE TABLE IF NOT EXISTS explanation_jobs (
+    id TEXT PRIMARY KEY,
+    question_id INTEGER NOT NULL REFERENCES enhanced_questions(id) ON DELETE CASCADE,
+    status TEXT NOT NULL DEFAULT 'pending',
+    explanation TEXT,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS explanation_jobs_question_idx
+    ON explanation_jobs (question_id, created_at DESC);
@@ -0,0 +1,8 @@
+-- Generated explanations keyed by a SHA-256 of (model, prompt template,
+-- question text, choices, correct answer) so identical requests reuse them.
+CREATE TABLE IF NOT EXISTS explanation_cache (
+    cache_key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    explanation TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,9 @@
+-- Progress of resumable batch jobs such as `flask backfill-explanations`.
+CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+    name TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL DEFAULT 0,
+    processed INTEGER NOT NULL DEFAULT 0,
+    written INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
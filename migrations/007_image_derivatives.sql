@@ -0,0 +1,17 @@
+-- Thumbnails and WebP variants generated for each original image, keyed by
+-- the original's URL so extracted_images and uploaded question images share it.
+CREATE TABLE IF NOT EXISTS image_derivatives (
+    source_url TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending',
+    width INTEGER,
+    height INTEGER,
+    bytes BIGINT,
+    thumbnail_url TEXT,
+    thumbnail_width INTEGER,
+    thumbnail_height INTEGER,
+    thumbnail_bytes BIGINT,
+    webp_url TEXT,
+    webp_bytes BIGINT,
+    error TEXT,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
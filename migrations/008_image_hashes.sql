@@ -0,0 +1,10 @@
+-- Content index of uploaded question images: identical bytes reuse the
+-- first upload's object and URL instead of being stored again.
+CREATE TABLE IF NOT EXISTS image_hashes (
+    sha256 TEXT PRIMARY KEY,
+    s3_key TEXT NOT NULL,
+    image_url TEXT NOT NULL,
+    bytes BIGINT,
+    content_type TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
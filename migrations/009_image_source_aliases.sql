@@ -0,0 +1,79 @@
+-- Maps every name an image lookup may use (a question's jsons/...json
+-- file_path, or an extracted_images source_file itself) to the source_file
+-- its images are stored under, so each lookup is one indexed join.
+-- Rebuilt by refresh_image_source_aliases() whenever the file_catalog or
+-- image_sources data version has moved past the last build.
+INSERT INTO data_versions (name) VALUES ('image_sources') ON CONFLICT (name) DO NOTHING;
+
+DROP TRIGGER IF EXISTS extracted_images_sources_version ON extracted_images;
+CREATE TRIGGER extracted_images_sources_version
+    AFTER INSERT OR DELETE OR TRUNCATE OR UPDATE OF source_file ON extracted_images
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('image_sources');
+
+CREATE INDEX IF NOT EXISTS extracted_images_source_page_idx
+    ON extracted_images (source_file, page_number);
+
+CREATE TABLE IF NOT EXISTS image_source_aliases (
+    file_path TEXT PRIMARY KEY,
+    source_file TEXT NOT NULL
+);
+
+-- Single row recording the data versions the aliases were built from
+CREATE TABLE IF NOT EXISTS image_source_alias_builds (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    file_catalog_version BIGINT NOT NULL,
+    image_sources_version BIGINT NOT NULL,
+    built_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION refresh_image_source_aliases() RETURNS INTEGER AS $$
+DECLARE
+    catalog_version BIGINT;
+    sources_version BIGINT;
+    alias_count INTEGER;
+BEGIN
+    -- One rebuild at a time; later callers find it already done
+    PERFORM pg_advisory_xact_lock(hashtext('image_source_aliases'));
+    SELECT version INTO catalog_version FROM data_versions WHERE name = 'file_catalog';
+    SELECT version INTO sources_version FROM data_versions WHERE name = 'image_sources';
+    IF EXISTS (
+        SELECT 1 FROM image_source_alias_builds
+        WHERE file_catalog_version = COALESCE(catalog_version, 0)
+          AND image_sources_version = COALESCE(sources_version, 0)
+    ) THEN
+        SELECT count(*) INTO alias_count FROM image_source_aliases;
+        RETURN alias_count;
+    END IF;
+
+    DELETE FROM image_source_aliases;
+    INSERT INTO image_source_aliases (file_path, source_file)
+    SELECT DISTINCT source_file, source_file
+    FROM extracted_images
+    WHERE source_file IS NOT NULL;
+
+    -- jsons/dir/rafi3-10.json -> rafi3-10, when no source_file matches the full path
+    INSERT INTO image_source_aliases (file_path, source_file)
+    SELECT files.file_path, sources.source_file
+    FROM (
+        SELECT file_path FROM questions
+        UNION
+        SELECT file_path FROM duplicates
+    ) AS files
+    JOIN image_source_aliases sources
+      ON sources.file_path = replace(regexp_replace(files.file_path, '^.*/', ''), '.json', '')
+    WHERE files.file_path LIKE 'jsons/%'
+    ON CONFLICT (file_path) DO NOTHING;
+
+    INSERT INTO image_source_alias_builds (id, file_catalog_version, image_sources_version, built_at)
+    VALUES (TRUE, COALESCE(catalog_version, 0), COALESCE(sources_version, 0), NOW())
+    ON CONFLICT (id) DO UPDATE SET
+        file_catalog_version = EXCLUDED.file_catalog_version,
+        image_sources_version = EXCLUDED.image_sources_version,
+        built_at = NOW();
+
+    SELECT count(*) INTO alias_count FROM image_source_aliases;
+    RETURN alias_count;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT refresh_image_source_aliases();
@@ -0,0 +1,78 @@
+-- Index imported questions as they arrive, so the question list's search
+-- filter finds them without a manual `flask rebuild-search-index`.
+-- refresh_question_search() is the single definition of a search document;
+-- search_service calls it for edits and full rebuilds.
+CREATE OR REPLACE FUNCTION refresh_question_search(question_ids INTEGER[], text_config REGCONFIG)
+RETURNS INTEGER AS $$
+DECLARE
+    indexed INTEGER;
+BEGIN
+    -- NULL ids rebuilds every question
+    INSERT INTO question_search (question_id, search_text, document, updated_at)
+    SELECT
+        eq.id,
+        CONCAT_WS(' ', eq.enhanced_text, q.question_text, dup.texts),
+        setweight(to_tsvector(text_config, COALESCE(eq.enhanced_text, '')), 'A') ||
+        setweight(to_tsvector(text_config, COALESCE(q.question_text, '')), 'B') ||
+        setweight(to_tsvector(text_config, COALESCE(dup.texts, '')), 'C'),
+        NOW()
+    FROM enhanced_questions eq
+    JOIN questions q ON q.id = eq.question_id
+    LEFT JOIN LATERAL (
+        SELECT STRING_AGG(d.question_text, ' ') AS texts
+        FROM duplicates d
+        WHERE d.representative_id = eq.question_id
+    ) dup ON TRUE
+    WHERE question_ids IS NULL OR eq.id = ANY(question_ids)
+    ON CONFLICT (question_id) DO UPDATE
+    SET search_text = EXCLUDED.search_text,
+        document = EXCLUDED.document,
+        updated_at = EXCLUDED.updated_at;
+    GET DIAGNOSTICS indexed = ROW_COUNT;
+    RETURN indexed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement-level, so a bulk import indexes its rows in one pass.
+-- TG_ARGV[0] is the text search configuration and must match SEARCH_TEXT_CONFIG;
+-- recreate both triggers with the new value if that setting changes.
+CREATE OR REPLACE FUNCTION index_inserted_enhanced_questions() RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_question_search(ARRAY(SELECT id FROM new_rows), CAST(TG_ARGV[0] AS regconfig));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION index_inserted_duplicates() RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_question_search(
+        ARRAY(
+            SELECT eq.id FROM enhanced_questions eq
+            WHERE eq.question_id IN (SELECT representative_id FROM new_rows)
+        ),
+        CAST(TG_ARGV[0] AS regconfig)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS enhanced_questions_search_index ON enhanced_questions;
+CREATE TRIGGER enhanced_questions_search_index
+    AFTER INSERT ON enhanced_questions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION index_inserted_enhanced_questions('simple');
+
+DROP TRIGGER IF EXISTS duplicates_search_index ON duplicates;
+CREATE TRIGGER duplicates_search_index
+    AFTER INSERT ON duplicates
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION index_inserted_duplicates('simple');
+
+-- Questions imported before this migration without a rebuild
+SELECT refresh_question_search(
+    ARRAY(
+        SELECT eq.id FROM enhanced_questions eq
+        WHERE NOT EXISTS (SELECT 1 FROM question_search qs WHERE qs.question_id = eq.id)
+    ),
+    'simple'
+);
@@ -0,0 +1,36 @@
+-- Join the texts in question_search.search_text with newlines instead of
+-- spaces, so a substring search from the question list cannot match a phrase
+-- that straddles the end of one text and the start of the next.
+CREATE OR REPLACE FUNCTION refresh_question_search(question_ids INTEGER[], text_config REGCONFIG)
+RETURNS INTEGER AS $$
+DECLARE
+    indexed INTEGER;
+BEGIN
+    -- NULL ids rebuilds every question
+    INSERT INTO question_search (question_id, search_text, document, updated_at)
+    SELECT
+        eq.id,
+        CONCAT_WS(E'\n', eq.enhanced_text, q.question_text, dup.texts),
+        setweight(to_tsvector(text_config, COALESCE(eq.enhanced_text, '')), 'A') ||
+        setweight(to_tsvector(text_config, COALESCE(q.question_text, '')), 'B') ||
+        setweight(to_tsvector(text_config, COALESCE(dup.texts, '')), 'C'),
+        NOW()
+    FROM enhanced_questions eq
+    JOIN questions q ON q.id = eq.question_id
+    LEFT JOIN LATERAL (
+        SELECT STRING_AGG(d.question_text, E'\n') AS texts
+        FROM duplicates d
+        WHERE d.representative_id = eq.question_id
+    ) dup ON TRUE
+    WHERE question_ids IS NULL OR eq.id = ANY(question_ids)
+    ON CONFLICT (question_id) DO UPDATE
+    SET search_text = EXCLUDED.search_text,
+        document = EXCLUDED.document,
+        updated_at = EXCLUDED.updated_at;
+    GET DIAGNOSTICS indexed = ROW_COUNT;
+    RETURN indexed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Rewrite the existing documents; use SEARCH_TEXT_CONFIG here if it is not 'simple'
+SELECT refresh_question_search(NULL, 'simple');
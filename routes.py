@@ -1,13 +1,27 @@
-from flask import jsonify, request, render_template
+from flask import Response, jsonify, request, render_template
 from services.question_service import (
-    get_questions, get_question_details, update_question,
+    QUESTION_FILTERS, STATUS_TRANSITIONS, get_questions, stream_questions,
+    get_question_details, get_questions_details, get_details_cache_stats, invalidate_question_details,
+    update_question, bulk_update_questions, bulk_update_question_status, recompute_consensus,
     mark_question_corrected, mark_question_incorrect, mark_question_needs_review
 )
-from services.image_service import handle_image, get_image_files, get_file_images, get_page_images, get_available_pages
-from services.gemini_service import generate_explanation
-from services.utils import get_all_files
+from services.image_service import (
+    handle_image, create_image_upload, confirm_image_upload,
+    get_image_files, get_file_images, get_page_images, get_available_pages, get_file_manifest
+)
+from services.cache_service import get_cache_stats
+from services.derivative_service import submit_image_derivatives
+from services.explanation_service import (
+    generate_explanation, get_explanation_cache_stats, get_explanation_job, stream_explanation
+)
+from services.gemini_service import get_gemini_stats
+from services.search_service import search_questions
+from services.utils import get_all_files, stream_all_files, stream_as_sse
 
 def init_routes(app, engine):
+    def wants_stream():
+        return request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+
     @app.route('/')
     def index():
         return render_template('dashboard.html')
@@ -15,15 +29,51 @@ def init_routes(app, engine):
     @app.route('/api/questions', methods=['GET'])
     def questions():
         file_path_filter = request.args.get('file_path')
-        result = get_questions(engine, file_path_filter)
+        filters = {key: request.args.get(key) for key in QUESTION_FILTERS}
+        if wants_stream():
+            result = stream_questions(engine, file_path_filter, filters, request.args.get('files_etag'))
+            if 'error' in result:
+                return jsonify(result), 500
+            return Response(result['stream'], mimetype='application/json')
+        result = get_questions(
+            engine, file_path_filter, filters,
+            cursor=request.args.get('cursor'),
+            page_size=request.args.get('limit', type=int),
+            files_etag=request.args.get('files_etag'),
+            include_facets=request.args.get('facets') in ('1', 'true')
+        )
         if 'error' in result:
-            return jsonify(result), 500
+            return jsonify(result), 400 if 'invalid' in result['error'].lower() else 500
+        return jsonify(result)
+
+    @app.route('/api/search', methods=['GET'])
+    def search():
+        result = search_questions(
+            engine, request.args.get('q'),
+            file_path_filter=request.args.get('file_path'),
+            limit=request.args.get('limit', type=int)
+        )
+        if 'error' in result:
+            return jsonify(result), 400 if 'missing' in result['error'].lower() or 'invalid' in result['error'].lower() else 500
+        return jsonify(result)
+
+    @app.route('/api/questions/details', methods=['GET'])
+    def questions_details():
+        try:
+            question_ids = [int(value) for value in request.args.get('ids', '').split(',') if value.strip()]
+        except ValueError:
+            return jsonify({'error': 'Invalid ids parameter'}), 400
+        result = get_questions_details(engine, question_ids, request.args.get('file_path'))
+        if 'error' in result:
+            return jsonify(result), 400 if 'ids parameter' in result['error'] else 500
         return jsonify(result)
 
     @app.route('/api/question/<int:question_id>', methods=['GET'])
     def question_details(question_id):
         file_path_filter = request.args.get('file_path')  # Pass current file context
-        result = get_question_details(engine, question_id, file_path_filter)
+        # fresh=1 reads past the details cache, for clients about to post the document back
+        fresh = request.args.get('fresh') in ('1', 'true')
+        result = get_question_details(engine, question_id, file_path_filter, use_cache=not fresh)
         if 'error' in result:
             return jsonify(result), 404 if result['error'] == 'Question not found' else 500
         return jsonify(result)
@@ -34,19 +84,62 @@ def init_routes(app, engine):
         result = update_question(engine, question_id, data)
         if 'error' in result:
             return jsonify({'status': 'error', 'error': result['error']}), 400 if 'missing' in result['error'].lower() else 500
-        return jsonify({'status': 'success', 'explanation': result['explanation']})
+        return jsonify({
+            'status': 'success',
+            'explanation': result['explanation'],
+            'explanation_job': result.get('explanation_job')
+        })
+
+    @app.route('/api/questions/bulk', methods=['POST'])
+    def bulk_update_questions_route():
+        data = request.get_json(silent=True) or {}
+        result = bulk_update_questions(engine, data.get('updates'))
+        if 'error' in result:
+            status_code = 400 if 'missing' in result['error'].lower() or 'invalid' in result['error'].lower() else 500
+            return jsonify({'status': 'error', 'error': result['error']}), status_code
+        return jsonify({'status': 'success', **result})
+
+    @app.route('/api/consensus/recompute', methods=['POST'])
+    def recompute_consensus_route():
+        data = request.get_json(silent=True) or {}
+        # Dry run unless the caller explicitly asks to apply
+        result = recompute_consensus(engine, data.get('thresholds'), dry_run=data.get('dry_run', True) is not False)
+        if 'error' in result:
+            return jsonify({'status': 'error', 'error': result['error']}), 400 if 'invalid' in result['error'].lower() else 500
+        return jsonify({'status': 'success', **result})
+
+    @app.route('/api/explanation_jobs/<job_id>', methods=['GET'])
+    def explanation_job_status(job_id):
+        result = get_explanation_job(engine, job_id, on_written=invalidate_question_details)
+        if 'error' in result:
+            return jsonify(result), 404 if result['error'] == 'Job not found' else 500
+        return jsonify(result)
 
     @app.route('/api/generate_explanation', methods=['POST'])
     def generate_explanation_route():
         data = request.get_json()
-        result = generate_explanation(data)
+        result = generate_explanation(engine, data)
         if 'error' in result:
             return jsonify({'status': 'error', 'error': result['error']}), 400
         return jsonify({'status': 'success', 'explanation': result['explanation']})
 
+    @app.route('/api/generate_explanation/stream', methods=['POST'])
+    def stream_explanation_route():
+        data = request.get_json()
+        result = stream_explanation(engine, data)
+        if 'error' in result:
+            return jsonify({'status': 'error', 'error': result['error']}), 400
+        return Response(stream_as_sse(result['stream']), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            # Keep nginx from buffering the whole response
+            'X-Accel-Buffering': 'no'
+        })
+
     @app.route('/api/question/<int:question_id>/mark-<status>', methods=['POST'])
     def update_question_status_route(question_id, status):
-        if status not in ['corrected', 'incorrect', 'needs_review']:
+        # Accept both mark-needs_review and mark-needs-review
+        status = status.replace('-', '_')
+        if status not in STATUS_TRANSITIONS:
             return jsonify({'status': 'error', 'error': 'Invalid status'}), 400
             
         # Map URL status to function name
@@ -61,27 +154,48 @@ def init_routes(app, engine):
             return jsonify({'status': 'error', 'error': result['error']}), 500
         return jsonify({'status': 'success'})
 
-    @app.route('/api/question/<int:question_id>/mark-incorrect', methods=['POST'])
-    def mark_question_incorrect_route(question_id):
-        result = mark_question_incorrect(engine, question_id)
+    @app.route('/api/questions/status', methods=['POST'])
+    def bulk_status_route():
+        data = request.get_json(silent=True) or {}
+        result = bulk_update_question_status(
+            engine, data.get('status'),
+            question_ids=data.get('ids'),
+            filters=data.get('filter')
+        )
         if 'error' in result:
-            return jsonify({'status': 'error', 'error': result['error']}), 500
-        return jsonify({'status': 'success'})
-
-    @app.route('/api/question/<int:question_id>/mark-needs-review', methods=['POST'])
-    def mark_question_needs_review_route(question_id):
-        result = mark_question_needs_review(engine, question_id)
-        if 'error' in result:
-            return jsonify({'status': 'error', 'error': result['error']}), 500
-        return jsonify({'status': 'success'})
+            status_code = 400 if 'missing' in result['error'].lower() or 'invalid' in result['error'].lower() else 500
+            return jsonify({'status': 'error', 'error': result['error']}), status_code
+        return jsonify({'status': 'success', **result})
 
     @app.route('/api/question/<int:question_id>/image', methods=['POST', 'DELETE'])
     def image_handler(question_id):
         result = handle_image(engine, question_id, request)
         if 'error' in result:
             return jsonify({'status': 'error', 'error': result['error']}), 400 if 'no image' in result['error'].lower() or 'no file' in result['error'].lower() else 500
+        if result.get('image_url') and not result.get('deduplicated'):
+            submit_image_derivatives(engine, result['image_url'])
         return jsonify({'status': 'success', 'image_url': result.get('image_url') if 'image_url' in result else None})
 
+    @app.route('/api/question/<int:question_id>/image/upload', methods=['POST'])
+    def image_upload(question_id):
+        result = create_image_upload(engine, question_id, request.get_json(silent=True))
+        if 'error' in result:
+            error = result['error'].lower()
+            status_code = 404 if 'not found' in error else 400 if 'invalid' in error else 500
+            return jsonify({'status': 'error', 'error': result['error']}), status_code
+        return jsonify({'status': 'success', **result})
+
+    @app.route('/api/question/<int:question_id>/image/confirm', methods=['POST'])
+    def image_upload_confirm(question_id):
+        result = confirm_image_upload(engine, question_id, request.get_json(silent=True))
+        if 'error' in result:
+            error = result['error'].lower()
+            status_code = 404 if 'not found' in error else 400 if 'invalid' in error else 500
+            return jsonify({'status': 'error', 'error': result['error']}), status_code
+        if not result.get('deduplicated'):
+            submit_image_derivatives(engine, result['image_url'])
+        return jsonify({'status': 'success', 'image_url': result['image_url']})
+
     @app.route('/api/image_files', methods=['GET'])
     def image_files():
         result = get_image_files(engine)
@@ -115,7 +229,32 @@ def init_routes(app, engine):
 
     @app.route('/api/files', methods=['GET'])
     def all_files():
+        if wants_stream():
+            result = stream_all_files(engine)
+            if 'error' in result:
+                return jsonify(result), 500
+            return Response(result['stream'], mimetype='application/json')
         result = get_all_files(engine)
         if 'error' in result:
             return jsonify({'error': result['error']}), 500
-        return jsonify({'file_paths': result})
\ No newline at end of file
+        response = jsonify({'file_paths': result['file_paths']})
+        response.set_etag(result['etag'])
+        return response.make_conditional(request)
+
+    @app.route('/api/file_manifest', methods=['GET'])
+    def file_manifest():
+        result = get_file_manifest(engine, request.args.get('file_path'))
+        if 'error' in result:
+            return jsonify({'error': result['error']}), 400 if 'missing' in result['error'].lower() else 500
+        response = jsonify(result['manifest'])
+        response.set_etag(result['etag'])
+        return response.make_conditional(request)
+
+    @app.route('/api/cache/stats', methods=['GET'])
+    def cache_stats():
+        return jsonify({
+            'question_details': get_details_cache_stats(),
+            'namespaces': get_cache_stats(),
+            'explanations': get_explanation_cache_stats(),
+            'gemini': get_gemini_stats()
+        })
\ No newline at end of file
@@ -0,0 +1,173 @@
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
+from services.explanation_service import get_or_generate_explanation
+from services.gemini_service import SAVE_EXPLANATION_PROMPT, generate_text
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_CHECKPOINT = 'explanations'
+
+
+class RateLimiter:
+    """Spaces calls evenly so all worker threads together stay under `rate` per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def call_with_backoff(func, max_retries=5, base_delay=1.0, max_delay=60.0):
+    for attempt in range(max_retries + 1):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = min(max_delay, base_delay * 2 ** attempt) * (0.5 + random.random() / 2)
+            logger.warning(f"Model call failed ({e}); retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def _load_checkpoint(conn, restart):
+    if restart:
+        conn.execute(text("DELETE FROM backfill_checkpoints WHERE name = :name"), {'name': BACKFILL_CHECKPOINT})
+    conn.execute(text("""
+        INSERT INTO backfill_checkpoints (name) VALUES (:name)
+        ON CONFLICT (name) DO NOTHING
+    """), {'name': BACKFILL_CHECKPOINT})
+    return conn.execute(text("SELECT last_id FROM backfill_checkpoints WHERE name = :name"),
+                        {'name': BACKFILL_CHECKPOINT}).scalar()
+
+
+def _fetch_chunk(conn, after_id, chunk_size):
+    return conn.execute(text("""
+        SELECT eq.id, eq.enhanced_text,
+               array_agg(ec.choice_text ORDER BY ec.id) AS choices,
+               array_agg(ec.is_correct ORDER BY ec.id) AS flags
+        FROM enhanced_questions eq
+        JOIN enhanced_choices ec ON ec.enhanced_question_id = eq.id
+        WHERE eq.id > :after_id
+          AND (eq.explanation IS NULL OR btrim(eq.explanation) = '')
+        GROUP BY eq.id, eq.enhanced_text
+        ORDER BY eq.id
+        LIMIT :chunk_size
+    """), {'after_id': after_id, 'chunk_size': chunk_size}).fetchall()
+
+
+def _write_chunk(conn, explanations, last_id, processed, failed):
+    written = 0
+    if explanations:
+        # Only fill rows that are still empty; a reviewer may have written one meanwhile
+        written = conn.execute(text("""
+            UPDATE enhanced_questions eq
+            SET explanation = v.explanation
+            FROM jsonb_to_recordset(CAST(:rows AS jsonb)) AS v(id INTEGER, explanation TEXT)
+            WHERE eq.id = v.id
+              AND (eq.explanation IS NULL OR btrim(eq.explanation) = '')
+        """), {'rows': json.dumps(explanations)}).rowcount
+    conn.execute(text("""
+        UPDATE backfill_checkpoints
+        SET last_id = :last_id,
+            processed = processed + :processed,
+            written = written + :written,
+            failed = failed + :failed,
+            updated_at = NOW()
+        WHERE name = :name
+    """), {
+        'name': BACKFILL_CHECKPOINT, 'last_id': last_id,
+        'processed': processed, 'written': written, 'failed': failed
+    })
+    return written
+
+
+def backfill_explanations(engine, chunk_size=100, concurrency=4, rate=5.0, max_retries=5,
+                          restart=False, limit=None, generate=None, on_written=None):
+    generate = generate or generate_text
+    limiter = RateLimiter(rate)
+    stats = {'processed': 0, 'written': 0, 'failed': 0, 'skipped': 0, 'chunks': 0}
+    started = time.perf_counter()
+
+    with engine.begin() as conn:
+        checkpoint = _load_checkpoint(conn, restart)
+    logger.info(f"Backfilling explanations after question {checkpoint}")
+    after_id = checkpoint
+    # The saved checkpoint never moves past a failed question, so a resumed run
+    # retries it; written questions are not selected again, so the rescan is cheap
+    first_failed_id = None
+
+    def explain(row):
+        correct_index = next((i for i, flag in enumerate(row.flags) if flag), None)
+        if correct_index is None:
+            return row.id, None, 'skipped'
+
+        def call_model(prompt):
+            def attempt():
+                # Every attempt, retries included, takes a rate-limit slot
+                limiter.wait()
+                return generate(prompt)
+            return call_with_backoff(attempt, max_retries=max_retries)
+
+        try:
+            explanation = get_or_generate_explanation(
+                engine, SAVE_EXPLANATION_PROMPT, row.enhanced_text, list(row.choices), correct_index,
+                generate=call_model
+            )
+            return row.id, explanation, 'ok'
+        except Exception:
+            logger.exception(f"Giving up on explanation for question {row.id}")
+            return row.id, None, 'failed'
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='backfill') as pool:
+        while limit is None or stats['processed'] < limit:
+            size = chunk_size if limit is None else min(chunk_size, limit - stats['processed'])
+            with engine.connect() as conn:
+                rows = _fetch_chunk(conn, after_id, size)
+            if not rows:
+                break
+
+            # No connection is held while the model calls run
+            outcomes = list(pool.map(explain, rows))
+            explanations = [{'id': question_id, 'explanation': explanation}
+                            for question_id, explanation, outcome in outcomes if outcome == 'ok']
+            failed_ids = [question_id for question_id, _, outcome in outcomes if outcome == 'failed']
+            skipped = sum(1 for _, _, outcome in outcomes if outcome == 'skipped')
+            after_id = rows[-1].id
+            if failed_ids and first_failed_id is None:
+                first_failed_id = min(failed_ids)
+            checkpoint = after_id if first_failed_id is None else first_failed_id - 1
+
+            with engine.begin() as conn:
+                written = _write_chunk(conn, explanations, checkpoint, len(rows), len(failed_ids))
+            if on_written and explanations:
+                on_written([item['id'] for item in explanations])
+
+            stats['chunks'] += 1
+            stats['processed'] += len(rows)
+            stats['written'] += written
+            stats['failed'] += len(failed_ids)
+            stats['skipped'] += skipped
+            elapsed = time.perf_counter() - started
+            logger.info(f"Backfill checkpoint at question {checkpoint}: {stats['processed']} processed, "
+                        f"{stats['written']} written, {stats['failed']} failed "
+                        f"({stats['processed'] / elapsed:.1f} questions/s)")
+
+    stats['last_id'] = checkpoint
+    stats['elapsed_s'] = round(time.perf_counter() - started, 2)
+    stats['per_second'] = round(stats['processed'] / stats['elapsed_s'], 2) if stats['elapsed_s'] else None
+    return stats
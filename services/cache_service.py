@@ -0,0 +1,469 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from cachetools import TTLCache
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class _CountingTTLCache(TTLCache):
+    """TTLCache that reports capacity evictions (not expiries) to its namespace."""
+
+    def __init__(self, maxsize, ttl, on_evict):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self._on_evict = on_evict
+
+    def popitem(self):
+        item = super().popitem()
+        self._on_evict()
+        return item
+
+
+# Generation row that every entry of a scope depends on; bumped by clear()
+EPOCH_GROUP = '*'
+
+
+class SQLiteCacheBackend:
+    """Second tier shared by the workers on one host through a WAL-mode SQLite file.
+
+    Entries are addressed by (scope, group, key); a group (for example one question)
+    is dropped with one indexed DELETE, and its generation is bumped so other workers
+    stop trusting copies they already hold.
+    """
+
+    # Expired rows are swept after this many writes
+    PRUNE_EVERY = 1000
+    # Stay under SQLite's bound-parameter limit
+    BATCH_SIZE = 500
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.writes = 0
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                scope TEXT NOT NULL,
+                grp TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (scope, key)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_entries_group_idx ON cache_entries (scope, grp)")
+        # Never reset, so an entry tagged with an old generation can never become valid again
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_generations (
+                scope TEXT NOT NULL,
+                grp TEXT NOT NULL,
+                generation INTEGER NOT NULL,
+                PRIMARY KEY (scope, grp)
+            )
+        """)
+
+    def _connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get_many(self, scope, entries):
+        found = {}
+        keys = {key: (group, key) for group, key in entries}
+        names = list(keys)
+        for i in range(0, len(names), self.BATCH_SIZE):
+            batch = names[i:i + self.BATCH_SIZE]
+            rows = self._connect().execute(
+                f"SELECT key, value FROM cache_entries "
+                f"WHERE scope = ? AND key IN ({','.join('?' * len(batch))}) AND expires_at > ?",
+                [scope, *batch, time.time()]
+            ).fetchall()
+            found.update({keys[key]: value for key, value in rows})
+        return found
+
+    def set_many(self, scope, items, ttl):
+        expires_at = time.time() + ttl
+        conn = self._connect()
+        conn.executemany(
+            "INSERT OR REPLACE INTO cache_entries (scope, grp, key, value, expires_at) VALUES (?, ?, ?, ?, ?)",
+            [(scope, group or '', key, value, expires_at) for (group, key), value in items.items()]
+        )
+        self.writes += len(items)
+        if self.writes >= self.PRUNE_EVERY:
+            self.writes = 0
+            conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),))
+
+    def delete(self, scope, group, key):
+        self._connect().execute("DELETE FROM cache_entries WHERE scope = ? AND key = ?", (scope, key))
+
+    def get_generations(self, scope, groups):
+        names = list({EPOCH_GROUP, *groups})
+        found = {}
+        for i in range(0, len(names), self.BATCH_SIZE):
+            batch = names[i:i + self.BATCH_SIZE]
+            found.update(self._connect().execute(
+                f"SELECT grp, generation FROM cache_generations "
+                f"WHERE scope = ? AND grp IN ({','.join('?' * len(batch))})",
+                [scope, *batch]
+            ).fetchall())
+        return {name: found.get(name, 0) for name in names}
+
+    def _bump(self, conn, scope, groups):
+        conn.executemany("""
+            INSERT INTO cache_generations (scope, grp, generation) VALUES (?, ?, 1)
+            ON CONFLICT (scope, grp) DO UPDATE SET generation = generation + 1
+        """, [(scope, group) for group in groups])
+
+    def delete_groups(self, scope, groups):
+        groups = list(groups)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._bump(conn, scope, groups)
+            for i in range(0, len(groups), self.BATCH_SIZE):
+                batch = groups[i:i + self.BATCH_SIZE]
+                conn.execute(
+                    f"DELETE FROM cache_entries WHERE scope = ? AND grp IN ({','.join('?' * len(batch))})",
+                    [scope, *batch]
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self, scope):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._bump(conn, scope, [EPOCH_GROUP])
+            conn.execute("DELETE FROM cache_entries WHERE scope = ?", (scope,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class RedisCacheBackend:
+    """Second tier shared by every worker through any Redis-protocol server.
+
+    Ungrouped entries are plain keys with an expiry. Grouped entries live in one hash
+    per group, so invalidating a group is a single DEL rather than a keyspace scan;
+    their expiry is stored with the value because hash fields cannot expire on their own.
+    Group generations live in one more hash per scope and are only ever incremented.
+    """
+
+    BATCH_SIZE = 1000
+
+    def __init__(self, url, client=None):
+        if client is None:
+            # redis is optional and only needed when SHARED_CACHE_URL points at a server
+            import redis
+            client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.client = client
+
+    @staticmethod
+    def _plain_key(scope, key):
+        return f"{scope}:k:{key}"
+
+    @staticmethod
+    def _group_key(scope, group):
+        return f"{scope}:g:{group}"
+
+    @staticmethod
+    def _generations_key(scope):
+        return f"{scope}:gen"
+
+    def get_generations(self, scope, groups):
+        names = list({EPOCH_GROUP, *groups})
+        values = self.client.hmget(self._generations_key(scope), names)
+        return {name: int(value or 0) for name, value in zip(names, values)}
+
+    def get_many(self, scope, entries):
+        pipeline = self.client.pipeline(transaction=False)
+        for group, key in entries:
+            if group is None:
+                pipeline.get(self._plain_key(scope, key))
+            else:
+                pipeline.hget(self._group_key(scope, group), key)
+        found = {}
+        now = time.time()
+        for entry, value in zip(entries, pipeline.execute()):
+            if value is None:
+                continue
+            value = value.decode('utf-8')
+            if entry[0] is not None:
+                expires_at, value = value.split('|', 1)
+                if float(expires_at) <= now:
+                    continue
+            found[entry] = value
+        return found
+
+    def set_many(self, scope, items, ttl):
+        ttl = max(1, int(ttl))
+        expires_at = time.time() + ttl
+        pipeline = self.client.pipeline(transaction=False)
+        for (group, key), value in items.items():
+            if group is None:
+                pipeline.set(self._plain_key(scope, key), value, ex=ttl)
+            else:
+                name = self._group_key(scope, group)
+                pipeline.hset(name, key, f"{expires_at:.3f}|{value}")
+                pipeline.expire(name, ttl)
+        pipeline.execute()
+
+    def delete(self, scope, group, key):
+        if group is None:
+            self.client.delete(self._plain_key(scope, key))
+        else:
+            self.client.hdel(self._group_key(scope, group), key)
+
+    def delete_groups(self, scope, groups):
+        groups = list(groups)
+        for i in range(0, len(groups), self.BATCH_SIZE):
+            batch = groups[i:i + self.BATCH_SIZE]
+            pipeline = self.client.pipeline(transaction=True)
+            for group in batch:
+                pipeline.hincrby(self._generations_key(scope), group, 1)
+            pipeline.delete(*(self._group_key(scope, group) for group in batch))
+            pipeline.execute()
+
+    def clear(self, scope):
+        self.client.hincrby(self._generations_key(scope), EPOCH_GROUP, 1)
+        # Whole-namespace clears are rare (consensus recompute), so a scan is acceptable here;
+        # the pattern leaves the generations hash alone
+        keys = list(self.client.scan_iter(match=f"{scope}:[gk]:*", count=500))
+        for i in range(0, len(keys), self.BATCH_SIZE):
+            self.client.delete(*keys[i:i + self.BATCH_SIZE])
+
+
+_shared_backend = None
+_shared_backend_lock = threading.Lock()
+
+
+def get_shared_backend():
+    """The configured second tier, built on first use; None when SHARED_CACHE_URL is unset."""
+    global _shared_backend
+    if not Config.SHARED_CACHE_URL:
+        return None
+    if _shared_backend is None:
+        with _shared_backend_lock:
+            if _shared_backend is None:
+                url = Config.SHARED_CACHE_URL
+                if url.startswith('sqlite:///'):
+                    _shared_backend = SQLiteCacheBackend(os.path.expanduser(url[len('sqlite:///'):]))
+                elif url.startswith(('redis://', 'rediss://', 'unix://')):
+                    _shared_backend = RedisCacheBackend(url)
+                else:
+                    raise ValueError(f"Unsupported SHARED_CACHE_URL scheme: {url}")
+    return _shared_backend
+
+
+class CacheNamespace:
+    """A named, locked TTL cache with its own size, TTL and stats, optionally backed by the shared tier.
+
+    Keys are strings. Values must be JSON-serialisable when the namespace is shared.
+    `group_of` maps a key to the group it is invalidated with (for example its question id).
+    Grouped entries are tagged with the group's generation when they are loaded and are
+    only served while it is unchanged. With a shared tier the generations live there, so
+    an invalidation in one worker also retires the copies other workers hold locally.
+    """
+
+    def __init__(self, name, maxsize, ttl, shared=True, group_of=None):
+        self.name = name
+        self.ttl = ttl
+        self.shared = shared
+        self.group_of = group_of
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0,
+                      'invalidations': 0, 'shared_errors': 0}
+        # Local generations, used when there is no shared tier; one counter per invalidated group
+        self.generations = {}
+        self.epoch = 0
+        self.cache = _CountingTTLCache(maxsize, ttl, self._count_eviction)
+
+    def _count_eviction(self):
+        # Called from inside TTLCache while self.lock is held
+        self.stats['evictions'] += 1
+
+    @property
+    def scope(self):
+        return f"{Config.SHARED_CACHE_PREFIX}:{self.name}"
+
+    def _entry(self, key):
+        return (self.group_of(key) if self.group_of else None), key
+
+    def _backend(self):
+        return get_shared_backend() if self.shared else None
+
+    def _shared_call(self, operation, *args):
+        backend = self._backend()
+        if backend is None:
+            return None
+        # The shared tier is an optimisation; an outage falls back to the local tier and the database
+        try:
+            return getattr(backend, operation)(self.scope, *args)
+        except Exception:
+            logger.warning(f"Shared cache {operation} failed for namespace {self.name}", exc_info=True)
+            with self.lock:
+                self.stats['shared_errors'] += 1
+            return None
+
+    def get_tokens(self, keys):
+        """The generation each key's entry must carry to be served, or None if it cannot be known.
+
+        Ungrouped keys always get the token None. Read them before loading the values
+        that will be passed to set_many, so a load that races an invalidation is never served.
+        """
+        if not self.group_of:
+            return dict.fromkeys(keys)
+        groups = {key: self.group_of(key) for key in keys}
+        if self._backend() is None:
+            with self.lock:
+                return {key: [self.epoch, self.generations.get(group, 0)] for key, group in groups.items()}
+        generations = self._shared_call('get_generations', sorted(set(groups.values())))
+        if generations is None:
+            return None
+        return {key: [generations[EPOCH_GROUP], generations[group]] for key, group in groups.items()}
+
+    def get_many_versioned(self, keys):
+        """Return (found, tokens): the cached values and the tokens to store fresh loads under."""
+        tokens = self.get_tokens(keys)
+        if tokens is None:
+            # Generations are unavailable, so nothing cached can be trusted
+            with self.lock:
+                self.stats['misses'] += len(keys)
+            return {}, None
+
+        found = {}
+        with self.lock:
+            for key in keys:
+                entry = self.cache.get(key)
+                if entry is None:
+                    continue
+                if entry[0] == tokens[key]:
+                    found[key] = entry[1]
+                else:
+                    self.cache.pop(key, None)
+                    self.stats['stale'] += 1
+            self.stats['hits'] += len(found)
+
+        missing = [key for key in keys if key not in found]
+        if missing:
+            entries = [self._entry(key) for key in missing]
+            shared = self._shared_call('get_many', entries) or {}
+            promoted = {}
+            for group, key in entries:
+                if (group, key) not in shared:
+                    continue
+                token, value = json.loads(shared[(group, key)])
+                if token == tokens[key]:
+                    promoted[key] = value
+            with self.lock:
+                self.cache.update({key: (tokens[key], value) for key, value in promoted.items()})
+                self.stats['shared_hits'] += len(promoted)
+                self.stats['misses'] += len(missing) - len(promoted)
+            found.update(promoted)
+        return found, tokens
+
+    def get_many(self, keys):
+        return self.get_many_versioned(keys)[0]
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, items, tokens=None):
+        """Store `items`; `tokens` are those read before the values were loaded (see get_tokens).
+
+        Items whose group has been invalidated since then are not stored.
+        """
+        if not items:
+            return
+        current = self.get_tokens(list(items))
+        if current is None:
+            return
+        if tokens is None:
+            tokens = current
+        else:
+            items = {key: value for key, value in items.items() if tokens[key] == current[key]}
+            if not items:
+                return
+        with self.lock:
+            self.cache.update({key: (tokens[key], value) for key, value in items.items()})
+        if self._backend() is not None:
+            self._shared_call('set_many', {
+                self._entry(key): json.dumps([tokens[key], value], default=str) for key, value in items.items()
+            }, self.ttl)
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def delete(self, key):
+        # Other workers' local copies are left to expire; use delete_groups to retire those too
+        with self.lock:
+            if self.cache.pop(key, None) is not None:
+                self.stats['invalidations'] += 1
+        self._shared_call('delete', *self._entry(key))
+
+    def delete_groups(self, groups):
+        """Retire every key in the given groups, here and in the workers sharing the tier."""
+        groups = {str(group) for group in groups}
+        if not groups or not self.group_of:
+            return
+        with self.lock:
+            for group in groups:
+                self.generations[group] = self.generations.get(group, 0) + 1
+            stale_keys = [key for key in self.cache.keys() if self.group_of(key) in groups]
+            for key in stale_keys:
+                self.cache.pop(key, None)
+            self.stats['invalidations'] += len(stale_keys)
+        self._shared_call('delete_groups', sorted(groups))
+
+    def clear(self):
+        with self.lock:
+            self.epoch += 1
+            self.stats['invalidations'] += len(self.cache)
+            self.cache.clear()
+        self._shared_call('clear')
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats, size=len(self.cache), maxsize=self.cache.maxsize, ttl=self.ttl,
+                         shared=self._backend() is not None)
+        lookups = stats['hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['shared_hits']) / lookups, 4) if lookups else None
+        return stats
+
+
+namespaces = {}
+namespaces_lock = threading.Lock()
+
+
+def cache_namespace(name, maxsize, ttl, shared=True, group_of=None):
+    """Return the namespace called `name`, creating it on first use.
+
+    CACHE_<NAME>_SIZE and CACHE_<NAME>_TTL in the environment override the defaults given here.
+    """
+    with namespaces_lock:
+        if name not in namespaces:
+            env_name = name.upper()
+            namespaces[name] = CacheNamespace(
+                name,
+                maxsize=int(os.environ.get(f'CACHE_{env_name}_SIZE', maxsize)),
+                ttl=float(os.environ.get(f'CACHE_{env_name}_TTL', ttl)),
+                shared=shared,
+                group_of=group_of
+            )
+        return namespaces[name]
+
+
+def get_cache_stats():
+    with namespaces_lock:
+        current = dict(namespaces)
+    return {name: namespace.get_stats() for name, namespace in sorted(current.items())}
@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+from sqlalchemy import text
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Row in data_versions bumped by triggers on questions, duplicates and enhanced_questions
+FILE_CATALOG_VERSION = 'file_catalog'
+
+# Data versions image_source_aliases is built from
+ALIAS_VERSIONS_QUERY = text("""
+    SELECT name, version FROM data_versions WHERE name IN ('file_catalog', 'image_sources')
+""")
+
+CATALOG_QUERIES = {
+    # Every file that has questions or duplicates (/api/files)
+    'all': text("""
+        SELECT DISTINCT file_path FROM questions
+        UNION
+        SELECT DISTINCT file_path FROM duplicates
+        ORDER BY file_path
+    """),
+    # Files reachable from an enhanced question (/api/questions)
+    'enhanced': text("""
+        SELECT DISTINCT file_path
+        FROM (
+            SELECT q.file_path 
+            FROM questions q
+            JOIN enhanced_questions eq ON q.id = eq.question_id
+            UNION
+            SELECT d.file_path
+            FROM duplicates d
+            JOIN enhanced_questions eq ON d.representative_id = eq.question_id
+        ) AS files
+        ORDER BY file_path
+    """),
+}
+
+_lock = threading.Lock()
+_catalogs = {}
+
+
+def get_data_version(conn, name=FILE_CATALOG_VERSION):
+    row = conn.execute(text("SELECT version FROM data_versions WHERE name = :name"),
+                       {'name': name}).fetchone()
+    return row.version if row else 0
+
+
+def get_file_catalog(conn, scope='all'):
+    version = get_data_version(conn)
+    with _lock:
+        cached = _catalogs.get(scope)
+    if cached and cached['version'] == version:
+        return cached
+
+    # Read after the version so a concurrent import can only make the list newer, never staler
+    files = [row.file_path for row in conn.execute(CATALOG_QUERIES[scope])]
+    catalog = {'version': version, 'files': files, 'etag': f"files-{scope}-{version}"}
+    with _lock:
+        _catalogs[scope] = catalog
+    logger.info(f"Loaded {len(files)} files into the '{scope}' catalog at version {version}")
+    return catalog
+
+
+def refresh_image_source_aliases(engine):
+    with engine.begin() as conn:
+        count = conn.execute(text("SELECT refresh_image_source_aliases()")).scalar()
+    logger.info(f"Image source aliases rebuilt: {count} names")
+    return count
+
+
+# Versions this process last saw the aliases rebuilt for, and when it last looked
+_aliases = {'versions': None, 'checked_at': None, 'refreshing': False}
+
+
+def _refresh_aliases_in_background(engine, versions):
+    try:
+        refresh_image_source_aliases(engine)
+        with _lock:
+            _aliases['versions'] = versions
+    except Exception:
+        logger.exception("Rebuilding image source aliases failed")
+    finally:
+        with _lock:
+            _aliases['refreshing'] = False
+
+
+def ensure_image_source_aliases(engine):
+    """Start an alias rebuild if an import has happened since this process last looked.
+
+    Data versions are read at most every IMAGE_ALIAS_CHECK_INTERVAL seconds, and the rebuild
+    runs on a background thread, so image lookups never wait for it; they keep using the
+    previous aliases until it commits. `flask rebuild-image-aliases` rebuilds eagerly after an import.
+    """
+    now = time.monotonic()
+    with _lock:
+        checked_at = _aliases['checked_at']
+        if _aliases['refreshing'] or (checked_at is not None and now - checked_at < Config.IMAGE_ALIAS_CHECK_INTERVAL):
+            return
+        _aliases['checked_at'] = now
+
+    with engine.connect() as conn:
+        versions = {row.name: row.version for row in conn.execute(ALIAS_VERSIONS_QUERY)}
+    with _lock:
+        if _aliases['refreshing'] or versions == _aliases['versions']:
+            return
+        _aliases['refreshing'] = True
+    # refresh_image_source_aliases() returns at once when the stored build already matches these versions
+    threading.Thread(
+        target=_refresh_aliases_in_background, args=(engine, versions),
+        name='image-alias-refresh', daemon=True
+    ).start()
@@ -0,0 +1,165 @@
+import io
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlparse
+from sqlalchemy import text
+from config import Config
+from services.image_service import image_url_for_key, upload_to_s3
+from services.registry import get_service
+
+logger = logging.getLogger(__name__)
+
+# Downloads and uploads run here; the CPU-bound resizing is handed to the process pool
+executor = ThreadPoolExecutor(max_workers=Config.IMAGE_DERIVATIVE_WORKERS, thread_name_prefix='derivatives')
+
+
+def create_image_process_pool():
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    # spawn, not fork: the worker already runs threads that forked children could deadlock on
+    return ProcessPoolExecutor(max_workers=Config.IMAGE_PROCESS_WORKERS,
+                               mp_context=multiprocessing.get_context('spawn'))
+
+
+def render_derivatives(data, thumbnail_width, quality):
+    """Decode an image and encode a thumbnail and a full-size WebP copy. Runs in a worker process."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        width, height = image.size
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+        webp = io.BytesIO()
+        image.save(webp, 'WEBP', quality=quality, method=4)
+
+        thumbnail = image.copy()
+        thumbnail.thumbnail((thumbnail_width, thumbnail_width * 4))
+        thumb = io.BytesIO()
+        thumbnail.save(thumb, 'WEBP', quality=quality, method=4)
+
+    return {
+        'width': width,
+        'height': height,
+        'webp': webp.getvalue(),
+        'thumbnail': thumb.getvalue(),
+        'thumbnail_width': thumbnail.width,
+        'thumbnail_height': thumbnail.height
+    }
+
+
+def _key_for_url(url):
+    """Map an image URL back to its key in our bucket, or None if it is hosted elsewhere."""
+    parsed = urlparse(url or '')
+    hosts = {f"{Config.S3_BUCKET}.s3.amazonaws.com", f"{Config.S3_BUCKET}.s3.{Config.AWS_REGION}.amazonaws.com"}
+    if Config.CLOUDFRONT_DOMAIN:
+        hosts.add(Config.CLOUDFRONT_DOMAIN)
+    if parsed.netloc not in hosts or not parsed.path.strip('/'):
+        return None
+    return unquote(parsed.path.lstrip('/'))
+
+
+def _save_derivatives(engine, source_url, status, values=None, error=None):
+    values = values or {}
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO image_derivatives (
+                source_url, status, width, height, bytes,
+                thumbnail_url, thumbnail_width, thumbnail_height, thumbnail_bytes,
+                webp_url, webp_bytes, error, updated_at
+            ) VALUES (
+                :source_url, :status, :width, :height, :bytes,
+                :thumbnail_url, :thumbnail_width, :thumbnail_height, :thumbnail_bytes,
+                :webp_url, :webp_bytes, :error, NOW()
+            )
+            ON CONFLICT (source_url) DO UPDATE SET
+                status = EXCLUDED.status,
+                width = EXCLUDED.width,
+                height = EXCLUDED.height,
+                bytes = EXCLUDED.bytes,
+                thumbnail_url = EXCLUDED.thumbnail_url,
+                thumbnail_width = EXCLUDED.thumbnail_width,
+                thumbnail_height = EXCLUDED.thumbnail_height,
+                thumbnail_bytes = EXCLUDED.thumbnail_bytes,
+                webp_url = EXCLUDED.webp_url,
+                webp_bytes = EXCLUDED.webp_bytes,
+                error = EXCLUDED.error,
+                updated_at = NOW()
+        """), {
+            'source_url': source_url, 'status': status, 'error': error,
+            **{column: values.get(column) for column in (
+                'width', 'height', 'bytes', 'thumbnail_url', 'thumbnail_width',
+                'thumbnail_height', 'thumbnail_bytes', 'webp_url', 'webp_bytes'
+            )}
+        })
+
+
+def process_image(engine, source_url):
+    """Build and upload the derivatives of one original, recording the outcome. Returns the status."""
+    key = _key_for_url(source_url)
+    if key is None:
+        _save_derivatives(engine, source_url, 'skipped', error='Image is not stored in this bucket')
+        return 'skipped'
+    try:
+        original = get_service('s3').get_object(Bucket=Config.S3_BUCKET, Key=key)['Body'].read()
+        rendered = get_service('image_pool').submit(
+            render_derivatives, original, Config.THUMBNAIL_WIDTH, Config.WEBP_QUALITY
+        ).result()
+
+        base = f"derivatives/{os.path.splitext(key)[0]}"
+        thumbnail_key, webp_key = f"{base}_thumb.webp", f"{base}.webp"
+        upload_to_s3(io.BytesIO(rendered['thumbnail']), thumbnail_key, 'image/webp')
+        upload_to_s3(io.BytesIO(rendered['webp']), webp_key, 'image/webp')
+
+        _save_derivatives(engine, source_url, 'done', {
+            'width': rendered['width'],
+            'height': rendered['height'],
+            'bytes': len(original),
+            'thumbnail_url': image_url_for_key(thumbnail_key),
+            'thumbnail_width': rendered['thumbnail_width'],
+            'thumbnail_height': rendered['thumbnail_height'],
+            'thumbnail_bytes': len(rendered['thumbnail']),
+            'webp_url': image_url_for_key(webp_key),
+            'webp_bytes': len(rendered['webp'])
+        })
+        return 'done'
+    except Exception as e:
+        logger.exception(f"Error generating derivatives for {source_url}")
+        try:
+            _save_derivatives(engine, source_url, 'failed', error=str(e))
+        except Exception:
+            logger.exception(f"Error recording derivative failure for {source_url}")
+        return 'failed'
+
+
+def submit_image_derivatives(engine, source_url):
+    """Queue derivative generation for a newly uploaded image without blocking the request."""
+    if _key_for_url(source_url) is None:
+        return None
+    return executor.submit(process_image, engine, source_url)
+
+
+def generate_missing_derivatives(engine, limit=None, retry_failed=False):
+    """Batch job: build derivatives for extracted_images originals that have none yet."""
+    statuses = ['pending', 'failed'] if retry_failed else ['pending']
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT DISTINCT ei.s3_url
+            FROM public.extracted_images ei
+            LEFT JOIN image_derivatives d ON d.source_url = ei.s3_url
+            WHERE ei.s3_url IS NOT NULL
+              AND (d.source_url IS NULL OR d.status = ANY(:statuses))
+            ORDER BY ei.s3_url
+            LIMIT :limit
+        """), {'statuses': statuses, 'limit': limit}).fetchall()
+
+    stats = {'done': 0, 'failed': 0, 'skipped': 0}
+    for status in executor.map(lambda row: process_image(engine, row.s3_url), rows):
+        stats[status] += 1
+    stats['total'] = len(rows)
+    stats['elapsed_s'] = round(time.perf_counter() - started, 2)
+    return stats
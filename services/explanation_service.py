@@ -0,0 +1,321 @@
+import hashlib
+import json
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import LRUCache
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from config import Config
+from services.gemini_service import (
+    EXPLANATION_PROMPT, GEMINI_MODEL, SAVE_EXPLANATION_PROMPT, build_prompt, generate_text, stream_text
+)
+
+logger = logging.getLogger(__name__)
+
+# In-process front of the explanation_cache table
+explanation_cache = LRUCache(maxsize=Config.EXPLANATION_CACHE_SIZE)
+explanation_cache_lock = threading.Lock()
+explanation_cache_stats = {'memory_hits': 0, 'db_hits': 0, 'misses': 0}
+
+
+def explanation_cache_key(template, question_text, choices, correct_index):
+    payload = json.dumps([GEMINI_MODEL, template, question_text, list(choices), choices[correct_index]],
+                         ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_explanation_cache_stats():
+    with explanation_cache_lock:
+        stats = dict(explanation_cache_stats, size=len(explanation_cache), maxsize=explanation_cache.maxsize)
+    lookups = stats['memory_hits'] + stats['db_hits'] + stats['misses']
+    stats['hit_rate'] = round((stats['memory_hits'] + stats['db_hits']) / lookups, 4) if lookups else None
+    return stats
+
+
+def _lookup_explanation(engine, cache_key):
+    with explanation_cache_lock:
+        cached = explanation_cache.get(cache_key)
+        if cached is not None:
+            explanation_cache_stats['memory_hits'] += 1
+            return cached
+
+    # A cache outage should cost API quota, not fail the request
+    try:
+        with engine.connect() as conn:
+            row = conn.execute(text("SELECT explanation FROM explanation_cache WHERE cache_key = :cache_key"),
+                               {'cache_key': cache_key}).fetchone()
+    except SQLAlchemyError:
+        logger.exception("Error reading explanation cache")
+        row = None
+    if row:
+        with explanation_cache_lock:
+            explanation_cache_stats['db_hits'] += 1
+            explanation_cache[cache_key] = row.explanation
+        return row.explanation
+
+    with explanation_cache_lock:
+        explanation_cache_stats['misses'] += 1
+    return None
+
+
+def _store_explanation(engine, cache_key, explanation):
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO explanation_cache (cache_key, model, explanation)
+                VALUES (:cache_key, :model, :explanation)
+                ON CONFLICT (cache_key) DO NOTHING
+            """), {'cache_key': cache_key, 'model': GEMINI_MODEL, 'explanation': explanation})
+    except SQLAlchemyError:
+        logger.exception("Error writing explanation cache")
+    with explanation_cache_lock:
+        explanation_cache[cache_key] = explanation
+
+
+def get_or_generate_explanation(engine, template, question_text, choices, correct_index, generate=None):
+    cache_key = explanation_cache_key(template, question_text, choices, correct_index)
+    explanation = _lookup_explanation(engine, cache_key)
+    if explanation is not None:
+        return explanation
+    explanation = (generate or generate_text)(build_prompt(template, question_text, choices, correct_index))
+    _store_explanation(engine, cache_key, explanation)
+    return explanation
+
+
+def _validate_explanation_request(data):
+    question_text = data.get('question_text')
+    choices = data.get('choices', [])
+    correct_index = data.get('correct_index')
+    if not question_text or not choices or correct_index is None or correct_index < 0 or correct_index >= len(choices):
+        return None
+    return question_text, choices, correct_index
+
+
+def generate_explanation(engine, data):
+    request = _validate_explanation_request(data)
+    if request is None:
+        return {'error': 'Invalid input'}
+    question_text, choices, correct_index = request
+    try:
+        explanation = get_or_generate_explanation(engine, EXPLANATION_PROMPT, question_text, choices, correct_index)
+        return {'explanation': explanation}
+    except Exception as e:
+        logger.exception("Error generating explanation")
+        return {'error': str(e)}
+
+
+def stream_explanation(engine, data):
+    """Like generate_explanation, but returns {'stream': ...} yielding text chunks as the model produces them."""
+    request = _validate_explanation_request(data)
+    if request is None:
+        return {'error': 'Invalid input'}
+    question_text, choices, correct_index = request
+    cache_key = explanation_cache_key(EXPLANATION_PROMPT, question_text, choices, correct_index)
+    cached = _lookup_explanation(engine, cache_key)
+    if cached is not None:
+        return {'stream': iter([cached])}
+
+    def generate():
+        chunks = stream_text(build_prompt(EXPLANATION_PROMPT, question_text, choices, correct_index))
+        parts = []
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+        finally:
+            # Runs on client disconnect too: closing the SDK stream drops the upstream connection
+            chunks.close()
+        # Only complete responses are cached
+        _store_explanation(engine, cache_key, ''.join(parts).strip())
+
+    return {'stream': generate()}
+
+# Gemini calls run here so no pooled connection is held open while waiting on the model
+executor = ThreadPoolExecutor(max_workers=Config.EXPLANATION_WORKERS, thread_name_prefix='explanation')
+
+
+def create_explanation_jobs(conn, question_ids):
+    job_ids = {question_id: uuid.uuid4().hex for question_id in question_ids}
+    if job_ids:
+        # One multi-row INSERT rather than a per-row executemany
+        conn.execute(text("""
+            INSERT INTO explanation_jobs (id, question_id, status)
+            SELECT v.job_id, v.question_id, 'pending'
+            FROM jsonb_to_recordset(CAST(:rows AS jsonb)) AS v(job_id TEXT, question_id INTEGER)
+        """), {'rows': json.dumps([
+            {'job_id': job_id, 'question_id': question_id} for question_id, job_id in job_ids.items()
+        ])})
+    return job_ids
+
+
+def create_explanation_job(conn, question_id):
+    return create_explanation_jobs(conn, [question_id])[question_id]
+
+
+def _set_job_status(conn, job_id, status, explanation=None, error=None):
+    # A requeued job can run twice; whichever run finishes first decides the outcome
+    conn.execute(text("""
+        UPDATE explanation_jobs
+        SET status = :status, explanation = :explanation, error = :error, updated_at = NOW()
+        WHERE id = :job_id AND status IN ('pending', 'running')
+    """), {'job_id': job_id, 'status': status, 'explanation': explanation, 'error': error})
+
+
+def _run_explanation_job(engine, job_id, question_id, question_text, choices, correct_index, on_written):
+    try:
+        with engine.begin() as conn:
+            _set_job_status(conn, job_id, 'running')
+        explanation = get_or_generate_explanation(engine, SAVE_EXPLANATION_PROMPT, question_text, choices, correct_index)
+    except Exception as e:
+        logger.exception(f"Error generating explanation for question {question_id}")
+        try:
+            with engine.begin() as conn:
+                _set_job_status(conn, job_id, 'failed', error=str(e))
+        except SQLAlchemyError:
+            logger.exception(f"Could not record failure of explanation job {job_id}")
+        return
+
+    try:
+        with engine.begin() as conn:
+            # Skip the write if a reviewer has since typed an explanation or changed the answer
+            result = conn.execute(text("""
+                UPDATE enhanced_questions eq
+                SET explanation = :explanation
+                WHERE eq.id = :question_id
+                  AND eq.explanation IS NULL
+                  AND EXISTS (
+                      SELECT 1 FROM enhanced_choices ec
+                      WHERE ec.enhanced_question_id = eq.id
+                        AND ec.is_correct
+                        AND ec.choice_text = :correct_answer
+                  )
+            """), {
+                'explanation': explanation,
+                'question_id': question_id,
+                'correct_answer': choices[correct_index]
+            })
+            status = 'done' if result.rowcount else 'superseded'
+            _set_job_status(conn, job_id, status, explanation=explanation)
+        if on_written and status == 'done':
+            on_written(question_id)
+        logger.info(f"Explanation job {job_id} for question {question_id} finished as {status}")
+    except SQLAlchemyError as e:
+        logger.exception(f"Database error writing explanation for question {question_id}")
+        try:
+            with engine.begin() as conn:
+                _set_job_status(conn, job_id, 'failed', error='Could not save explanation')
+        except SQLAlchemyError:
+            logger.exception(f"Could not record failure of explanation job {job_id}")
+
+
+def submit_explanation_job(engine, job_id, question_id, question_text, choices, correct_index, on_written=None):
+    return executor.submit(
+        _run_explanation_job, engine, job_id, question_id,
+        question_text, list(choices), correct_index, on_written
+    )
+
+
+# Claims pending or running jobs nobody has touched for EXPLANATION_JOB_TIMEOUT seconds, the
+# sign of a worker that died with the job in its in-process queue. Jobs older than
+# EXPLANATION_JOB_MAX_AGE are failed instead of retried.
+CLAIM_STALE_JOBS_QUERY = """
+    WITH stale AS (
+        SELECT id, created_at < NOW() - make_interval(secs => :max_age) AS expired
+        FROM explanation_jobs
+        WHERE status IN ('pending', 'running')
+          AND updated_at < NOW() - make_interval(secs => :timeout)
+          {job_filter}
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE explanation_jobs j
+    SET status = CASE WHEN stale.expired THEN 'failed' ELSE 'pending' END,
+        error = CASE WHEN stale.expired THEN 'Interrupted and not retried' END,
+        updated_at = NOW()
+    FROM stale
+    WHERE j.id = stale.id
+    RETURNING j.id, j.question_id, j.status
+"""
+
+# What a requeued job needs to rebuild its prompt; questions that gained an explanation are left out
+JOB_INPUTS_QUERY = text("""
+    SELECT eq.id, eq.enhanced_text,
+           json_agg(ec.choice_text ORDER BY ec.id) AS choices,
+           json_agg(ec.is_correct ORDER BY ec.id) AS flags
+    FROM enhanced_questions eq
+    JOIN enhanced_choices ec ON ec.enhanced_question_id = eq.id
+    WHERE eq.id = ANY(:question_ids) AND eq.explanation IS NULL
+    GROUP BY eq.id
+""")
+
+
+def recover_explanation_jobs(engine, on_written=None, job_ids=None):
+    """Requeue explanation jobs orphaned by a worker that stopped, or fail them once too old."""
+    job_filter = "AND id = ANY(:job_ids)" if job_ids is not None else ""
+    params = {'timeout': Config.EXPLANATION_JOB_TIMEOUT, 'max_age': Config.EXPLANATION_JOB_MAX_AGE}
+    if job_ids is not None:
+        params['job_ids'] = list(job_ids)
+
+    requeue = []
+    stats = {'requeued': 0, 'failed': 0, 'superseded': 0}
+    with engine.begin() as conn:
+        claimed = conn.execute(text(CLAIM_STALE_JOBS_QUERY.format(job_filter=job_filter)), params).fetchall()
+        stats['failed'] = sum(1 for row in claimed if row.status == 'failed')
+        pending = [row for row in claimed if row.status == 'pending']
+        if pending:
+            inputs = {row.id: row for row in conn.execute(
+                JOB_INPUTS_QUERY, {'question_ids': list({row.question_id for row in pending})}
+            )}
+            superseded = []
+            for job in pending:
+                question = inputs.get(job.question_id)
+                correct_index = next((i for i, flag in enumerate(question.flags) if flag), None) if question else None
+                if correct_index is None:
+                    superseded.append(job.id)
+                else:
+                    requeue.append((job, question, correct_index))
+            if superseded:
+                conn.execute(text("""
+                    UPDATE explanation_jobs SET status = 'superseded', updated_at = NOW() WHERE id = ANY(:job_ids)
+                """), {'job_ids': superseded})
+            stats['superseded'] = len(superseded)
+
+    # Submitted after the commit, so the job row already reads 'pending' when it starts
+    for job, question, correct_index in requeue:
+        submit_explanation_job(engine, job.id, job.question_id, question.enhanced_text,
+                               question.choices, correct_index, on_written=on_written)
+    stats['requeued'] = len(requeue)
+    if claimed:
+        logger.warning(f"Recovered {len(claimed)} stale explanation jobs: {stats}")
+    return stats
+
+
+def get_explanation_job(engine, job_id, on_written=None, recover=True):
+    try:
+        with engine.connect() as conn:
+            row = conn.execute(text("""
+                SELECT id, question_id, status, explanation, error, created_at, updated_at,
+                       status IN ('pending', 'running')
+                           AND updated_at < NOW() - make_interval(secs => :timeout) AS stale
+                FROM explanation_jobs
+                WHERE id = :job_id
+            """), {'job_id': job_id, 'timeout': Config.EXPLANATION_JOB_TIMEOUT}).fetchone()
+        if not row:
+            return {'error': 'Job not found'}
+        if row.stale and recover:
+            # The worker that owned it is gone; requeue it (or fail it) and report the new state
+            recover_explanation_jobs(engine, on_written, job_ids=[job_id])
+            return get_explanation_job(engine, job_id, on_written, recover=False)
+        return {
+            'id': row.id,
+            'question_id': row.question_id,
+            'status': row.status,
+            'explanation': row.explanation,
+            'error': row.error,
+            'created_at': row.created_at.isoformat(),
+            'updated_at': row.updated_at.isoformat()
+        }
+    except SQLAlchemyError as e:
+        logger.exception("Database error in get_explanation_job")
+        return {'error': 'An unexpected database error occurred'}
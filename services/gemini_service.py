@@ -1,29 +1,98 @@
 import logging
-from google import genai
+import threading
+from concurrent.futures import Future
 from config import Config
+from services.registry import get_service
 
 logger = logging.getLogger(__name__)
-client = genai.Client(api_key=Config.GEMINI_API_KEY)
-
-def generate_explanation(data):
-    question_text = data.get('question_text')
-    choices = data.get('choices', [])
-    correct_index = data.get('correct_index')
-    if not question_text or not choices or correct_index is None or correct_index < 0 or correct_index >= len(choices):
-        return {'error': 'Invalid input'}
-    correct_answer = choices[correct_index]
+
+
+def create_gemini_client():
+    # google.genai is slow to import, so it is only loaded once an explanation is requested
+    from google import genai
+    # GEMINI_BASE_URL points the client at a local fake backend for testing
+    return genai.Client(
+        api_key=Config.require('GEMINI_API_KEY'),
+        http_options={'base_url': Config.GEMINI_BASE_URL} if Config.GEMINI_BASE_URL else None
+    )
+
+GEMINI_MODEL = "gemini-2.0-flash"
+
+# Used by the "Generate Explanation" button
+EXPLANATION_PROMPT = (
+    "Generate a concise explanation for why '{correct_answer}' is the correct answer without referring to index numbers or using any formatting like bold/italic... and within 300 tokens "
+    "to the following question: {question_text}\nChoices:\n{choices_text}"
+)
+
+# Used when a saved question's correct answer changes
+SAVE_EXPLANATION_PROMPT = (
+    "Generate a concise explanation (3-4 sentences) for why '{correct_answer}' is the correct answer without referring to index numbers. "
+    "to the following question: {question_text}\nChoices:\n{choices_text}"
+)
+
+
+def build_prompt(template, question_text, choices, correct_index):
     choices_text = "\n".join([f"{i+1}. {choice}" for i, choice in enumerate(choices)])
-    prompt = (
-        f"Generate a concise explanation for why '{correct_answer}' is the correct answer without referring to index numbers or using any formatting like bold/italic... and within 300 tokens "
-        f"to the following question: {question_text}\nChoices:\n{choices_text}"
+    return template.format(
+        correct_answer=choices[correct_index],
+        question_text=question_text,
+        choices_text=choices_text
+    )
+
+
+# Identical prompts already being generated; later callers wait on the same Future
+in_flight = {}
+in_flight_lock = threading.Lock()
+gemini_stats = {'calls': 0, 'coalesced': 0}
+
+
+def get_gemini_stats():
+    with in_flight_lock:
+        return dict(gemini_stats, in_flight=len(in_flight))
+
+
+def _call_model(prompt):
+    response = get_service('gemini').models.generate_content(
+        model=GEMINI_MODEL,
+        contents=[prompt]
     )
+    return response.text.strip()
+
+
+def generate_text(prompt):
+    key = (GEMINI_MODEL, prompt)
+    with in_flight_lock:
+        future = in_flight.get(key)
+        leader = future is None
+        if leader:
+            future = in_flight[key] = Future()
+            gemini_stats['calls'] += 1
+        else:
+            gemini_stats['coalesced'] += 1
+    if not leader:
+        return future.result()
+
     try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=[prompt]
-        )
-        explanation = response.text.strip()
-        return {'explanation': explanation}
+        future.set_result(_call_model(prompt))
     except Exception as e:
-        logger.exception("Error generating explanation")
-        return {'error': str(e)}
\ No newline at end of file
+        # Waiters see the same failure; the next caller starts a fresh attempt
+        future.set_exception(e)
+    finally:
+        with in_flight_lock:
+            in_flight.pop(key, None)
+    return future.result()
+
+
+def stream_text(prompt):
+    response = get_service('gemini').models.generate_content_stream(
+        model=GEMINI_MODEL,
+        contents=[prompt]
+    )
+    try:
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+    finally:
+        close = getattr(response, 'close', None)
+        if close:
+            close()
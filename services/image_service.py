@@ -1,22 +1,189 @@
-import boto3
+import base64
+import hashlib
+import json
 import logging
 import os
+import re
 import uuid
 from werkzeug.utils import secure_filename
 from config import Config
 from sqlalchemy import text
-from cachetools import TTLCache
+from services.cache_service import cache_namespace
+from services.catalog_service import ensure_image_source_aliases
+from services.question_service import invalidate_question_details
+from services.registry import get_service
 
 logger = logging.getLogger(__name__)
 
-# Cache for 5 minutes to reduce DB hits
-cache = TTLCache(maxsize=100, ttl=300)
+# Image and page listings change only on import; "no images" answers expire sooner
+# so a page imported after a miss shows up quickly
+image_cache = cache_namespace('image_lists', maxsize=2048, ttl=300)
+image_miss_cache = cache_namespace('image_misses', maxsize=1024, ttl=30)
 
-def handle_image(engine, question_id, request):
-    s3 = None
-    bucket_name = Config.S3_BUCKET
-    cloudfront_domain = Config.CLOUDFRONT_DOMAIN
+def create_s3_client():
+    # boto3 is only loaded once an image is uploaded
+    import boto3
+    from botocore.config import Config as BotoConfig
+    # One client per process: boto3 clients are thread-safe and keep their connection pool warm
+    return boto3.client(
+        's3',
+        aws_access_key_id=Config.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=Config.AWS_SECRET_ACCESS_KEY,
+        region_name=Config.AWS_REGION,
+        # Set S3_ENDPOINT_URL to use a local stand-in such as a moto server
+        endpoint_url=Config.S3_ENDPOINT_URL,
+        config=BotoConfig(
+            max_pool_connections=Config.S3_MAX_POOL_CONNECTIONS,
+            tcp_keepalive=True,
+            retries={'max_attempts': 5, 'mode': 'adaptive'}
+        )
+    )
+
+def create_s3_transfer_config():
+    from boto3.s3.transfer import TransferConfig
+    return TransferConfig(
+        multipart_threshold=Config.S3_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+        multipart_chunksize=Config.S3_MULTIPART_CHUNKSIZE_MB * 1024 * 1024,
+        max_concurrency=Config.S3_MAX_CONCURRENCY,
+        use_threads=True
+    )
+
+def upload_to_s3(fileobj, key, content_type):
+    """Stream a file-like object to S3, switching to parallel multipart uploads for large files."""
+    get_service('s3').upload_fileobj(
+        fileobj,
+        Config.S3_BUCKET,
+        key,
+        ExtraArgs={'ContentType': content_type},
+        Config=get_service('s3_transfer')
+    )
+
+# Types the browser may upload directly to S3, with the extension used in the key
+UPLOAD_CONTENT_TYPES = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/gif': '.gif',
+    'image/webp': '.webp'
+}
+
+def image_url_for_key(key):
+    if Config.CLOUDFRONT_DOMAIN:
+        return f"https://{Config.CLOUDFRONT_DOMAIN}/{key}"
+    return f"https://{Config.S3_BUCKET}.s3.amazonaws.com/{key}"
+
+def _set_question_image(engine, question_id, image_url):
+    with engine.begin() as conn:
+        updated = conn.execute(text("""
+            UPDATE enhanced_questions
+            SET image_url = :image_url, requires_image = TRUE
+            WHERE id = :question_id
+        """), {'question_id': question_id, 'image_url': image_url}).rowcount
+    invalidate_question_details(question_id)
+    return updated
+
+def _hash_stream(stream, chunk_size=1024 * 1024):
+    """SHA-256 and size of a seekable stream, read in chunks and rewound for the upload."""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    stream.seek(0)
+    return digest.hexdigest(), size
+
+def find_image_by_hash(engine, sha256):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT image_url FROM image_hashes WHERE sha256 = :sha256"),
+                            {'sha256': sha256}).scalar()
+
+def record_image_hash(engine, sha256, key, size, content_type):
+    """Index an uploaded object by content. Returns the URL to use, which is an earlier upload's on a race."""
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO image_hashes (sha256, s3_key, image_url, bytes, content_type)
+            VALUES (:sha256, :s3_key, :image_url, :bytes, :content_type)
+            ON CONFLICT (sha256) DO NOTHING
+        """), {
+            'sha256': sha256, 's3_key': key, 'image_url': image_url_for_key(key),
+            'bytes': size, 'content_type': content_type
+        })
+        return conn.execute(text("SELECT image_url FROM image_hashes WHERE sha256 = :sha256"),
+                            {'sha256': sha256}).scalar()
+
+def create_image_upload(engine, question_id, data):
+    """Presign a browser POST straight to S3 so the image bytes never pass through a worker.
+
+    When the browser sends the file's SHA-256 and those bytes were uploaded before,
+    the existing image is attached instead and no upload is needed.
+    """
+    data = data or {}
+    content_type = data.get('content_type')
+    if content_type not in UPLOAD_CONTENT_TYPES:
+        return {'error': f"Invalid content type; expected one of {', '.join(UPLOAD_CONTENT_TYPES)}"}
+    sha256 = (data.get('sha256') or '').lower() or None
+    if sha256 and not re.fullmatch(r'[0-9a-f]{64}', sha256):
+        return {'error': 'Invalid sha256'}
+    key = f"question_images/question_{question_id}_{uuid.uuid4().hex}{UPLOAD_CONTENT_TYPES[content_type]}"
+    try:
+        if sha256:
+            image_url = find_image_by_hash(engine, sha256)
+            if image_url:
+                if not _set_question_image(engine, question_id, image_url):
+                    return {'error': 'Question not found'}
+                return {'image_url': image_url, 'deduplicated': True}
 
+        fields = {'Content-Type': content_type}
+        if sha256:
+            # S3 rejects the upload unless the bytes match, so confirm can trust the hash
+            fields['x-amz-checksum-sha256'] = base64.b64encode(bytes.fromhex(sha256)).decode('ascii')
+        upload = get_service('s3').generate_presigned_post(
+            Bucket=Config.S3_BUCKET,
+            Key=key,
+            Fields=fields,
+            Conditions=[{name: value} for name, value in fields.items()] + [
+                ['content-length-range', 1, Config.MAX_IMAGE_UPLOAD_MB * 1024 * 1024]
+            ],
+            ExpiresIn=Config.S3_UPLOAD_EXPIRY
+        )
+        return {'key': key, 'url': upload['url'], 'fields': upload['fields']}
+    except Exception as e:
+        logger.exception(f"Error presigning image upload: {str(e)}")
+        return {'error': str(e)}
+
+def confirm_image_upload(engine, question_id, data):
+    key = (data or {}).get('key', '')
+    extensions = '|'.join(re.escape(ext.lstrip('.')) for ext in UPLOAD_CONTENT_TYPES.values())
+    # Only accept keys create_image_upload could have issued for this question
+    if not re.fullmatch(rf"question_images/question_{question_id}_[0-9a-f]{{32}}\.({extensions})", key):
+        return {'error': 'Invalid upload key'}
+    try:
+        from botocore.exceptions import ClientError
+        try:
+            head = get_service('s3').head_object(Bucket=Config.S3_BUCKET, Key=key, ChecksumMode='ENABLED')
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return {'error': 'Uploaded image not found'}
+            raise
+        image_url = image_url_for_key(key)
+        checksum = head.get('ChecksumSHA256')
+        # Multipart checksums ("...-N") are not content hashes, so those objects stay unindexed
+        if checksum and '-' not in checksum:
+            sha256 = base64.b64decode(checksum).hex()
+            image_url = record_image_hash(engine, sha256, key, head.get('ContentLength'), head.get('ContentType'))
+            if image_url != image_url_for_key(key):
+                # An identical image was confirmed meanwhile; keep that one and drop this copy
+                get_service('s3').delete_object(Bucket=Config.S3_BUCKET, Key=key)
+                if not _set_question_image(engine, question_id, image_url):
+                    return {'error': 'Question not found'}
+                return {'image_url': image_url, 'deduplicated': True}
+        if not _set_question_image(engine, question_id, image_url):
+            return {'error': 'Question not found'}
+        return {'image_url': image_url}
+    except Exception as e:
+        logger.exception(f"Error confirming image upload: {str(e)}")
+        return {'error': str(e)}
+
+def handle_image(engine, question_id, request):
     if request.method == 'POST':
         if request.is_json:
             data = request.get_json()
@@ -24,12 +191,7 @@ def handle_image(engine, question_id, request):
             if not image_url:
                 return {'error': 'No image URL provided'}
             try:
-                with engine.begin() as conn:
-                    conn.execute(text("""
-                        UPDATE enhanced_questions
-                        SET image_url = :image_url, requires_image = TRUE
-                        WHERE id = :question_id
-                    """), {'question_id': question_id, 'image_url': image_url})
+                _set_question_image(engine, question_id, image_url)
                 return {'image_url': image_url}
             except Exception as e:
                 logger.exception(f"Error updating image URL: {str(e)}")
@@ -41,30 +203,24 @@ def handle_image(engine, question_id, request):
             if file.filename == '':
                 return {'error': 'No file selected'}
             try:
+                sha256, size = _hash_stream(file.stream)
+                image_url = find_image_by_hash(engine, sha256)
+                if image_url:
+                    _set_question_image(engine, question_id, image_url)
+                    return {'image_url': image_url, 'deduplicated': True}
+
                 filename = secure_filename(file.filename)
                 file_ext = os.path.splitext(filename)[1]
-                unique_filename = f"question_{question_id}_{uuid.uuid4().hex}{file_ext}"
-                s3 = boto3.client(
-                    's3',
-                    aws_access_key_id=Config.AWS_ACCESS_KEY_ID,
-                    aws_secret_access_key=Config.AWS_SECRET_ACCESS_KEY,
-                    region_name=Config.AWS_REGION
-                )
-                s3.upload_fileobj(
-                    file,
-                    bucket_name,
-                    f"question_images/{unique_filename}",
-                    ExtraArgs={'ContentType': file.content_type}
-                )
-                image_url = (f"https://{cloudfront_domain}/question_images/{unique_filename}"
-                            if cloudfront_domain else
-                            f"https://{bucket_name}.s3.amazonaws.com/question_images/{unique_filename}")
-                with engine.begin() as conn:
-                    conn.execute(text("""
-                        UPDATE enhanced_questions
-                        SET image_url = :image_url, requires_image = TRUE
-                        WHERE id = :question_id
-                    """), {'question_id': question_id, 'image_url': image_url})
+                key = f"question_images/question_{question_id}_{uuid.uuid4().hex}{file_ext}"
+                # Werkzeug spools large uploads to disk, so this reads the body in chunks
+                upload_to_s3(file.stream, key, file.content_type)
+                image_url = record_image_hash(engine, sha256, key, size, file.content_type)
+                if image_url != image_url_for_key(key):
+                    # Lost a race with an identical upload; keep theirs and drop our copy
+                    get_service('s3').delete_object(Bucket=Config.S3_BUCKET, Key=key)
+                    _set_question_image(engine, question_id, image_url)
+                    return {'image_url': image_url, 'deduplicated': True}
+                _set_question_image(engine, question_id, image_url)
                 return {'image_url': image_url}
             except Exception as e:
                 logger.exception(f"Error uploading image: {str(e)}")
@@ -77,6 +233,7 @@ def handle_image(engine, question_id, request):
                     SET image_url = NULL
                     WHERE id = :question_id
                 """), {'question_id': question_id})
+            invalidate_question_details(question_id)
             return {}
         except Exception as e:
             logger.exception(f"Error handling image deletion: {str(e)}")
@@ -84,8 +241,9 @@ def handle_image(engine, question_id, request):
 
 def get_image_files(engine):
     cache_key = 'image_files'
-    if cache_key in cache:
-        return cache[cache_key]
+    cached = image_cache.get(cache_key)
+    if cached is not None:
+        return cached
     try:
         with engine.connect() as conn:
             query = text("""
@@ -96,12 +254,78 @@ def get_image_files(engine):
             result = conn.execute(query)
             files = [row[0] for row in result]
             result = {'files': files}
-            cache[cache_key] = result
+            image_cache.set(cache_key, result)
             return result
     except Exception as e:
         logger.exception("Error getting image files")
         return {'error': str(e)}
 
+# Every image lookup resolves the caller's name through image_source_aliases, so a
+# question's jsons/...json path and a bare source_file both hit the same rows
+IMAGES_BY_ALIAS_QUERY = """
+    SELECT ei.id, ei.source_file, ei.page_number, ei.image_path, ei.s3_url, ei.question_number,
+           d.thumbnail_url, d.webp_url, d.width, d.height, d.bytes
+    FROM image_source_aliases a
+    JOIN public.extracted_images ei ON ei.source_file = a.source_file
+    LEFT JOIN image_derivatives d ON d.source_url = ei.s3_url AND d.status = 'done'
+    WHERE a.file_path = :file_path
+"""
+
+PAGES_BY_ALIAS_QUERY = text("""
+    SELECT DISTINCT ei.page_number
+    FROM image_source_aliases a
+    JOIN public.extracted_images ei ON ei.source_file = a.source_file
+    WHERE a.file_path = :file_path
+    ORDER BY ei.page_number
+""")
+
+# Whole-file manifest for the image browser: pages with counts and their images,
+# built in one round trip. Fields repeated per page (source file, page) are left off images.
+FILE_MANIFEST_QUERY = text("""
+    SELECT min(p.source_file) AS source_file,
+           COALESCE(sum(p.image_count), 0) AS image_count,
+           COALESCE(json_agg(json_build_object(
+               'page_number', p.page_number,
+               'image_count', p.image_count,
+               'images', p.images
+           ) ORDER BY p.page_number), '[]'::json) AS pages
+    FROM (
+        SELECT ei.source_file, ei.page_number, count(*) AS image_count,
+               json_agg(json_build_object(
+                   'id', ei.id,
+                   'image_path', ei.image_path,
+                   'url', ei.s3_url,
+                   'thumbnail_url', d.thumbnail_url,
+                   'webp_url', d.webp_url,
+                   'width', d.width,
+                   'height', d.height,
+                   'bytes', d.bytes,
+                   'question_number', ei.question_number
+               ) ORDER BY ei.question_number NULLS LAST, ei.image_path) AS images
+        FROM image_source_aliases a
+        JOIN public.extracted_images ei ON ei.source_file = a.source_file
+        LEFT JOIN image_derivatives d ON d.source_url = ei.s3_url AND d.status = 'done'
+        WHERE a.file_path = :file_path
+        GROUP BY ei.source_file, ei.page_number
+    ) AS p
+""")
+
+def _image_item(row, question_number):
+    return {
+        'id': row.id,
+        'source_file': row.source_file,
+        'page_number': row.page_number,
+        'image_path': row.image_path,
+        'url': row.s3_url,
+        'thumbnail_url': row.thumbnail_url,
+        'webp_url': row.webp_url,
+        'width': row.width,
+        'height': row.height,
+        'bytes': row.bytes,
+        'question_number': row.question_number,
+        'is_question_image': question_number is not None and row.question_number == question_number
+    }
+
 def get_file_images(engine, args):
     file_path = args.get('file_path')
     page_number = args.get('page_number', type=int)
@@ -110,38 +334,27 @@ def get_file_images(engine, args):
         return {'error': 'Missing file_path parameter'}
     
     cache_key = f"images_{file_path}_{page_number}_{question_number}"
-    if cache_key in cache:
-        return cache[cache_key]
+    cached = image_cache.get(cache_key) or image_miss_cache.get(cache_key)
+    if cached is not None:
+        return cached
     
     try:
+        ensure_image_source_aliases(engine)
         with engine.connect() as conn:
-            query = text("""
-                SELECT id, source_file, page_number, image_path, s3_url, question_number
-                FROM public.extracted_images
-                WHERE source_file = :source_file
-            """)
-            params = {'source_file': file_path}
+            query = IMAGES_BY_ALIAS_QUERY
+            params = {'file_path': file_path}
             if page_number is not None:
-                query = text(query.text + " AND page_number = :page_number")
+                query += " AND ei.page_number = :page_number"
                 params['page_number'] = page_number
-            query = text(query.text + " ORDER BY question_number NULLS LAST, image_path")
-            result = conn.execute(query, params)
-            images = [{
-                'id': row.id,
-                'source_file': row.source_file,
-                'page_number': row.page_number,
-                'image_path': row.image_path,
-                'url': row.s3_url,
-                'question_number': row.question_number,
-                'is_question_image': question_number is not None and row.question_number == question_number
-            } for row in result]
+            query += " ORDER BY ei.question_number NULLS LAST, ei.image_path"
+            images = [_image_item(row, question_number) for row in conn.execute(text(query), params)]
             
             result = {
                 'images': images,
                 'file_path': file_path,
                 'page_number': page_number if page_number is not None else None
             }
-            cache[cache_key] = result
+            (image_cache if images else image_miss_cache).set(cache_key, result)
             return result
     except Exception as e:
         logger.exception(f"Error getting file images for {file_path}")
@@ -156,70 +369,35 @@ def get_page_images(engine, args):
         return {'error': 'Missing file_path or page_number parameter'}
     
     cache_key = f"page_images_{file_path}_{page_number}_{question_number}"
-    if cache_key in cache:
-        return cache[cache_key]
+    cached = image_cache.get(cache_key) or image_miss_cache.get(cache_key)
+    if cached is not None:
+        return cached
     
     try:
         page_number = int(page_number)
+        ensure_image_source_aliases(engine)
         with engine.connect() as conn:
-            # Normalize file path for matching
-            file_variations = [file_path]
-            # Add short form (e.g., 'rafi3-10') if full path is provided
-            if file_path.startswith('jsons/'):
-                short_name = file_path.split('/')[-1].replace('.json', '')
-                file_variations.append(short_name)
-            
-            images = []
-            matched_file = None
-            for variation in file_variations:
-                query = text("""
-                    SELECT id, source_file, page_number, image_path, s3_url, question_number
-                    FROM public.extracted_images
-                    WHERE source_file = :source_file AND page_number = :page_number
-                    ORDER BY question_number NULLS LAST, image_path
-                """)
-                result = conn.execute(query, {'source_file': variation, 'page_number': page_number})
-                images = [{
-                    'id': row.id,
-                    'source_file': row.source_file,
-                    'page_number': row.page_number,
-                    'image_path': row.image_path,
-                    'url': row.s3_url,
-                    'question_number': row.question_number,
-                    'is_question_image': question_number is not None and row.question_number == question_number
-                } for row in result]
-                
-                if images:
-                    matched_file = variation
-                    logger.info(f"Found {len(images)} images for file {variation}, page {page_number}")
-                    break
+            result = conn.execute(
+                text(IMAGES_BY_ALIAS_QUERY + " AND ei.page_number = :page_number"
+                     " ORDER BY ei.question_number NULLS LAST, ei.image_path"),
+                {'file_path': file_path, 'page_number': page_number}
+            )
+            images = [_image_item(row, question_number) for row in result]
             
             if images:
+                matched_file = images[0]['source_file']
                 result = {
                     'images': images,
                     'page_number': page_number,
                     'file_path': matched_file,
                     'original_query_path': file_path if matched_file != file_path else None
                 }
-                cache[cache_key] = result
+                image_cache.set(cache_key, result)
                 return result
             
-            # Log failure
-            logger.warning(f"No images found for file variations {file_variations}, page {page_number}")
-            # Debug: List available files
-            debug_query = text("SELECT DISTINCT source_file FROM public.extracted_images ORDER BY source_file")
-            debug_result = conn.execute(debug_query)
-            logger.debug(f"Available source files: {[row.source_file for row in debug_result]}")
-            
             # Return available pages for the requested file
-            available_pages_query = text("""
-                SELECT DISTINCT page_number
-                FROM public.extracted_images
-                WHERE source_file = :source_file
-                ORDER BY page_number
-            """)
-            result = conn.execute(available_pages_query, {'source_file': file_path})
-            available_pages = [row.page_number for row in result]
+            available_pages = [row.page_number for row in conn.execute(PAGES_BY_ALIAS_QUERY, {'file_path': file_path})]
+            logger.warning(f"No images found for {file_path}, page {page_number}")
             result = {
                 'images': [],
                 'page_number': page_number,
@@ -227,43 +405,56 @@ def get_page_images(engine, args):
                 'file_path': file_path,
                 'error': f'No images found for {file_path}, page {page_number}'
             }
-            cache[cache_key] = result
+            image_miss_cache.set(cache_key, result)
             return result
     except Exception as e:
         logger.exception(f"Error getting page images for {file_path}, page {page_number}")
         return {'error': str(e)}
 
 
+def get_file_manifest(engine, file_path):
+    if not file_path:
+        return {'error': 'Missing file_path parameter'}
+
+    cache_key = f"manifest_{file_path}"
+    cached = image_cache.get(cache_key) or image_miss_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        ensure_image_source_aliases(engine)
+        with engine.connect() as conn:
+            row = conn.execute(FILE_MANIFEST_QUERY, {'file_path': file_path}).fetchone()
+        manifest = {
+            'file_path': file_path,
+            'source_file': row.source_file,
+            'page_count': len(row.pages),
+            'image_count': int(row.image_count),
+            'pages': row.pages
+        }
+        # Content hash, so the ETag changes with new images or derivatives and nothing else
+        body = json.dumps(manifest, sort_keys=True, separators=(',', ':'), default=str)
+        result = {'manifest': manifest, 'etag': f"manifest-{hashlib.sha256(body.encode('utf-8')).hexdigest()[:32]}"}
+        (image_cache if manifest['image_count'] else image_miss_cache).set(cache_key, result)
+        return result
+    except Exception as e:
+        logger.exception(f"Error building image manifest for {file_path}")
+        return {'error': str(e)}
+
+
 def get_available_pages(engine, file_path):
     cache_key = f"available_pages_{file_path}"
-    if cache_key in cache:
-        return cache[cache_key]
+    cached = image_cache.get(cache_key) or image_miss_cache.get(cache_key)
+    if cached is not None:
+        return cached
     
     try:
+        ensure_image_source_aliases(engine)
         with engine.connect() as conn:
-            file_variations = [file_path]
-            if file_path.startswith('jsons/'):
-                short_name = file_path.split('/')[-1].replace('.json', '')
-                file_variations.append(short_name)
-            
-            pages = []
-            for variation in file_variations:
-                query = text("""
-                    SELECT DISTINCT page_number
-                    FROM public.extracted_images
-                    WHERE source_file = :source_file
-                    ORDER BY page_number
-                """)
-                result = conn.execute(query, {'source_file': variation})
-                pages = [row.page_number for row in result]
-                if pages:
-                    break
-            
+            pages = [row.page_number for row in conn.execute(PAGES_BY_ALIAS_QUERY, {'file_path': file_path})]
             result = {'pages': pages}
-            cache[cache_key] = result
+            (image_cache if pages else image_miss_cache).set(cache_key, result)
             return result
     except Exception as e:
         logger.exception(f"Error getting available pages for {file_path}")
         return {'error': str(e)}
-    
-    
\ No newline at end of file
@@ -1,242 +1,713 @@
+import base64
+import json
 import logging
-import pandas as pd
+import time
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
-from services.gemini_service import client
+from config import Config
+from services.cache_service import cache_namespace
+from services.catalog_service import get_file_catalog
+from services.explanation_service import create_explanation_job, create_explanation_jobs, submit_explanation_job
+from services.search_service import refresh_search_document, refresh_search_documents
+from services.utils import stream_query_as_json
 
 logger = logging.getLogger(__name__)
 
-def get_questions(engine, file_path_filter=None):
+QUESTION_FILTERS = ('status', 'category', 'requires_image', 'search')
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Sort key for questions without an array_order, so they page after the rest
+# and the cursor always holds an integer
+NULL_ARRAY_ORDER = 2147483647
+
+FILE_QUESTIONS_QUERY = """
+    SELECT 
+        eq.id,
+        eq.question_id,
+        eq.enhanced_text,
+        eq.category,
+        eq.status,
+        eq.requires_image,
+        eq.image_url,
+        COALESCE(q_direct.array_order, d.array_order) as array_order,
+        q.file_path AS representative_file_path,
+        COALESCE(q_direct.page, d.page) as page,
+        COALESCE(q_direct.original_question_number, d.original_question_number) as original_question_number,
+        COALESCE(qc.models_count, 0) AS models_count,
+        COALESCE(qc.matching_models, 0) AS matching_models,
+        q.question_text AS original_question_text,
+        (SELECT STRING_AGG(d2.question_text, '||')
+         FROM duplicates d2
+         WHERE d2.representative_id = eq.question_id
+         AND d2.file_path = :file_path) AS duplicate_question_texts
+    FROM enhanced_questions eq
+    JOIN questions q ON q.id = eq.question_id
+    LEFT JOIN question_consensus qc ON qc.question_id = eq.id
+    LEFT JOIN questions q_direct ON 
+        q_direct.id = eq.question_id AND 
+        q_direct.file_path = :file_path
+    LEFT JOIN duplicates d ON 
+        d.representative_id = eq.question_id AND 
+        d.file_path = :file_path
+    WHERE 
+        (q_direct.id IS NOT NULL OR d.representative_id IS NOT NULL)
+        {conditions}
+    ORDER BY {order_by}
+"""
+
+ALL_QUESTIONS_QUERY = """
+    SELECT 
+        eq.id,
+        eq.question_id,
+        eq.enhanced_text,
+        eq.category,
+        eq.status,
+        eq.requires_image,
+        eq.image_url,
+        q.file_path AS representative_file_path,
+        q.page AS page,
+        q.original_question_number AS original_question_number,
+        COALESCE(qc.models_count, 0) AS models_count,
+        COALESCE(qc.matching_models, 0) AS matching_models,
+        q.question_text AS original_question_text,
+        (SELECT STRING_AGG(d.question_text, '||')
+         FROM duplicates d
+         WHERE d.representative_id = eq.question_id) AS duplicate_question_texts
+    FROM enhanced_questions eq
+    JOIN questions q ON q.id = eq.question_id
+    LEFT JOIN question_consensus qc ON qc.question_id = eq.id
+    WHERE TRUE
+        {conditions}
+    ORDER BY {order_by}
+"""
+
+
+# Status and category values for the dashboard's filter dropdowns, over the whole
+# file (or every question) rather than the filtered page
+QUESTION_FACETS_QUERY = text("""
+    WITH scope AS (
+        SELECT eq.status, eq.category
+        FROM enhanced_questions eq
+        WHERE :file_path IS NULL OR eq.question_id IN (
+            SELECT id FROM questions WHERE file_path = :file_path
+            UNION
+            SELECT representative_id FROM duplicates WHERE file_path = :file_path
+        )
+    )
+    SELECT
+        ARRAY(SELECT DISTINCT status FROM scope WHERE status IS NOT NULL ORDER BY status) AS statuses,
+        ARRAY(SELECT DISTINCT category FROM scope WHERE category IS NOT NULL ORDER BY category) AS categories
+""")
+
+
+def _encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _decode_cursor(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    if not all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        return None
+    return values
+
+
+def _parse_bool_filter(value):
+    if value is None or value == 'all':
+        return None
+    value = str(value).lower()
+    if value in ('yes', 'true', '1'):
+        return True
+    if value in ('no', 'false', '0'):
+        return False
+    return None
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _build_questions_query(file_path_filter, filters, cursor_values, page_size):
+    conditions = []
+    params = {}
+    if file_path_filter:
+        template = FILE_QUESTIONS_QUERY
+        order_columns = [f'COALESCE(q_direct.array_order, d.array_order, {NULL_ARRAY_ORDER})', 'eq.id']
+        params['file_path'] = file_path_filter
+    else:
+        template = ALL_QUESTIONS_QUERY
+        order_columns = ['eq.id']
+
+    status = filters.get('status')
+    if status and status != 'all':
+        conditions.append('eq.status = :status')
+        params['status'] = status
+
+    category = filters.get('category')
+    if category and category != 'all':
+        conditions.append('eq.category = :category')
+        params['category'] = category
+
+    requires_image = _parse_bool_filter(filters.get('requires_image'))
+    if requires_image is not None:
+        conditions.append('COALESCE(eq.requires_image, FALSE) = :requires_image')
+        params['requires_image'] = requires_image
+
+    search = (filters.get('search') or '').strip()
+    if search:
+        if file_path_filter:
+            # Only this file's duplicates count, so match the texts directly; the file
+            # filter already narrows the scan to one file's questions
+            search_conditions = [
+                'eq.enhanced_text ILIKE :search',
+                'q.question_text ILIKE :search',
+                """EXISTS (
+                SELECT 1 FROM duplicates ds
+                WHERE ds.representative_id = eq.question_id AND ds.file_path = :file_path
+                AND ds.question_text ILIKE :search
+            )"""
+            ]
+        else:
+            # question_search.search_text holds enhanced, original and every duplicate's text
+            # under a trigram index, one per line so a search cannot match across two of them
+            search_conditions = ["""EXISTS (
+                SELECT 1 FROM question_search qs
+                WHERE qs.question_id = eq.id AND qs.search_text ILIKE :search
+            )"""]
+        params['search'] = f"%{_escape_like(search)}%"
+        if search.isdigit():
+            search_conditions.append('eq.id = :search_id')
+            params['search_id'] = int(search)
+        conditions.append(f"({' OR '.join(search_conditions)})")
+
+    if cursor_values:
+        placeholders = []
+        for i, value in enumerate(cursor_values):
+            params[f'cursor_{i}'] = value
+            placeholders.append(f':cursor_{i}')
+        conditions.append(f"({', '.join(order_columns)}) > ({', '.join(placeholders)})")
+
+    sql = template.format(
+        conditions=''.join(f"\n        AND {condition}" for condition in conditions),
+        order_by=', '.join(order_columns)
+    )
+    if page_size:
+        # Fetch one extra row to know whether another page exists
+        sql += "    LIMIT :limit\n"
+        params['limit'] = page_size + 1
+    return text(sql), params
+
+
+def _attach_available_files(result, conn, files_etag=None):
+    catalog = get_file_catalog(conn, 'enhanced')
+    result['available_files_etag'] = catalog['etag']
+    # The client already holds this exact list, so skip the payload
+    if files_etag != catalog['etag']:
+        result['available_files'] = catalog['files']
+    return result
+
+
+def _attach_facets(result, conn, file_path_filter=None):
+    row = conn.execute(QUESTION_FACETS_QUERY, {'file_path': file_path_filter}).fetchone()
+    result['facets'] = {'statuses': list(row.statuses), 'categories': list(row.categories)}
+    return result
+
+
+def get_questions(engine, file_path_filter=None, filters=None, cursor=None, page_size=None, files_etag=None,
+                  include_facets=False):
+    filters = filters or {}
+    cursor_size = 2 if file_path_filter else 1
+    cursor_values = None
+    if cursor:
+        cursor_values = _decode_cursor(cursor, cursor_size)
+        if cursor_values is None:
+            return {'error': 'Invalid cursor'}
+        page_size = page_size or DEFAULT_PAGE_SIZE
+    if page_size is not None:
+        if page_size < 1:
+            return {'error': 'Invalid page size'}
+        page_size = min(page_size, MAX_PAGE_SIZE)
+
     try:
         with engine.connect() as conn:
-            if file_path_filter:
-                query = text("""
-                    SELECT 
-                        eq.id,
-                        eq.question_id,
-                        eq.enhanced_text,
-                        eq.category,
-                        eq.status,
-                        eq.requires_image,
-                        eq.image_url,
-                        COALESCE(q_direct.array_order, d.array_order) as array_order,
-                        q.file_path AS representative_file_path,
-                        COALESCE(q_direct.page, d.page) as page,
-                        COALESCE(q_direct.original_question_number, d.original_question_number) as original_question_number,
-                        COUNT(DISTINCT vr.model_name) AS models_count,
-                        SUM(CASE WHEN vr.matches_expected IS TRUE THEN 1 ELSE 0 END) AS matching_models,
-                        q.question_text AS original_question_text,
-                        (SELECT STRING_AGG(d2.question_text, '||')
-                         FROM duplicates d2
-                         WHERE d2.representative_id = eq.question_id
-                         AND d2.file_path = :file_path) AS duplicate_question_texts
-                    FROM enhanced_questions eq
-                    JOIN questions q ON q.id = eq.question_id
-                    LEFT JOIN verification_results vr ON eq.id = vr.question_id
-                    LEFT JOIN questions q_direct ON 
-                        q_direct.id = eq.question_id AND 
-                        q_direct.file_path = :file_path
-                    LEFT JOIN duplicates d ON 
-                        d.representative_id = eq.question_id AND 
-                        d.file_path = :file_path
-                    WHERE 
-                        q_direct.id IS NOT NULL OR d.representative_id IS NOT NULL
-                    GROUP BY 
-                        eq.id, eq.question_id, eq.enhanced_text, eq.category, eq.status, 
-                        eq.requires_image, eq.image_url, q.file_path, 
-                        q_direct.array_order, d.array_order,
-                        q_direct.page, d.page, q_direct.original_question_number, d.original_question_number,
-                        q.question_text
-                    ORDER BY COALESCE(q_direct.array_order, d.array_order)
-                """)
-                df = pd.read_sql_query(query, conn, params={'file_path': file_path_filter})
-            else:
-                query = text("""
-                    SELECT 
-                        eq.id,
-                        eq.question_id,
-                        eq.enhanced_text,
-                        eq.category,
-                        eq.status,
-                        eq.requires_image,
-                        eq.image_url,
-                        q.file_path AS representative_file_path,
-                        q.page AS page,
-                        q.original_question_number AS original_question_number,
-                        COUNT(DISTINCT vr.model_name) AS models_count,
-                        SUM(CASE WHEN vr.matches_expected IS TRUE THEN 1 ELSE 0 END) AS matching_models,
-                        q.question_text AS original_question_text,
-                        (SELECT STRING_AGG(d.question_text, '||')
-                         FROM duplicates d
-                         WHERE d.representative_id = eq.question_id) AS duplicate_question_texts
-                    FROM enhanced_questions eq
-                    JOIN questions q ON q.id = eq.question_id
-                    LEFT JOIN verification_results vr ON eq.id = vr.question_id
-                    GROUP BY eq.id, eq.question_id, eq.enhanced_text, eq.category, eq.status, 
-                             eq.requires_image, eq.image_url, q.file_path, q.page, q.original_question_number,
-                             q.question_text
-                    ORDER BY eq.id
-                """)
-                df = pd.read_sql_query(query, conn)
-            
-            logger.info(f"Retrieved {len(df)} questions{' for file ' + file_path_filter if file_path_filter else ''}")
-
-            all_files_query = text("""
-                SELECT DISTINCT file_path
-                FROM (
-                    SELECT q.file_path 
-                    FROM questions q
-                    JOIN enhanced_questions eq ON q.id = eq.question_id
-                    UNION
-                    SELECT d.file_path
-                    FROM duplicates d
-                    JOIN enhanced_questions eq ON d.representative_id = eq.question_id
-                ) AS files
-                ORDER BY file_path
-            """)
-            all_files_df = pd.read_sql_query(all_files_query, conn)
-            all_file_paths = all_files_df['file_path'].tolist()
-
-            return {
-                'questions': df.to_dict(orient='records'),
-                'available_files': all_file_paths
-            }
+            query, params = _build_questions_query(file_path_filter, filters, cursor_values, page_size)
+            questions = [dict(row._mapping) for row in conn.execute(query, params)]
+
+            next_cursor = None
+            if page_size and len(questions) > page_size:
+                questions = questions[:page_size]
+                last = questions[-1]
+                if file_path_filter:
+                    array_order = NULL_ARRAY_ORDER if last['array_order'] is None else last['array_order']
+                    next_cursor = _encode_cursor([array_order, last['id']])
+                else:
+                    next_cursor = _encode_cursor([last['id']])
+
+            logger.info(f"Retrieved {len(questions)} questions{' for file ' + file_path_filter if file_path_filter else ''}")
+
+            result = {'questions': questions}
+            if page_size:
+                result['next_cursor'] = next_cursor
+
+            # Later pages reuse the file list the client got with the first one
+            if cursor_values is None:
+                _attach_available_files(result, conn, files_etag)
+                if include_facets:
+                    _attach_facets(result, conn, file_path_filter)
+
+            return result
     except SQLAlchemyError as e:
         logger.exception("Database error in get_questions")
         return {'error': 'An unexpected database error occurred'}
 
 
-def get_question_details(engine, question_id, file_path_filter=None):
-    try:
+def stream_questions(engine, file_path_filter=None, filters=None, files_etag=None):
+    query, params = _build_questions_query(file_path_filter, filters or {}, None, None)
+    return stream_query_as_json(
+        engine, query, params,
+        key='questions',
+        extra=lambda conn: _attach_available_files({}, conn, files_etag)
+    )
+
+
+QUESTION_DETAILS_QUERY = text("""
+    WITH target AS (
+        SELECT eq.id, eq.question_id, eq.enhanced_text, eq.category, eq.status, eq.explanation,
+               eq.requires_image, eq.image_url,
+               q.question_text AS original_question_text,
+               q.file_path, q.page, q.original_question_number
+        FROM enhanced_questions eq
+        JOIN questions q ON q.id = eq.question_id
+        WHERE eq.id = ANY(:question_ids)
+    )
+    SELECT t.id, json_build_object(
+        'id', t.id,
+        'enhanced_text', t.enhanced_text,
+        'original_question_text', t.original_question_text,
+        'category', t.category,
+        'status', t.status,
+        'explanation', t.explanation,
+        'requires_image', t.requires_image,
+        'image_url', t.image_url,
+        'file_path', COALESCE(fd.file_path, t.file_path),
+        'page', COALESCE(fd.page, t.page),
+        'question_number', COALESCE(fd.original_question_number, t.original_question_number),
+        'file_locations', COALESCE(loc.items, '[]'::json),
+        'choices', COALESCE(ch.texts, '[]'::json),
+        'is_correct', COALESCE(ch.flags, '[]'::json),
+        'models_count', COALESCE(vr.models_count, 0),
+        'verification_results', COALESCE(vr.items, '[]'::json)
+    ) AS details
+    FROM target t
+    LEFT JOIN LATERAL (
+        SELECT d.file_path, d.page, d.original_question_number
+        FROM duplicates d
+        WHERE d.representative_id = t.question_id
+          AND (:file_path = '' OR d.file_path = :file_path)
+        ORDER BY d.file_path, d.array_order
+        LIMIT 1
+    ) fd ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT json_agg(ec.choice_text ORDER BY ec.id) AS texts,
+               json_agg(ec.is_correct::BOOLEAN::TEXT ORDER BY ec.id) AS flags
+        FROM enhanced_choices ec
+        WHERE ec.enhanced_question_id = t.id
+    ) ch ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT json_agg(json_build_object(
+                   'file_path', l.file_path,
+                   'array_order', l.array_order,
+                   'page', l.page,
+                   'question_number', l.original_question_number,
+                   'question_type', l.question_type
+               ) ORDER BY l.file_path, l.array_order) AS items
+        FROM (
+            SELECT q.file_path, q.array_order, q.page, q.original_question_number,
+                   'representative' AS question_type
+            FROM questions q
+            WHERE q.id = t.question_id
+            UNION ALL
+            SELECT d.file_path, d.array_order, d.page, d.original_question_number,
+                   'duplicate_rep' AS question_type
+            FROM duplicates d
+            WHERE d.representative_id = t.question_id
+        ) l
+    ) loc ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT COUNT(*) AS models_count,
+               json_agg(json_build_object(
+                   'model_name', v.model_name,
+                   'selected_index', v.selected_index,
+                   'expected_index', v.expected_index,
+                   'matches_expected', v.matches_expected,
+                   'suggested_answer', COALESCE(v.suggested_answer, ''),
+                   'error', COALESCE(v.error, '')
+               ) ORDER BY v.model_name) AS items
+        FROM verification_results v
+        WHERE v.question_id = t.id
+    ) vr ON TRUE
+""")
+
+
+MAX_DETAILS_BATCH = 50
+
+# Detail documents keyed by "<question_id>:<file_path>" and grouped by question id.
+# Without the shared tier each worker only sees its own invalidations, so another
+# worker's edit is picked up on expiry; with it, every worker sees them on the next read
+details_cache = cache_namespace(
+    'question_details', maxsize=Config.DETAILS_CACHE_SIZE, ttl=Config.DETAILS_CACHE_TTL,
+    group_of=lambda key: key.split(':', 1)[0]
+)
+
+
+def _details_cache_key(question_id, file_path_filter):
+    return f"{question_id}:{file_path_filter or ''}"
+
+
+def invalidate_question_details(question_id):
+    invalidate_questions_details([question_id])
+
+
+def invalidate_questions_details(question_ids):
+    # Each question's documents (one per file_path) form a group dropped in one call
+    details_cache.delete_groups(question_ids)
+
+
+def clear_question_details_cache():
+    details_cache.clear()
+
+
+def get_details_cache_stats():
+    return details_cache.get_stats()
+
+
+def _fetch_question_details(conn, question_ids, file_path_filter=None):
+    rows = conn.execute(QUESTION_DETAILS_QUERY, {
+        'question_ids': list(question_ids),
+        'file_path': file_path_filter or ''
+    })
+    return {row.id: row.details for row in rows}
+
+
+def _get_cached_question_details(engine, question_ids, file_path_filter=None, use_cache=True):
+    if not use_cache:
         with engine.connect() as conn:
-            query = text("""
-                SELECT eq.enhanced_text, eq.category, eq.status, eq.explanation,
-                       eq.requires_image, eq.image_url,
-                       STRING_AGG(ec.choice_text, '||') AS choices,
-                       STRING_AGG(ec.is_correct::BOOLEAN::TEXT, '||') AS is_correct,
-                       q.question_text AS original_question_text
-                FROM enhanced_questions eq
-                JOIN questions q ON q.id = eq.question_id
-                LEFT JOIN enhanced_choices ec ON eq.id = ec.enhanced_question_id
-                WHERE eq.id = :question_id
-                GROUP BY eq.id, eq.enhanced_text, eq.category, eq.status, eq.explanation,
-                         eq.requires_image, eq.image_url, q.question_text
-            """)
-            result = conn.execute(query, {'question_id': question_id})
-            row = result.fetchone()
-            if not row:
-                logger.warning(f"Question {question_id} not found")
-                return {'error': 'Question not found'}
-
-            q_text, category, status, explanation, requires_image, image_url, \
-            choices_text, is_correct_text, original_question_text = row
-
-            # Determine file information based on file_path_filter
-            file_query = text("""
-                SELECT 
-                    COALESCE(d.file_path, q.file_path) AS file_path,
-                    COALESCE(d.page, q.page) AS page,
-                    COALESCE(d.original_question_number, q.original_question_number) AS question_number
-                FROM questions q
-                LEFT JOIN duplicates d ON d.representative_id = q.id
-                    AND (:file_path = '' OR d.file_path = :file_path)
-                WHERE q.id = (
-                    SELECT question_id FROM enhanced_questions WHERE id = :question_id
-                )
-            """)
-            file_result = conn.execute(file_query, {
-                'question_id': question_id,
-                'file_path': file_path_filter or ''
-            }).fetchone()
-            if not file_result:
-                logger.warning(f"No file information found for question {question_id}")
-                return {'error': 'No file information found'}
-            file_path, page, question_number = file_result
-
-            file_data_query = text("""
-                SELECT 
-                    q.file_path, 
-                    q.array_order,
-                    q.page,
-                    q.original_question_number,
-                    'representative' AS question_type
-                FROM questions q
-                WHERE q.id = (
-                    SELECT question_id FROM enhanced_questions WHERE id = :question_id
-                )
-                UNION ALL
-                SELECT 
-                    d.file_path,
-                    d.array_order,
-                    d.page,
-                    d.original_question_number,
-                    'duplicate_rep' AS question_type
-                FROM duplicates d
-                WHERE d.representative_id = (
-                    SELECT question_id FROM enhanced_questions WHERE id = :question_id
-                )
-                ORDER BY file_path, array_order
-            """)
-            file_data_rows = conn.execute(file_data_query, {'question_id': question_id}).fetchall()
-            file_locations = [
-                {
-                    'file_path': file_path,
-                    'array_order': array_order,
-                    'page': page,
-                    'question_number': question_number,
-                    'question_type': question_type
-                }
-                for file_path, array_order, page, question_number, question_type in file_data_rows
-            ]
+            return _fetch_question_details(conn, question_ids, file_path_filter)
 
-            verification_results_query = text("""
-                SELECT 
-                    vr.model_name,
-                    vr.selected_index,
-                    vr.expected_index,
-                    vr.matches_expected,
-                    COALESCE(vr.suggested_answer, '') AS suggested_answer,
-                    COALESCE(vr.error, '') AS error
-                FROM verification_results vr
-                WHERE vr.question_id = :question_id
-                ORDER BY vr.model_name
-            """)
-            verification_results = conn.execute(verification_results_query, {'question_id': question_id}).fetchall()
-            models_count = len(verification_results)
-            verification_results_dict = [
-                {
-                    'model_name': model_name,
-                    'selected_index': selected_index,
-                    'expected_index': expected_index,
-                    'matches_expected': matches_expected,
-                    'suggested_answer': suggested_answer,
-                    'error': error
-                }
-                for model_name, selected_index, expected_index, matches_expected, suggested_answer, error in verification_results
-            ]
+    keys = {question_id: _details_cache_key(question_id, file_path_filter) for question_id in question_ids}
+    # The tokens are read before the database, so a document loaded just before a
+    # concurrent edit commits and invalidates is never stored or served
+    cached, tokens = details_cache.get_many_versioned(list(keys.values()))
+    details = {question_id: cached[key] for question_id, key in keys.items() if key in cached}
 
-            return {
-                'id': question_id,
-                'enhanced_text': q_text,
-                'original_question_text': original_question_text,
-                'category': category,
-                'status': status,
-                'explanation': explanation,
-                'requires_image': requires_image,
-                'image_url': image_url,
-                'file_path': file_path,
-                'page': page,
-                'question_number': question_number,
-                'file_locations': file_locations,
-                'choices': choices_text.split('||') if choices_text else [],
-                'is_correct': is_correct_text.split('||') if is_correct_text else [],
-                'models_count': models_count,
-                'verification_results': verification_results_dict
-            }
+    missing = [question_id for question_id in question_ids if question_id not in details]
+    if missing:
+        with engine.connect() as conn:
+            fetched = _fetch_question_details(conn, missing, file_path_filter)
+        if tokens is not None:
+            details_cache.set_many({keys[question_id]: document for question_id, document in fetched.items()}, tokens)
+        details.update(fetched)
+    return details
+
+
+def get_question_details(engine, question_id, file_path_filter=None, use_cache=True):
+    # use_cache=False is for read-modify-write callers that post the document back
+    try:
+        # The whole detail document is assembled by Postgres in a single round trip
+        details = _get_cached_question_details(engine, [question_id], file_path_filter, use_cache).get(question_id)
+        if not details:
+            logger.warning(f"Question {question_id} not found")
+            return {'error': 'Question not found'}
+        return details
     except SQLAlchemyError as e:
         logger.exception("Database error in get_question_details")
         return {'error': 'An unexpected database error occurred'}
 
+
+def get_questions_details(engine, question_ids, file_path_filter=None):
+    if not question_ids:
+        return {'error': 'Missing ids parameter'}
+    if len(question_ids) > MAX_DETAILS_BATCH:
+        return {'error': f'Invalid ids parameter: at most {MAX_DETAILS_BATCH} ids per request'}
+    # Keep the caller's order (the reviewer's navigation order) and drop repeats
+    question_ids = list(dict.fromkeys(question_ids))
+    try:
+        details = _get_cached_question_details(engine, question_ids, file_path_filter)
+        return {
+            'questions': [details[question_id] for question_id in question_ids if question_id in details],
+            'missing': [question_id for question_id in question_ids if question_id not in details]
+        }
+    except SQLAlchemyError as e:
+        logger.exception("Database error in get_questions_details")
+        return {'error': 'An unexpected database error occurred'}
+
+
+def consensus_thresholds(overrides=None):
+    # Share of agreeing models needed for each status: ratio >= verified,
+    # ratio > likely_correct, ratio <= incorrect, anything else needs review
+    thresholds = {
+        'verified': Config.CONSENSUS_VERIFIED_RATIO,
+        'likely_correct': Config.CONSENSUS_LIKELY_RATIO,
+        'incorrect': Config.CONSENSUS_INCORRECT_RATIO
+    }
+    if overrides is not None and not isinstance(overrides, dict):
+        raise ValueError("Thresholds must be an object")
+    for key, value in (overrides or {}).items():
+        if key not in thresholds:
+            raise ValueError(f"Unknown threshold '{key}'")
+        thresholds[key] = float(value)
+    if not all(0 <= value <= 1 for value in thresholds.values()):
+        raise ValueError("Thresholds must be between 0 and 1")
+    if not thresholds['incorrect'] <= thresholds['likely_correct'] <= thresholds['verified']:
+        raise ValueError("Thresholds must satisfy incorrect <= likely_correct <= verified")
+    return thresholds
+
+
+def _threshold_params(thresholds):
+    return {
+        'verified_ratio': thresholds['verified'],
+        'likely_ratio': thresholds['likely_correct'],
+        'incorrect_ratio': thresholds['incorrect']
+    }
+
+
+def classify_consensus(model_count, agreement_count, thresholds=None):
+    thresholds = thresholds or consensus_thresholds()
+    if not model_count:
+        return "needs_review"
+    agreement_count = agreement_count or 0
+    if agreement_count >= model_count * thresholds['verified']:
+        return "verified"
+    elif agreement_count > model_count * thresholds['likely_correct']:
+        return "likely_correct"
+    elif agreement_count <= model_count * thresholds['incorrect']:
+        return "incorrect"
+    return "needs_review"
+
+
+CONSENSUS_UPSERT = text("""
+    INSERT INTO question_consensus (question_id, models_count, matching_models, consensus_status, updated_at)
+    VALUES (:question_id, :models_count, :matching_models, :consensus_status, NOW())
+    ON CONFLICT (question_id) DO UPDATE
+    SET models_count = EXCLUDED.models_count,
+        matching_models = EXCLUDED.matching_models,
+        consensus_status = EXCLUDED.consensus_status,
+        updated_at = EXCLUDED.updated_at
+""")
+
+
+def _refresh_consensus(conn, question_id):
+    # Runs on the caller's connection so the summary commits with the verification rewrite
+    row = conn.execute(text("""
+        SELECT COUNT(DISTINCT model_name) AS model_count,
+               SUM(CASE WHEN matches_expected IS TRUE THEN 1 ELSE 0 END) AS agreement_count
+        FROM verification_results
+        WHERE question_id = :question_id
+    """), {'question_id': question_id}).fetchone()
+    model_count, agreement_count = row
+    consensus_status = classify_consensus(model_count, agreement_count)
+    conn.execute(CONSENSUS_UPSERT, {
+        'question_id': question_id,
+        'models_count': model_count or 0,
+        'matching_models': agreement_count or 0,
+        'consensus_status': consensus_status
+    })
+    return consensus_status
+
+
+# SQL mirror of classify_consensus; needs the _threshold_params binds
+CONSENSUS_SELECT = """
+    SELECT
+        c.question_id,
+        c.models_count,
+        c.matching_models,
+        CASE
+            WHEN c.models_count = 0 THEN 'needs_review'
+            WHEN c.matching_models >= c.models_count * CAST(:verified_ratio AS FLOAT) THEN 'verified'
+            WHEN c.matching_models > c.models_count * CAST(:likely_ratio AS FLOAT) THEN 'likely_correct'
+            WHEN c.matching_models <= c.models_count * CAST(:incorrect_ratio AS FLOAT) THEN 'incorrect'
+            ELSE 'needs_review'
+        END AS consensus_status,
+        NOW() AS updated_at
+    FROM (
+        SELECT
+            eq.id AS question_id,
+            COUNT(DISTINCT vr.model_name) AS models_count,
+            COALESCE(SUM(CASE WHEN vr.matches_expected IS TRUE THEN 1 ELSE 0 END), 0) AS matching_models
+        FROM enhanced_questions eq
+        LEFT JOIN verification_results vr ON vr.question_id = eq.id
+        {where}
+        GROUP BY eq.id
+    ) c
+"""
+
+
+def _refresh_consensus_many(conn, question_ids):
+    # Set-based counterpart of _refresh_consensus; also copies the derived status onto the questions
+    conn.execute(text(f"""
+        INSERT INTO question_consensus (question_id, models_count, matching_models, consensus_status, updated_at)
+        {CONSENSUS_SELECT.format(where="WHERE eq.id = ANY(:question_ids)")}
+        ON CONFLICT (question_id) DO UPDATE
+        SET models_count = EXCLUDED.models_count,
+            matching_models = EXCLUDED.matching_models,
+            consensus_status = EXCLUDED.consensus_status,
+            updated_at = EXCLUDED.updated_at
+    """), {'question_ids': list(question_ids), **_threshold_params(consensus_thresholds())})
+    conn.execute(text("""
+        UPDATE enhanced_questions eq
+        SET status = qc.consensus_status
+        FROM question_consensus qc
+        WHERE qc.question_id = eq.id AND eq.id = ANY(:question_ids)
+    """), {'question_ids': list(question_ids)})
+
+
+def rebuild_question_consensus(engine):
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM question_consensus"))
+            result = conn.execute(text(f"""
+                INSERT INTO question_consensus (question_id, models_count, matching_models, consensus_status, updated_at)
+                {CONSENSUS_SELECT.format(where="")}
+            """), _threshold_params(consensus_thresholds()))
+            rebuilt = result.rowcount
+        logger.info(f"Rebuilt consensus summary for {rebuilt} questions")
+        return {'rebuilt': rebuilt}
+    except SQLAlchemyError as e:
+        logger.exception("Database error in rebuild_question_consensus")
+        return {'error': 'An unexpected database error occurred'}
+
+
+def recompute_consensus(engine, thresholds=None, dry_run=True, protected_statuses=None):
+    try:
+        thresholds = consensus_thresholds(thresholds)
+    except (TypeError, ValueError) as e:
+        return {'error': f'Invalid thresholds: {e}'}
+    if protected_statuses is None:
+        protected_statuses = Config.CONSENSUS_PROTECTED_STATUSES
+
+    timings = {}
+    started = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            with conn.begin() as transaction:
+                # Classify the whole bank once into a scratch table, then diff and apply from it
+                conn.execute(text(f"""
+                    CREATE TEMP TABLE consensus_recompute ON COMMIT DROP AS
+                    {CONSENSUS_SELECT.format(where="")}
+                """), _threshold_params(thresholds))
+                timings['classify_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+                step = time.perf_counter()
+                change_filter = """
+                    FROM enhanced_questions eq
+                    JOIN consensus_recompute cr ON cr.question_id = eq.id
+                    WHERE eq.status IS DISTINCT FROM cr.consensus_status
+                      AND NOT (COALESCE(eq.status, '') = ANY(:protected_statuses))
+                """
+                params = {'protected_statuses': list(protected_statuses)}
+                transitions = [{
+                    'from': row.old_status,
+                    'to': row.new_status,
+                    'count': row.count
+                } for row in conn.execute(text(f"""
+                    SELECT eq.status AS old_status, cr.consensus_status AS new_status, COUNT(*) AS count
+                    {change_filter}
+                    GROUP BY eq.status, cr.consensus_status
+                    ORDER BY count DESC
+                """), params)]
+                total = conn.execute(text("SELECT COUNT(*) FROM consensus_recompute")).scalar()
+                timings['diff_ms'] = round((time.perf_counter() - step) * 1000, 1)
+
+                if dry_run:
+                    transaction.rollback()
+                else:
+                    step = time.perf_counter()
+                    conn.execute(text("DELETE FROM question_consensus"))
+                    conn.execute(text("""
+                        INSERT INTO question_consensus (question_id, models_count, matching_models, consensus_status, updated_at)
+                        SELECT question_id, models_count, matching_models, consensus_status, updated_at
+                        FROM consensus_recompute
+                    """))
+                    conn.execute(text("""
+                        UPDATE enhanced_questions eq
+                        SET status = cr.consensus_status
+                        FROM consensus_recompute cr
+                        WHERE cr.question_id = eq.id
+                          AND eq.status IS DISTINCT FROM cr.consensus_status
+                          AND NOT (COALESCE(eq.status, '') = ANY(:protected_statuses))
+                    """), params)
+                    timings['apply_ms'] = round((time.perf_counter() - step) * 1000, 1)
+    except SQLAlchemyError as e:
+        logger.exception("Database error in recompute_consensus")
+        return {'error': 'An unexpected database error occurred'}
+
+    if not dry_run:
+        clear_question_details_cache()
+    timings['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    changed = sum(transition['count'] for transition in transitions)
+    logger.info(f"Consensus recompute ({'dry run' if dry_run else 'applied'}): "
+                f"{changed} of {total} questions change status in {timings['total_ms']} ms")
+    return {
+        'dry_run': dry_run,
+        'thresholds': thresholds,
+        'protected_statuses': list(protected_statuses),
+        'total': total,
+        'changed': changed,
+        'transitions': transitions,
+        'timings': timings
+    }
+
+
+def _diff_choices(question_id, old_choices, choices):
+    # Choices are positional (ordered by id): rewrite changed rows in place, append
+    # new ones and trim the surplus, instead of deleting and reinserting them all
+    updates = []
+    for old, new in zip(old_choices, choices):
+        choice_text = new.get('text')
+        is_correct = bool(new.get('is_correct'))
+        if old.choice_text != choice_text or bool(old.is_correct) != is_correct:
+            updates.append({'id': old.id, 'choice_text': choice_text, 'is_correct': is_correct})
+    inserts = [{
+        'question_id': question_id,
+        'choice_text': choice.get('text'),
+        'is_correct': bool(choice.get('is_correct'))
+    } for choice in choices[len(old_choices):]]
+    removed_ids = [old.id for old in old_choices[len(choices):]]
+    return updates, inserts, removed_ids
+
+
+def _write_choice_changes(conn, updates, inserts, removed_ids):
+    # Each kind of change is one statement over a JSON array of rows; a list of
+    # parameter sets would go out as a per-row executemany for text() SQL
+    if removed_ids:
+        conn.execute(text("DELETE FROM enhanced_choices WHERE id = ANY(:ids)"), {'ids': removed_ids})
+    if updates:
+        conn.execute(text("""
+            UPDATE enhanced_choices ec
+            SET choice_text = v.choice_text, is_correct = v.is_correct
+            FROM jsonb_to_recordset(CAST(:rows AS jsonb)) AS v(id INTEGER, choice_text TEXT, is_correct BOOLEAN)
+            WHERE ec.id = v.id
+        """), {'rows': json.dumps(updates)})
+    if inserts:
+        # Choices are ordered by id, so new rows are inserted in list order
+        conn.execute(text("""
+            INSERT INTO enhanced_choices (enhanced_question_id, choice_text, is_correct)
+            SELECT v.question_id, v.choice_text, v.is_correct
+            FROM ROWS FROM (
+                jsonb_to_recordset(CAST(:rows AS jsonb)) AS (question_id INTEGER, choice_text TEXT, is_correct BOOLEAN)
+            ) WITH ORDINALITY AS v(question_id, choice_text, is_correct, position)
+            ORDER BY v.position
+        """), {'rows': json.dumps(inserts)})
+
+
+def _apply_choice_changes(conn, question_id, old_choices, choices):
+    _write_choice_changes(conn, *_diff_choices(question_id, old_choices, choices))
+
+
 def update_question(engine, question_id, data):
     new_text = data.get('enhanced_text')
     new_category = data.get('category')
@@ -248,6 +719,7 @@ def update_question(engine, question_id, data):
     if not all(choice.get('text') for choice in choices):
         return {'error': 'All choices must have non-empty text'}
     
+    explanation_job = None
     try:
         with engine.begin() as conn:
             result = conn.execute(text("SELECT explanation FROM enhanced_questions WHERE id = :question_id"),
@@ -256,14 +728,14 @@ def update_question(engine, question_id, data):
             current_explanation = current_explanation_row[0] if current_explanation_row else None
             
             result = conn.execute(text("""
-                SELECT choice_text, is_correct 
+                SELECT id, choice_text, is_correct 
                 FROM enhanced_choices 
                 WHERE enhanced_question_id = :question_id
                 ORDER BY id
             """), {'question_id': question_id})
             old_choices = result.fetchall()
-            old_correct_index = next((i for i, choice in enumerate(old_choices) if choice[1]), None)
-            old_correct_text = old_choices[old_correct_index][0] if old_correct_index is not None else None
+            old_correct_index = next((i for i, choice in enumerate(old_choices) if choice.is_correct), None)
+            old_correct_text = old_choices[old_correct_index].choice_text if old_correct_index is not None else None
             
             new_choices_text = [choice.get('text') for choice in choices]
             correct_index = next((i for i, choice in enumerate(choices) if bool(choice.get('is_correct'))), None)
@@ -273,21 +745,10 @@ def update_question(engine, question_id, data):
             if new_explanation and new_explanation != current_explanation:
                 final_explanation = new_explanation
             elif correct_changed and correct_index is not None:
-                correct_answer = new_choices_text[correct_index]
-                choices_text = "\n".join([f"{i+1}. {choice}" for i, choice in enumerate(new_choices_text)])
-                prompt = (
-                    f"Generate a concise explanation (3-4 sentences) for why '{correct_answer}' is the correct answer without referring to index numbers. "
-                    f"to the following question: {new_text}\nChoices:\n{choices_text}"
-                )
-                try:
-                    response = client.models.generate_content(
-                        model="gemini-2.0-flash",
-                        contents=[prompt]
-                    )
-                    final_explanation = response.text.strip()
-                except Exception as e:
-                    logger.exception("Error generating explanation with Gemini")
-                    return {'error': 'Failed to generate explanation'}
+                # The old explanation argues for the previous answer; clear it and let a
+                # background job write the new one once the model responds
+                final_explanation = None
+                explanation_job = create_explanation_job(conn, question_id)
             else:
                 final_explanation = current_explanation
             
@@ -305,19 +766,9 @@ def update_question(engine, question_id, data):
                 'requires_image': data.get('requires_image', False),
                 'question_id': question_id
             })
+            refresh_search_document(conn, question_id)
             
-            conn.execute(text("DELETE FROM enhanced_choices WHERE enhanced_question_id = :question_id"),
-                         {'question_id': question_id})
-            
-            for choice in choices:
-                conn.execute(text("""
-                    INSERT INTO enhanced_choices (enhanced_question_id, choice_text, is_correct)
-                    VALUES (:question_id, :choice_text, :is_correct)
-                """), {
-                    'question_id': question_id,
-                    'choice_text': choice.get('text'),
-                    'is_correct': bool(choice.get('is_correct'))
-                })
+            _apply_choice_changes(conn, question_id, old_choices, choices)
             
             if correct_changed and correct_index is not None:
                 conn.execute(text("""
@@ -327,31 +778,182 @@ def update_question(engine, question_id, data):
                     WHERE question_id = :question_id
                 """), {'correct_index': correct_index, 'question_id': question_id})
                 
-                result = conn.execute(text("""
-                    SELECT COUNT(DISTINCT model_name) AS model_count,
-                           SUM(CASE WHEN matches_expected IS TRUE THEN 1 ELSE 0 END) AS agreement_count
-                    FROM verification_results
-                    WHERE question_id = :question_id
-                """), {'question_id': question_id})
-                row = result.fetchone()
-                if row:
-                    model_count, agreement_count = row
-                    if model_count and agreement_count == model_count:
-                        new_status = "verified"
-                    elif model_count and agreement_count > model_count / 2:
-                        new_status = "likely_correct"
-                    elif agreement_count == 0:
-                        new_status = "incorrect"
-                    else:
-                        new_status = "needs_review"
-                    conn.execute(text("UPDATE enhanced_questions SET status = :new_status WHERE id = :question_id"),
-                                 {'new_status': new_status, 'question_id': question_id})
-        return {'explanation': final_explanation}
+                new_status = _refresh_consensus(conn, question_id)
+                conn.execute(text("UPDATE enhanced_questions SET status = :new_status WHERE id = :question_id"),
+                             {'new_status': new_status, 'question_id': question_id})
+        invalidate_question_details(question_id)
+        if explanation_job:
+            submit_explanation_job(
+                engine, explanation_job, question_id, new_text, new_choices_text, correct_index,
+                on_written=invalidate_question_details
+            )
+        return {'explanation': final_explanation, 'explanation_job': explanation_job}
     except SQLAlchemyError as e:
         logger.exception("Database error in update_question")
         return {'error': 'An unexpected database error occurred'}
 
 
+BULK_UPDATE_FIELDS = ('enhanced_text', 'category', 'explanation', 'requires_image', 'choices')
+MAX_BULK_UPDATES = 500
+
+
+def _validate_bulk_update(item):
+    if not isinstance(item, dict):
+        return 'Each update must be an object'
+    question_id = item.get('id')
+    if not isinstance(question_id, int) or isinstance(question_id, bool):
+        return 'Missing or invalid id'
+    if not any(field in item for field in BULK_UPDATE_FIELDS):
+        return 'No fields to update'
+    # jsonb_to_recordset would store a number or object as its JSON text, so types are checked here
+    for field in ('enhanced_text', 'category', 'explanation'):
+        if field in item and not isinstance(item[field], str):
+            return f'{field} must be a string'
+    for field in ('enhanced_text', 'category'):
+        if field in item and not item[field]:
+            return f'{field} must not be empty'
+    if 'requires_image' in item and not isinstance(item['requires_image'], bool):
+        return 'requires_image must be a boolean'
+    if 'choices' in item:
+        choices = item['choices']
+        if not isinstance(choices, list) or not choices:
+            return 'choices must be a non-empty list'
+        if not all(isinstance(choice, dict) and isinstance(choice.get('text'), str) and choice['text']
+                   for choice in choices):
+            return 'All choices must have non-empty text'
+    return None
+
+
+def bulk_update_questions(engine, updates):
+    if not isinstance(updates, list) or not updates:
+        return {'error': 'Missing updates'}
+    if len(updates) > MAX_BULK_UPDATES:
+        return {'error': f'Invalid request: at most {MAX_BULK_UPDATES} updates per request'}
+
+    results = []
+    valid = []
+    seen_ids = set()
+    for item in updates:
+        error = _validate_bulk_update(item)
+        if not error and item['id'] in seen_ids:
+            error = 'Duplicate id in request'
+        result = {'id': item.get('id') if isinstance(item, dict) else None}
+        if error:
+            result.update(status='error', error=error)
+        else:
+            seen_ids.add(item['id'])
+            valid.append((item, result))
+        results.append(result)
+
+    question_ids = [item['id'] for item, _ in valid]
+    explanation_jobs = {}
+    try:
+        with engine.begin() as conn:
+            current = {row.id: row for row in conn.execute(text("""
+                SELECT id, enhanced_text FROM enhanced_questions WHERE id = ANY(:question_ids)
+            """), {'question_ids': question_ids})}
+            old_choices = {}
+            for row in conn.execute(text("""
+                SELECT id, enhanced_question_id, choice_text, is_correct
+                FROM enhanced_choices
+                WHERE enhanced_question_id = ANY(:question_ids)
+                ORDER BY enhanced_question_id, id
+            """), {'question_ids': question_ids}):
+                old_choices.setdefault(row.enhanced_question_id, []).append(row)
+
+            rows = []
+            choice_updates, choice_inserts, removed_choice_ids = [], [], []
+            answer_changes = []
+            text_changed_ids = []
+            for item, result in valid:
+                question_id = item['id']
+                if question_id not in current:
+                    result.update(status='error', error='Question not found')
+                    continue
+
+                clear_explanation = False
+                if 'choices' in item:
+                    previous = old_choices.get(question_id, [])
+                    updates_, inserts_, removed_ = _diff_choices(question_id, previous, item['choices'])
+                    choice_updates += updates_
+                    choice_inserts += inserts_
+                    removed_choice_ids += removed_
+
+                    old_correct = next(((i, c.choice_text) for i, c in enumerate(previous) if c.is_correct), None)
+                    new_correct = next(((i, c.get('text')) for i, c in enumerate(item['choices'])
+                                        if bool(c.get('is_correct'))), None)
+                    if new_correct is not None and new_correct != old_correct:
+                        answer_changes.append({'id': question_id, 'correct_index': new_correct[0]})
+                        if not item.get('explanation'):
+                            # Same as update_question: drop the stale explanation and queue a new one
+                            clear_explanation = True
+                            explanation_jobs[question_id] = (
+                                item.get('enhanced_text') or current[question_id].enhanced_text,
+                                [choice.get('text') for choice in item['choices']],
+                                new_correct[0]
+                            )
+
+                if 'enhanced_text' in item:
+                    text_changed_ids.append(question_id)
+                rows.append({
+                    'id': question_id,
+                    'enhanced_text': item.get('enhanced_text'),
+                    'category': item.get('category'),
+                    'requires_image': item.get('requires_image'),
+                    'explanation': item.get('explanation') or None,
+                    'clear_explanation': clear_explanation
+                })
+                result['status'] = 'updated'
+
+            if rows:
+                conn.execute(text("""
+                    UPDATE enhanced_questions eq
+                    SET enhanced_text = COALESCE(v.enhanced_text, eq.enhanced_text),
+                        category = COALESCE(v.category, eq.category),
+                        requires_image = COALESCE(v.requires_image, eq.requires_image),
+                        explanation = CASE WHEN v.clear_explanation THEN NULL
+                                           ELSE COALESCE(v.explanation, eq.explanation) END
+                    FROM jsonb_to_recordset(CAST(:rows AS jsonb)) AS v(
+                        id INTEGER, enhanced_text TEXT, category TEXT, requires_image BOOLEAN,
+                        explanation TEXT, clear_explanation BOOLEAN
+                    )
+                    WHERE eq.id = v.id
+                """), {'rows': json.dumps(rows)})
+            _write_choice_changes(conn, choice_updates, choice_inserts, removed_choice_ids)
+
+            if answer_changes:
+                conn.execute(text("""
+                    UPDATE verification_results vr
+                    SET expected_index = v.correct_index,
+                        matches_expected = CASE WHEN vr.selected_index = v.correct_index THEN TRUE ELSE FALSE END
+                    FROM jsonb_to_recordset(CAST(:rows AS jsonb)) AS v(id INTEGER, correct_index INTEGER)
+                    WHERE vr.question_id = v.id
+                """), {'rows': json.dumps(answer_changes)})
+                _refresh_consensus_many(conn, [change['id'] for change in answer_changes])
+            if text_changed_ids:
+                refresh_search_documents(conn, text_changed_ids)
+
+            job_ids = create_explanation_jobs(conn, list(explanation_jobs))
+    except SQLAlchemyError as e:
+        logger.exception("Database error in bulk_update_questions")
+        return {'error': 'An unexpected database error occurred'}
+
+    invalidate_questions_details([item['id'] for item, result in valid if result.get('status') == 'updated'])
+    for result in results:
+        job_id = job_ids.get(result['id']) if result.get('status') == 'updated' else None
+        if job_id:
+            question_text, choices, correct_index = explanation_jobs[result['id']]
+            submit_explanation_job(
+                engine, job_id, result['id'], question_text, choices, correct_index,
+                on_written=invalidate_question_details
+            )
+            result['explanation_job'] = job_id
+
+    updated = sum(1 for result in results if result.get('status') == 'updated')
+    logger.info(f"Bulk update applied {updated} of {len(results)} question updates")
+    return {'results': results, 'updated': updated, 'failed': len(results) - updated}
+
+
 def update_question_status(engine, question_id, status):
     try:
         with engine.begin() as conn:
@@ -360,11 +962,67 @@ def update_question_status(engine, question_id, status):
                 SET status = :status
                 WHERE id = :question_id
             """), {'question_id': question_id, 'status': status})
+        invalidate_question_details(question_id)
         return {}
     except SQLAlchemyError as e:
         logger.exception(f"Database error in update_question_status to {status}")
         return {'error': f'Database error: {str(e)}'}
 
+STATUS_TRANSITIONS = ('corrected', 'incorrect', 'needs_review')
+STATUS_FILTER_FIELDS = ('file_path', 'status', 'category')
+
+
+def bulk_update_question_status(engine, status, question_ids=None, filters=None):
+    if status not in STATUS_TRANSITIONS:
+        return {'error': 'Invalid status'}
+    if filters is not None and not isinstance(filters, dict):
+        return {'error': 'Invalid filter: expected an object'}
+    filters = {key: value for key, value in (filters or {}).items() if value not in (None, '', 'all')}
+    if any(key not in STATUS_FILTER_FIELDS for key in filters):
+        return {'error': f"Invalid filter: supported fields are {', '.join(STATUS_FILTER_FIELDS)}"}
+    if not all(isinstance(value, str) for value in filters.values()):
+        return {'error': 'Invalid filter: values must be strings'}
+    if question_ids is not None and (
+            not isinstance(question_ids, list)
+            or not all(isinstance(i, int) and not isinstance(i, bool) for i in question_ids)):
+        return {'error': 'Invalid ids: expected a list of integers'}
+    # Refuse to touch the whole bank without an explicit selection
+    if not question_ids and not filters:
+        return {'error': 'Missing ids or filter'}
+
+    conditions = ['eq.status IS DISTINCT FROM :new_status']
+    params = {'new_status': status}
+    if question_ids:
+        conditions.append('eq.id = ANY(:question_ids)')
+        params['question_ids'] = question_ids
+    if 'status' in filters:
+        conditions.append('eq.status = :current_status')
+        params['current_status'] = filters['status']
+    if 'category' in filters:
+        conditions.append('eq.category = :category')
+        params['category'] = filters['category']
+    if 'file_path' in filters:
+        conditions.append("""(
+            EXISTS (SELECT 1 FROM questions q WHERE q.id = eq.question_id AND q.file_path = :file_path)
+            OR EXISTS (SELECT 1 FROM duplicates d WHERE d.representative_id = eq.question_id AND d.file_path = :file_path)
+        )""")
+        params['file_path'] = filters['file_path']
+
+    try:
+        with engine.begin() as conn:
+            updated_ids = [row.id for row in conn.execute(text(f"""
+                UPDATE enhanced_questions eq
+                SET status = :new_status
+                WHERE {' AND '.join(conditions)}
+                RETURNING eq.id
+            """), params)]
+        invalidate_questions_details(updated_ids)
+        logger.info(f"Marked {len(updated_ids)} questions as {status}")
+        return {'updated': len(updated_ids)}
+    except SQLAlchemyError as e:
+        logger.exception(f"Database error in bulk_update_question_status to {status}")
+        return {'error': 'An unexpected database error occurred'}
+
 def mark_question_corrected(engine, question_id):
     return update_question_status(engine, question_id, 'corrected')
 
@@ -0,0 +1,45 @@
+import threading
+
+
+class ServiceRegistry:
+    """Builds expensive clients (Gemini, S3) on first use instead of at import time."""
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, factory):
+        self._factories[name] = factory
+
+    def get(self, name):
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    if name not in self._factories:
+                        raise KeyError(f"No service registered as '{name}'")
+                    instance = self._instances[name] = self._factories[name]()
+        return instance
+
+    def reset(self, name=None):
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+
+_registry = None
+
+
+def set_registry(registry):
+    global _registry
+    _registry = registry
+
+
+def get_service(name):
+    if _registry is None:
+        raise RuntimeError("Service registry is not configured; create the app first")
+    return _registry.get(name)
@@ -0,0 +1,126 @@
+import html
+import logging
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 200
+
+# Control characters never appear in question text, so they can mark matches
+# inside ts_headline output and be swapped for <mark> after escaping
+_MATCH_START = '\x01'
+_MATCH_STOP = '\x02'
+HEADLINE_OPTIONS = f"StartSel={_MATCH_START}, StopSel={_MATCH_STOP}, MaxWords=35, MinWords=15, MaxFragments=2"
+
+# Defined in migrations/010_question_search_sync.sql, which also indexes
+# imported questions and duplicates from insert triggers; NULL ids means every question
+SEARCH_DOCUMENT_REFRESH = text("""
+    SELECT refresh_question_search(CAST(:question_ids AS INTEGER[]), CAST(:text_config AS regconfig))
+""")
+
+
+def refresh_search_documents(conn, question_ids):
+    # Runs on the caller's connection so the index commits with the edit
+    conn.execute(SEARCH_DOCUMENT_REFRESH, {
+        'question_ids': list(question_ids),
+        'text_config': Config.SEARCH_TEXT_CONFIG
+    })
+
+
+def refresh_search_document(conn, question_id):
+    refresh_search_documents(conn, [question_id])
+
+
+def rebuild_search_index(engine):
+    try:
+        with engine.begin() as conn:
+            indexed = conn.execute(SEARCH_DOCUMENT_REFRESH, {
+                'question_ids': None,
+                'text_config': Config.SEARCH_TEXT_CONFIG
+            }).scalar()
+        logger.info(f"Rebuilt search documents for {indexed} questions")
+        return {'indexed': indexed}
+    except SQLAlchemyError as e:
+        logger.exception("Database error in rebuild_search_index")
+        return {'error': 'An unexpected database error occurred'}
+
+
+def _highlight(snippet):
+    return (html.escape(snippet or '')
+            .replace(_MATCH_START, '<mark>')
+            .replace(_MATCH_STOP, '</mark>'))
+
+
+def search_questions(engine, query_text, file_path_filter=None, limit=None):
+    query_text = (query_text or '').strip()
+    if not query_text:
+        return {'error': 'Missing search query'}
+    limit = min(limit or DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT)
+    if limit < 1:
+        return {'error': 'Invalid limit'}
+
+    file_condition = ""
+    params = {
+        'query': query_text,
+        'text_config': Config.SEARCH_TEXT_CONFIG,
+        'headline_options': HEADLINE_OPTIONS,
+        'limit': limit
+    }
+    if file_path_filter:
+        file_condition = """
+            AND (
+                EXISTS (SELECT 1 FROM questions q WHERE q.id = eq.question_id AND q.file_path = :file_path)
+                OR EXISTS (SELECT 1 FROM duplicates d WHERE d.representative_id = eq.question_id AND d.file_path = :file_path)
+            )
+        """
+        params['file_path'] = file_path_filter
+
+    # Rank and limit on the index first; headlines are only built for the returned rows
+    search_query = text(f"""
+        WITH search_query AS (
+            SELECT websearch_to_tsquery(CAST(:text_config AS regconfig), :query) AS tsq
+        ),
+        matches AS (
+            SELECT qs.question_id, qs.search_text, ts_rank_cd(qs.document, sq.tsq) AS rank
+            FROM question_search qs
+            CROSS JOIN search_query sq
+            JOIN enhanced_questions eq ON eq.id = qs.question_id
+            WHERE qs.document @@ sq.tsq
+            {file_condition}
+            ORDER BY rank DESC, qs.question_id
+            LIMIT :limit
+        )
+        SELECT
+            eq.id,
+            eq.enhanced_text,
+            eq.category,
+            eq.status,
+            eq.requires_image,
+            m.rank,
+            ts_headline(CAST(:text_config AS regconfig), m.search_text, sq.tsq, :headline_options) AS snippet
+        FROM matches m
+        CROSS JOIN search_query sq
+        JOIN enhanced_questions eq ON eq.id = m.question_id
+        ORDER BY m.rank DESC, eq.id
+    """)
+
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(search_query, params).fetchall()
+            results = [{
+                'id': row.id,
+                'enhanced_text': row.enhanced_text,
+                'category': row.category,
+                'status': row.status,
+                'requires_image': row.requires_image,
+                'rank': float(row.rank),
+                'snippet': _highlight(row.snippet)
+            } for row in rows]
+            logger.info(f"Search for '{query_text}' returned {len(results)} results")
+            return {'query': query_text, 'results': results}
+    except SQLAlchemyError as e:
+        logger.exception("Database error in search_questions")
+        return {'error': 'An unexpected database error occurred'}
@@ -1,20 +1,80 @@
+import json
 import logging
-import pandas as pd
-from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from services.catalog_service import CATALOG_QUERIES, get_file_catalog
 
 logger = logging.getLogger(__name__)
 
+# Rows fetched per round trip from the server-side cursor while streaming
+STREAM_BATCH_SIZE = 1000
+
+
+def stream_query_as_json(engine, query, params=None, key='rows', row_factory=None, extra=None):
+    row_factory = row_factory or (lambda row: dict(row._mapping))
+
+    def generate():
+        with engine.connect() as conn:
+            result = conn.execution_options(
+                stream_results=True, yield_per=STREAM_BATCH_SIZE
+            ).execute(query, params or {})
+            yield f'{{{json.dumps(key)}: ['
+            try:
+                first = True
+                for partition in result.partitions():
+                    chunk = ','.join(json.dumps(row_factory(row), default=str) for row in partition)
+                    yield chunk if first else ',' + chunk
+                    first = False
+                yield ']'
+                if extra:
+                    for name, value in extra(conn).items():
+                        yield f', {json.dumps(name)}: {json.dumps(value, default=str)}'
+                yield '}'
+            except SQLAlchemyError:
+                # Headers are already sent, so the client sees a truncated body
+                logger.exception(f"Database error while streaming {key}")
+                raise
+
+    stream = generate()
+    try:
+        # Run the query up front so connection and SQL errors still get a proper status
+        head = next(stream)
+    except SQLAlchemyError as e:
+        logger.exception(f"Database error opening {key} stream")
+        return {'error': 'An unexpected database error occurred'}
+
+    def resume():
+        # yield from forwards close() so a client disconnect releases the connection
+        yield head
+        yield from stream
+
+    return {'stream': resume()}
+
+
+def stream_as_sse(chunks):
+    """Wrap a text generator as server-sent events: one message per chunk, then `done` or `error`."""
+    try:
+        for chunk in chunks:
+            yield f"data: {json.dumps({'text': chunk})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    except Exception as e:
+        logger.exception("Error while streaming events")
+        yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+    finally:
+        # Reached via GeneratorExit when the client disconnects
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+
+
 def get_all_files(engine):
     try:
         with engine.connect() as conn:
-            query = text("""
-                SELECT DISTINCT file_path FROM questions
-                UNION
-                SELECT DISTINCT file_path FROM duplicates
-                ORDER BY file_path
-            """)
-            df = pd.read_sql_query(query, conn)
-            return df['file_path'].tolist()
+            catalog = get_file_catalog(conn, 'all')
+            return {'file_paths': catalog['files'], 'etag': catalog['etag']}
     except Exception as e:
         logger.exception("Error fetching all files")
-        return {'error': str(e)}
\ No newline at end of file
+        return {'error': str(e)}
+
+
+def stream_all_files(engine):
+    return stream_query_as_json(engine, CATALOG_QUERIES['all'], key='file_paths', row_factory=lambda row: row.file_path)
@@ -1,6 +1,13 @@
 // Shared state
 window.Dashboard = window.Dashboard || {};
 Dashboard.questionsData = [];
+Dashboard.questionsPageSize = 200;
+Dashboard.questionsCursor = null; // next_cursor of the last page loaded
+Dashboard.questionsRequest = 0; // bumped by each list reload, to drop stale responses
+Dashboard.loadingMoreQuestions = false;
+Dashboard.searchDelay = 300; // ms after the last keystroke before searching
+Dashboard.searchTimer = null;
+Dashboard.uniqueStatuses = [];
 Dashboard.uniqueCategories = [];
 Dashboard.categoryColors = [
   "#4c6fff", // Blue
@@ -16,6 +23,8 @@ Dashboard.categoryColors = [
 ];
 Dashboard.categoryColorMap = {};
 Dashboard.availableFilePaths = [];
+Dashboard.availableFilesEtag = null;
+Dashboard.explanationStream = null; // AbortController of the explanation being streamed
 
 // Event listeners
 function setupEventListeners() {
@@ -28,24 +37,29 @@ function setupEventListeners() {
   const questionDropdown = document.getElementById("questionDropdown");
   const filePathDropdown = document.getElementById("filePathDropdown");
 
+  // Filters apply on the server, so each change reloads the list
   if (statusDropdown)
     statusDropdown.addEventListener("change", () => {
-      Dashboard.populateQuestions();
+      Dashboard.fetchQuestions({ withFacets: false });
       Dashboard.saveFilters();
     });
   if (categoryDropdown)
     categoryDropdown.addEventListener("change", () => {
-      Dashboard.populateQuestions();
+      Dashboard.fetchQuestions({ withFacets: false });
       Dashboard.saveFilters();
     });
   if (searchInput)
     searchInput.addEventListener("input", () => {
-      Dashboard.populateQuestions();
+      clearTimeout(Dashboard.searchTimer);
+      Dashboard.searchTimer = setTimeout(
+        () => Dashboard.fetchQuestions({ withFacets: false }),
+        Dashboard.searchDelay
+      );
       Dashboard.saveFilters();
     });
   if (requiresImageDropdown)
     requiresImageDropdown.addEventListener("change", () => {
-      Dashboard.populateQuestions();
+      Dashboard.fetchQuestions({ withFacets: false });
       Dashboard.saveFilters();
     });
   if (questionDropdown)
@@ -54,7 +68,7 @@ function setupEventListeners() {
     );
   if (filePathDropdown)
     filePathDropdown.addEventListener("change", () => {
-      Dashboard.fetchQuestions().then(() => Dashboard.loadFilters());
+      Dashboard.fetchQuestions();
       Dashboard.saveFilters();
     });
 }
@@ -306,25 +306,33 @@ Dashboard.renderEditForm = function (q) {
     }
     const correctIndex = parseInt(correctChoice.value);
 
+    // Abort any earlier generation so two streams never write into the textarea
+    if (Dashboard.explanationStream) Dashboard.explanationStream.abort();
+    const controller = new AbortController();
+    Dashboard.explanationStream = controller;
+    generateButton.disabled = true;
+    explanationArea.value = "";
     try {
-      const response = await fetch("/api/generate_explanation", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
+      await Dashboard.streamExplanation(
+        {
           question_text: questionText,
           choices,
           correct_index: correctIndex,
-        }),
-      });
-      const result = await response.json();
-      if (result.status === "success") {
-        explanationArea.value = result.explanation;
-        checkFormChanges();
-      } else {
-        alert("Failed to generate explanation: " + result.error);
-      }
+        },
+        (text) => {
+          explanationArea.value += text;
+        },
+        controller.signal
+      );
+      explanationArea.value = explanationArea.value.trim();
+      checkFormChanges();
     } catch (err) {
-      Dashboard.showError("Error generating explanation.");
+      if (err.name !== "AbortError")
+        alert("Failed to generate explanation: " + err.message);
+    } finally {
+      generateButton.disabled = false;
+      if (Dashboard.explanationStream === controller)
+        Dashboard.explanationStream = null;
     }
   });
   explanationDv.appendChild(generateButton);
@@ -379,6 +387,8 @@ Dashboard.saveEdits = async function (questionId, skipSuccessMessage = false) {
     const result = await response.json();
     if (result.status === "success") {
       form.dataset.hasChanges = "false";
+      if (result.explanation_job)
+        Dashboard.pollExplanationJob(result.explanation_job, questionId);
       if (!skipSuccessMessage) alert("Update successful!");
 
       // Clear the cache entry for this question
@@ -411,3 +421,78 @@ Dashboard.saveEdits = async function (questionId, skipSuccessMessage = false) {
     return false;
   }
 };
+
+// Wait for a background explanation job and refresh the question once it is written
+Dashboard.pollExplanationJob = async function (
+  jobId,
+  questionId,
+  interval = 1500,
+  maxAttempts = 120
+) {
+  for (let attempt = 0; attempt < maxAttempts; attempt++) {
+    await new Promise((resolve) => setTimeout(resolve, interval));
+    try {
+      const response = await fetch(`/api/explanation_jobs/${jobId}`);
+      const job = await response.json();
+      if (job.error) throw new Error(job.error);
+      if (job.status === "pending" || job.status === "running") continue;
+
+      if (job.status === "done") {
+        Object.keys(Dashboard.questionDetailsCache)
+          .filter((key) => key.startsWith(`${questionId}-`))
+          .forEach((key) => delete Dashboard.questionDetailsCache[key]);
+        const questionDropdown = document.getElementById("questionDropdown");
+        if (
+          parseInt(questionDropdown.value) === questionId &&
+          !document.getElementById("editForm")
+        )
+          Dashboard.displayQuestionDetails(questionId, true);
+      } else if (job.status === "failed") {
+        console.warn(`Explanation job ${jobId} failed: ${job.error}`);
+      }
+      return job;
+    } catch (err) {
+      console.warn("Error checking explanation job:", err);
+      return null;
+    }
+  }
+  return null;
+};
+
+// Read server-sent events from the streaming explanation endpoint, calling onText per chunk
+Dashboard.streamExplanation = async function (payload, onText, signal) {
+  const response = await fetch("/api/generate_explanation/stream", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(payload),
+    signal,
+  });
+  if (!response.ok) {
+    const result = await response.json();
+    throw new Error(result.error || response.statusText);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) throw new Error("Connection closed before the explanation finished");
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const message = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = "message";
+      let data = "";
+      message.split("\n").forEach((line) => {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      });
+      const body = JSON.parse(data || "{}");
+      if (event === "done") return;
+      if (event === "error") throw new Error(body.error);
+      onText(body.text);
+    }
+  }
+};
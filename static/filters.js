@@ -36,7 +36,7 @@ Dashboard.loadFilters = function () {
       filePathDropdown.querySelector(`option[value="${filters.filePath}"]`)
     )
       filePathDropdown.value = filters.filePath;
-    Dashboard.populateQuestions();
+    Dashboard.fetchQuestions({ withFacets: false });
   }
 };
 
@@ -55,15 +55,10 @@ Dashboard.setupFilterListeners = function () {
     if (element) {
       if (id === "searchInput") {
         // For search, use input event to catch changes as user types
-        element.addEventListener("input", () => {
-          Dashboard.saveFilters();
-          Dashboard.populateQuestions(true);
-        });
+        element.addEventListener("input", Dashboard.saveFilters);
       } else {
-        element.addEventListener("change", () => {
-          Dashboard.saveFilters();
-          Dashboard.populateQuestions(true);
-        });
+        // The list itself is reloaded by the listeners in dashboard.js
+        element.addEventListener("change", Dashboard.saveFilters);
       }
     }
   });
@@ -83,7 +78,7 @@ Dashboard.populateFilters = function (preserveFilters = true) {
   // Populate status dropdown
   const statusDropdown = document.getElementById("statusDropdown");
   statusDropdown.innerHTML = '<option value="all">All Statuses</option>';
-  Array.from(new Set(Dashboard.questionsData.map((q) => q.status)))
+  Array.from(Dashboard.uniqueStatuses)
     .sort()
     .forEach((status) => {
       const option = document.createElement("option");
@@ -26,14 +26,49 @@ Dashboard.uploadImage = async function (questionId, input) {
   if (!input.files || input.files.length === 0) return;
 
   const file = input.files[0];
-  const formData = new FormData();
-  formData.append("image", file);
-
   try {
-    const response = await fetch(`/api/question/${questionId}/image`, {
+    // Ask for a presigned form, send the file straight to S3, then record it
+    const presign = await fetch(`/api/question/${questionId}/image/upload`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({
+        content_type: file.type,
+        sha256: await Dashboard.hashFile(file),
+      }),
+    });
+    const upload = await presign.json();
+    if (upload.status !== "success") {
+      alert("Error uploading image: " + (upload.error || "Unknown error"));
+      return;
+    }
+    // The same image was uploaded before and has been attached as-is
+    if (upload.deduplicated) {
+      Dashboard.displayQuestionDetails(questionId);
+      return;
+    }
+
+    const formData = new FormData();
+    Object.entries(upload.fields).forEach(([name, value]) =>
+      formData.append(name, value)
+    );
+    formData.append("file", file);
+    const s3Response = await fetch(upload.url, {
       method: "POST",
       body: formData,
     });
+    if (!s3Response.ok) {
+      alert(`Error uploading image: storage returned ${s3Response.status}`);
+      return;
+    }
+
+    const response = await fetch(
+      `/api/question/${questionId}/image/confirm`,
+      {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ key: upload.key }),
+      }
+    );
     const result = await response.json();
     if (result.status === "success") {
       Dashboard.displayQuestionDetails(questionId);
@@ -44,6 +79,18 @@ Dashboard.uploadImage = async function (questionId, input) {
   }
 };
 
+// Hex SHA-256 of a file, or null where Web Crypto is unavailable (plain HTTP)
+Dashboard.hashFile = async function (file) {
+  if (!window.crypto || !window.crypto.subtle) return null;
+  const digest = await window.crypto.subtle.digest(
+    "SHA-256",
+    await file.arrayBuffer()
+  );
+  return Array.from(new Uint8Array(digest))
+    .map((byte) => byte.toString(16).padStart(2, "0"))
+    .join("");
+};
+
 Dashboard.removeImage = async function (questionId) {
   if (!confirm("Are you sure you want to remove this image?")) return;
 
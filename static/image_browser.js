@@ -4,7 +4,7 @@ Dashboard.currentImageFile = null;
 Dashboard.currentFileFilter = null;
 Dashboard.currentQuestionData = null;
 Dashboard.availablePages = [];
-Dashboard.imageCache = new Map();
+Dashboard.fileManifests = new Map();
 
 Dashboard.openImageBrowser = async function (
   questionId,
@@ -107,29 +107,20 @@ Dashboard.openImageBrowser = async function (
 Dashboard.loadImages = async function (file, pageNumber, questionNumber) {
   const imagesGrid = document.querySelector(".images-grid");
   if (!imagesGrid) return;
+  pageNumber = Number(pageNumber);
 
-  // Ensure available pages are loaded first
-  await Dashboard.loadAvailablePages(file);
-
-  const cacheKey = `${file}:${pageNumber}:${questionNumber || ""}`;
-  if (Dashboard.imageCache.has(cacheKey)) {
-    displayImageResults(Dashboard.imageCache.get(cacheKey), questionNumber);
-    Dashboard.updatePageNavigation();
-    return;
-  }
-
-  imagesGrid.innerHTML = `<div class="loading-message">Loading images for page ${pageNumber}...</div>`;
+  if (!Dashboard.fileManifests.has(file))
+    imagesGrid.innerHTML = `<div class="loading-message">Loading images for page ${pageNumber}...</div>`;
   try {
-    const url = `/api/page_images?file_path=${encodeURIComponent(
-      file
-    )}&page_number=${pageNumber}${
-      questionNumber ? `&question_number=${questionNumber}` : ""
-    }`;
-    const response = await fetch(url);
-    if (!response.ok)
-      throw new Error(`Server responded with ${response.status}`);
-    const data = await response.json();
-    Dashboard.imageCache.set(cacheKey, data.images);
+    // The whole file's manifest is fetched once; paging is then local
+    const manifest = await Dashboard.loadFileManifest(file);
+    Dashboard.availablePages = manifest.pages.map((page) => page.page_number);
+    const page = manifest.pages.find((p) => p.page_number === pageNumber);
+    const data = {
+      images: page ? page.images : [],
+      original_query_path:
+        manifest.source_file && manifest.source_file !== file ? file : null,
+    };
 
     const pageSelector = document.querySelector(".page-selector");
     if (pageSelector) {
@@ -230,15 +221,24 @@ Dashboard.loadImageFiles = async function () {
   }
 };
 
+// One request per file: every page with its image count and images
+Dashboard.loadFileManifest = async function (filePath) {
+  if (Dashboard.fileManifests.has(filePath))
+    return Dashboard.fileManifests.get(filePath);
+  const response = await fetch(
+    `/api/file_manifest?file_path=${encodeURIComponent(filePath)}`
+  );
+  if (!response.ok)
+    throw new Error(`Failed to fetch image manifest: ${response.status}`);
+  const manifest = await response.json();
+  Dashboard.fileManifests.set(filePath, manifest);
+  return manifest;
+};
+
 Dashboard.loadAvailablePages = async function (filePath) {
   try {
-    const response = await fetch(
-      `/api/available_pages?file_path=${encodeURIComponent(filePath)}`
-    );
-    if (!response.ok)
-      throw new Error(`Failed to fetch available pages: ${response.status}`);
-    const data = await response.json();
-    Dashboard.availablePages = data.pages || [];
+    const manifest = await Dashboard.loadFileManifest(filePath);
+    Dashboard.availablePages = manifest.pages.map((page) => page.page_number);
     Dashboard.updatePageNavigation();
   } catch (err) {
     console.error("Error loading available pages:", err);
@@ -259,10 +259,16 @@ function displayImageResults(images, questionNumber) {
   images.forEach((image) => {
     const imgDiv = document.createElement("div");
     imgDiv.className = `image-item ${
-      image.is_question_image ? "highlighted" : ""
+      image.is_question_image ||
+      (questionNumber != null && image.question_number === questionNumber)
+        ? "highlighted"
+        : ""
     }`;
     const img = document.createElement("img");
-    img.src = image.url;
+    // Grid cells only need the thumbnail; the preview loads the original
+    img.src = image.thumbnail_url || image.url;
+    if (image.width && image.height)
+      img.style.aspectRatio = `${image.width} / ${image.height}`;
     img.alt = `Image ${image.question_number || ""}`;
     img.loading = "lazy";
     imgDiv.addEventListener("click", () => Dashboard.showImagePreview(image));
@@ -1,9 +1,47 @@
+Dashboard.prefetchSize = 15;
+
+// Warm the details cache for the next questions in the current filtered order
+Dashboard.prefetchQuestionDetails = async function (currentIndex) {
+  const questionDropdown = document.getElementById("questionDropdown");
+  const filePathFilter = document.getElementById("filePathDropdown").value;
+  const ids = Array.from(questionDropdown.options)
+    .slice(currentIndex + 1, currentIndex + 1 + Dashboard.prefetchSize)
+    .map((option) => option.value)
+    .filter(
+      (id) =>
+        id !== "none" &&
+        !Dashboard.questionDetailsCache[`${id}-${filePathFilter}`]
+    );
+  if (ids.length === 0) return;
+
+  const params = new URLSearchParams({ ids: ids.join(",") });
+  if (filePathFilter && filePathFilter !== "all")
+    params.set("file_path", filePathFilter);
+  try {
+    const response = await fetch(`/api/questions/details?${params}`);
+    const data = await response.json();
+    if (data.error) throw new Error(data.error);
+    data.questions.forEach((q) => {
+      Dashboard.questionDetailsCache[`${q.id}-${filePathFilter}`] = q;
+    });
+  } catch (err) {
+    // Prefetching is best effort; navigation falls back to single fetches
+    console.warn("Prefetch failed:", err);
+  }
+};
+
 Dashboard.setupQuestionNavigation = function (currentQuestionId) {
   const questionDropdown = document.getElementById("questionDropdown");
   const currentIndex = Array.from(questionDropdown.options).findIndex(
     (option) => option.value === currentQuestionId.toString()
   );
   const totalQuestions = questionDropdown.options.length;
+  // Keep a page ahead of the reviewer so the list never runs out mid-session
+  if (
+    Dashboard.questionsCursor &&
+    totalQuestions - currentIndex <= Dashboard.prefetchSize
+  )
+    Dashboard.loadMoreQuestions();
 
   const existingNav = document.querySelector(".question-nav");
   if (existingNav) existingNav.remove();
@@ -24,7 +62,9 @@ Dashboard.setupQuestionNavigation = function (currentQuestionId) {
   progress.className = "nav-progress";
   const count = document.createElement("span");
   count.className = "nav-count";
-  count.textContent = `${currentIndex + 1} / ${totalQuestions}`;
+  count.textContent = `${currentIndex + 1} / ${totalQuestions}${
+    Dashboard.questionsCursor ? "+" : ""
+  }`;
   const progressBar = document.createElement("div");
   progressBar.className = "nav-progress-bar";
   const progressFill = document.createElement("div");
@@ -81,6 +121,8 @@ Dashboard.setupQuestionNavigation = function (currentQuestionId) {
     { passive: true }
   );
 
+  Dashboard.prefetchQuestionDetails(currentIndex);
+
   controls.appendChild(prevButton);
   controls.appendChild(progress);
   controls.appendChild(nextButton);
@@ -20,31 +20,69 @@ const escapeHTML = (str) =>
 // Initialize cache
 Dashboard.questionDetailsCache = {};
 
-Dashboard.fetchQuestions = async function () {
+// Filters the list request sends; before the dropdowns are first populated,
+// the values saved in localStorage
+Dashboard.getQuestionFilters = function () {
+  const saved = JSON.parse(localStorage.getItem("dashboardFilters") || "{}");
+  const read = (id, savedValue) => {
+    const element = document.getElementById(id);
+    if (element.tagName === "SELECT" && element.options.length <= 1)
+      return savedValue || "all";
+    return element.value || "all";
+  };
+  return {
+    file_path: read(
+      "filePathDropdown",
+      saved.filePath || localStorage.getItem("lastFilePathFilter")
+    ),
+    status: read("statusDropdown", saved.status),
+    category: read("categoryDropdown", saved.category),
+    requires_image: read("requiresImageDropdown", saved.requiresImage),
+    search: document.getElementById("searchInput").value.trim(),
+  };
+};
+
+// Loads the first page of questions matching the current filters; the server
+// filters and pages, and loadMoreQuestions fetches the rest on demand.
+// withFacets also refreshes the status and category dropdowns, which only
+// change with the selected file.
+Dashboard.fetchQuestions = async function ({ withFacets = true } = {}) {
+  const request = ++Dashboard.questionsRequest;
   try {
     document.getElementById("output").innerHTML =
       "<p class='loading'>Loading questions...</p>";
 
-    const filePathFilter = document.getElementById("filePathDropdown").value;
-    const url =
-      filePathFilter && filePathFilter !== "all"
-        ? `/api/questions?file_path=${encodeURIComponent(filePathFilter)}`
-        : "/api/questions";
-    const response = await fetch(url);
+    const filters = Dashboard.getQuestionFilters();
+    const params = new URLSearchParams({ limit: Dashboard.questionsPageSize });
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value && value !== "all") params.set(key, value);
+    });
+    if (withFacets) params.set("facets", "1");
+    // Skip the file list payload when ours is still current
+    if (Dashboard.availableFilesEtag)
+      params.set("files_etag", Dashboard.availableFilesEtag);
+    const response = await fetch(`/api/questions?${params}`);
     const data = await response.json();
     if (data.error) throw new Error(data.error);
+    // A newer filter change has already been sent
+    if (request !== Dashboard.questionsRequest) return;
 
     Dashboard.questionsData = data.questions;
-    Dashboard.availableFilePaths = data.available_files || [];
-    Dashboard.uniqueCategories = [
-      ...new Set(Dashboard.questionsData.map((q) => q.category)),
-    ];
-    Dashboard.categoryColorMap = Object.fromEntries(
-      Dashboard.uniqueCategories.map((cat, i) => [
-        cat,
-        Dashboard.categoryColors[i % Dashboard.categoryColors.length],
-      ])
-    );
+    Dashboard.questionsCursor = data.next_cursor;
+    if (data.available_files) {
+      Dashboard.availableFilePaths = data.available_files;
+    }
+    Dashboard.availableFilesEtag = data.available_files_etag || null;
+    if (data.facets) {
+      Dashboard.uniqueStatuses = data.facets.statuses;
+      Dashboard.uniqueCategories = data.facets.categories;
+      Dashboard.categoryColorMap = Object.fromEntries(
+        Dashboard.uniqueCategories.map((cat, i) => [
+          cat,
+          Dashboard.categoryColors[i % Dashboard.categoryColors.length],
+        ])
+      );
+    }
     Dashboard.populateFilters();
 
     // Restore last used filter if available
@@ -59,21 +97,112 @@ Dashboard.fetchQuestions = async function () {
       }
     }
 
+    // A saved value the new dropdowns no longer offer falls back to "all";
+    // load the list that matches what is now shown
+    const shown = Dashboard.getQuestionFilters();
+    if (Object.keys(filters).some((key) => filters[key] !== shown[key])) {
+      Dashboard.saveFilters();
+      return Dashboard.fetchQuestions({ withFacets: false });
+    }
+
     Dashboard.populateQuestions();
   } catch (err) {
     Dashboard.showError(`Error loading questions: ${err.message}`);
   }
 };
 
+// Appends the next page of the current list without disturbing the selection
+Dashboard.loadMoreQuestions = async function () {
+  const request = Dashboard.questionsRequest;
+  const cursor = Dashboard.questionsCursor;
+  if (!cursor || Dashboard.loadingMoreQuestions) return;
+  Dashboard.loadingMoreQuestions = true;
+  try {
+    const filters = Dashboard.getQuestionFilters();
+    const params = new URLSearchParams({
+      limit: Dashboard.questionsPageSize,
+      cursor,
+    });
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value && value !== "all") params.set(key, value);
+    });
+    const response = await fetch(`/api/questions?${params}`);
+    const data = await response.json();
+    if (data.error) throw new Error(data.error);
+    // The filters changed while this page was loading
+    if (request !== Dashboard.questionsRequest) return;
+
+    Dashboard.questionsData.push(...data.questions);
+    Dashboard.questionsCursor = data.next_cursor;
+    const questionDropdown = document.getElementById("questionDropdown");
+    const filePathFilter = filters.file_path;
+    data.questions
+      .filter(Dashboard.matchesLoadedFilters)
+      .forEach((q) =>
+        questionDropdown.appendChild(
+          Dashboard.questionOption(q, filePathFilter)
+        )
+      );
+  } catch (err) {
+    console.warn("Loading more questions failed:", err);
+  } finally {
+    Dashboard.loadingMoreQuestions = false;
+  }
+};
+
+// The server already filtered the loaded rows; this drops the ones edited here
+// since (a status change, say) that no longer match
+Dashboard.matchesLoadedFilters = function (q) {
+  const filters = Dashboard.getQuestionFilters();
+  const matchesStatus =
+    filters.status === "all" || q.status === filters.status;
+  const matchesCategory =
+    filters.category === "all" || q.category === filters.category;
+  const matchesImageRequirement =
+    filters.requires_image === "all" ||
+    (filters.requires_image === "yes" && q.requires_image) ||
+    (filters.requires_image === "no" && !q.requires_image);
+  return matchesStatus && matchesCategory && matchesImageRequirement;
+};
+
+Dashboard.questionOption = function (q, filePathFilter) {
+  const option = document.createElement("option");
+  option.value = q.id;
+  const matchStatus =
+    q.models_count > 0
+      ? q.matching_models / q.models_count === 1
+        ? "✅ "
+        : q.matching_models / q.models_count >= 0.5
+        ? "🟡 "
+        : "❌ "
+      : "⚪ ";
+  const positionDisplay =
+    filePathFilter && filePathFilter !== "all" && q.array_order != null
+      ? `${q.array_order}: `
+      : `#${q.id}: `;
+  const fileInfo =
+    q.representative_file_path &&
+    (!filePathFilter || filePathFilter === "all")
+      ? ` [${q.representative_file_path.split("/").pop()}]`
+      : "";
+  const maxTextLength = 100;
+  const truncatedText =
+    q.enhanced_text.length > maxTextLength
+      ? q.enhanced_text.substr(0, maxTextLength) + "..."
+      : q.enhanced_text;
+  option.textContent = `${matchStatus}${positionDisplay}${truncatedText}${fileInfo}`;
+  option.className =
+    {
+      verified: "verified-option",
+      likely_correct: "likely-option",
+      needs_review: "review-option",
+      incorrect: "incorrect-option",
+      corrected: "corrected-option",
+    }[q.status] || "";
+  return option;
+};
+
 Dashboard.populateQuestions = function (preserveSelection = false) {
-  const statusFilter = document.getElementById("statusDropdown").value;
-  const categoryFilter = document.getElementById("categoryDropdown").value;
-  const searchQuery = document
-    .getElementById("searchInput")
-    .value.toLowerCase();
-  const requiresImageFilter = document.getElementById(
-    "requiresImageDropdown"
-  ).value;
   const questionDropdown = document.getElementById("questionDropdown");
 
   // Get filePathFilter and store it in localStorage
@@ -88,43 +217,16 @@ Dashboard.populateQuestions = function (preserveSelection = false) {
 
   questionDropdown.innerHTML = "";
 
-  // Apply filters entirely client-side
-  const filtered = Dashboard.questionsData.filter((q) => {
-    const matchesStatus = statusFilter === "all" || q.status === statusFilter;
-    const matchesCategory =
-      categoryFilter === "all" || q.category === categoryFilter;
-    const matchesFilePath =
-      filePathFilter === "all" ||
-      q.representative_file_path === filePathFilter ||
-      q.file_path === filePathFilter;
-
-    // Enhanced search logic
-    const searchQueryNum = parseInt(searchQuery);
-    const matchesSearch =
-      searchQuery === "" ||
-      q.enhanced_text.toLowerCase().includes(searchQuery) ||
-      (q.original_question_text &&
-        q.original_question_text.toLowerCase().includes(searchQuery)) ||
-      (q.duplicate_question_texts &&
-        q.duplicate_question_texts
-          .split("||")
-          .some((text) => text.toLowerCase().includes(searchQuery))) ||
-      (searchQueryNum && q.id === searchQueryNum);
-
-    const matchesImageRequirement =
-      requiresImageFilter === "all" ||
-      (requiresImageFilter === "yes" && q.requires_image) ||
-      (requiresImageFilter === "no" && !q.requires_image);
-    return (
-      matchesStatus &&
-      matchesCategory &&
-      matchesSearch &&
-      matchesImageRequirement &&
-      matchesFilePath
-    );
-  });
+  const filtered = Dashboard.questionsData.filter(
+    Dashboard.matchesLoadedFilters
+  );
 
   if (filtered.length === 0) {
+    if (Dashboard.questionsCursor) {
+      // Every loaded row was edited out of the filter; fetch the next ones
+      Dashboard.fetchQuestions({ withFacets: false });
+      return;
+    }
     questionDropdown.innerHTML =
       "<option value='none'>No questions match filters</option>";
     document.getElementById("output").innerHTML =
@@ -132,42 +234,9 @@ Dashboard.populateQuestions = function (preserveSelection = false) {
     return;
   }
 
-  filtered.forEach((q) => {
-    const option = document.createElement("option");
-    option.value = q.id;
-    const matchStatus =
-      q.models_count > 0
-        ? q.matching_models / q.models_count === 1
-          ? "✅ "
-          : q.matching_models / q.models_count >= 0.5
-          ? "🟡 "
-          : "❌ "
-        : "⚪ ";
-    const positionDisplay =
-      filePathFilter && filePathFilter !== "all" && q.array_order != null
-        ? `${q.array_order}: `
-        : `#${q.id}: `;
-    const fileInfo =
-      q.representative_file_path &&
-      (!filePathFilter || filePathFilter === "all")
-        ? ` [${q.representative_file_path.split("/").pop()}]`
-        : "";
-    const maxTextLength = 100;
-    const truncatedText =
-      q.enhanced_text.length > maxTextLength
-        ? q.enhanced_text.substr(0, maxTextLength) + "..."
-        : q.enhanced_text;
-    option.textContent = `${matchStatus}${positionDisplay}${truncatedText}${fileInfo}`;
-    option.className =
-      {
-        verified: "verified-option",
-        likely_correct: "likely-option",
-        needs_review: "review-option",
-        incorrect: "incorrect-option",
-        corrected: "corrected-option",
-      }[q.status] || "";
-    questionDropdown.appendChild(option);
-  });
+  filtered.forEach((q) =>
+    questionDropdown.appendChild(Dashboard.questionOption(q, filePathFilter))
+  );
   // Restore selection or default to first item
   if (preserveSelection && currentSelectedId) {
     const selectedIndex = [...questionDropdown.options].findIndex(
@@ -469,13 +538,11 @@ Dashboard.handleDirectChoiceUpdate = async function (
   questionId,
   selectedIndex
 ) {
-  // Get current question data
+  // Get current question data; it is posted straight back, so skip the server cache
   const filePath = localStorage.getItem("lastFilePathFilter");
-  const response = await fetch(
-    `/api/question/${questionId}${
-      filePath ? `?file_path=${encodeURIComponent(filePath)}` : ""
-    }`
-  );
+  const params = new URLSearchParams({ fresh: "1" });
+  if (filePath) params.set("file_path", filePath);
+  const response = await fetch(`/api/question/${questionId}?${params}`);
   const q = await response.json();
 
   // Prepare question data with new correct choice
@@ -498,6 +565,9 @@ Dashboard.handleDirectChoiceUpdate = async function (
   });
 
   if (updateResponse.ok) {
+    const updateResult = await updateResponse.json();
+    if (updateResult.explanation_job)
+      Dashboard.pollExplanationJob(updateResult.explanation_job, questionId);
     // Update the cache to reflect the new choice
     const filePathFilter = document.getElementById("filePathDropdown").value;
     const cacheKey = `${questionId}-${filePathFilter}`;
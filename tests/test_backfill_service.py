@@ -0,0 +1,175 @@
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from services import backfill_service
+from services.backfill_service import RateLimiter, backfill_explanations, call_with_backoff
+
+
+class Crash(BaseException):
+    """Stands in for the process dying; BaseException so nothing in the job swallows it."""
+
+
+class FakeStore:
+    """In-memory stand-in for enhanced_questions and backfill_checkpoints."""
+
+    def __init__(self, count):
+        self.questions = {
+            qid: {'text': f"Question {qid}", 'choices': ['a', 'b'], 'flags': [False, True], 'explanation': None}
+            for qid in range(1, count + 1)
+        }
+        self.checkpoint = None
+        self.writes = 0
+        self.crash_on_write = None
+
+    @contextmanager
+    def begin(self):
+        yield self
+
+    connect = begin
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = FakeStore(10)
+
+    def load_checkpoint(conn, restart):
+        if restart or conn.checkpoint is None:
+            conn.checkpoint = {'last_id': 0, 'processed': 0, 'written': 0, 'failed': 0}
+        return conn.checkpoint['last_id']
+
+    def fetch_chunk(conn, after_id, chunk_size):
+        ids = sorted(qid for qid, q in conn.questions.items() if qid > after_id and not q['explanation'])
+        return [SimpleNamespace(id=qid, enhanced_text=conn.questions[qid]['text'],
+                                choices=conn.questions[qid]['choices'], flags=conn.questions[qid]['flags'])
+                for qid in ids[:chunk_size]]
+
+    def write_chunk(conn, explanations, last_id, processed, failed):
+        conn.writes += 1
+        if conn.crash_on_write == conn.writes:
+            raise Crash()
+        written = 0
+        for item in explanations:
+            if not conn.questions[item['id']]['explanation']:
+                conn.questions[item['id']]['explanation'] = item['explanation']
+                written += 1
+        conn.checkpoint = {
+            'last_id': last_id,
+            'processed': conn.checkpoint['processed'] + processed,
+            'written': conn.checkpoint['written'] + written,
+            'failed': conn.checkpoint['failed'] + failed
+        }
+        return written
+
+    def get_or_generate(engine, template, question_text, choices, correct_index, generate=None):
+        return generate(f"{question_text} -> {choices[correct_index]}")
+
+    monkeypatch.setattr(backfill_service, '_load_checkpoint', load_checkpoint)
+    monkeypatch.setattr(backfill_service, '_fetch_chunk', fetch_chunk)
+    monkeypatch.setattr(backfill_service, '_write_chunk', write_chunk)
+    monkeypatch.setattr(backfill_service, 'get_or_generate_explanation', get_or_generate)
+    monkeypatch.setattr(backfill_service.time, 'sleep', lambda seconds: None)
+    return store
+
+
+class FakeModel:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.prompts = []
+        self.lock = threading.Lock()
+
+    def __call__(self, prompt):
+        with self.lock:
+            self.prompts.append(prompt)
+        question_id = int(prompt.split()[1])
+        if question_id in self.failing:
+            raise RuntimeError('429 Resource exhausted')
+        return f"explained {question_id}"
+
+
+def test_backfill_resumes_after_crash_without_redoing_committed_chunks(store):
+    store.crash_on_write = 2
+    first = FakeModel()
+    with pytest.raises(Crash):
+        backfill_explanations(store, chunk_size=4, concurrency=2, rate=0, generate=first)
+    assert store.checkpoint['last_id'] == 4
+    assert [qid for qid, q in store.questions.items() if q['explanation']] == [1, 2, 3, 4]
+
+    store.crash_on_write = None
+    second = FakeModel()
+    stats = backfill_explanations(store, chunk_size=4, concurrency=2, rate=0, generate=second)
+
+    assert sorted(int(prompt.split()[1]) for prompt in second.prompts) == [5, 6, 7, 8, 9, 10]
+    assert stats['written'] == 6 and stats['failed'] == 0
+    assert stats['last_id'] == 10
+    assert all(q['explanation'] == f"explained {qid}" for qid, q in store.questions.items())
+
+
+def test_failed_questions_hold_back_the_checkpoint_and_are_retried_on_resume(store):
+    stats = backfill_explanations(store, chunk_size=4, concurrency=2, rate=0, max_retries=1,
+                                  generate=FakeModel(failing={3}))
+    assert stats['failed'] == 1 and stats['written'] == 9
+    # The run continues past the failure, but the saved position stays just before it
+    assert store.checkpoint['last_id'] == 2
+
+    retry = FakeModel()
+    stats = backfill_explanations(store, chunk_size=4, concurrency=2, rate=0, generate=retry)
+    assert [int(prompt.split()[1]) for prompt in retry.prompts] == [3]
+    # Questions after it were already written, so nothing past it is selected
+    assert stats['written'] == 1 and stats['last_id'] == 3
+    assert store.questions[3]['explanation'] == 'explained 3'
+
+
+def test_retries_go_through_the_rate_limiter(store, monkeypatch):
+    waits = []
+    monkeypatch.setattr(RateLimiter, 'wait', lambda self: waits.append(1))
+    backfill_explanations(store, chunk_size=10, concurrency=1, rate=5, max_retries=2, limit=1,
+                          generate=FakeModel(failing={1}))
+    # One initial attempt plus two retries, each rate limited
+    assert len(waits) == 3
+
+
+def test_call_with_backoff_retries_then_raises():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise RuntimeError('temporary')
+        return 'ok'
+
+    assert call_with_backoff(flaky, max_retries=3, base_delay=0.001) == 'ok'
+    assert len(calls) == 3
+
+    calls.clear()
+
+    def always_failing():
+        calls.append(1)
+        raise RuntimeError('still failing')
+
+    with pytest.raises(RuntimeError):
+        call_with_backoff(always_failing, max_retries=2, base_delay=0.001)
+    assert len(calls) == 3
+
+
+def test_rate_limiter_spaces_calls_across_threads():
+    limiter = RateLimiter(50)
+    started = time.monotonic()
+    threads = [threading.Thread(target=limiter.wait) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Six slots at 50/s: the first is immediate, the last starts 5 intervals later
+    assert time.monotonic() - started >= 5 / 50 - 0.01
+
+
+def test_rate_limiter_without_rate_does_not_wait():
+    started = time.monotonic()
+    limiter = RateLimiter(0)
+    for _ in range(100):
+        limiter.wait()
+    assert time.monotonic() - started < 0.05
@@ -0,0 +1,160 @@
+import pytest
+
+from services import cache_service
+from services.cache_service import CacheNamespace, RedisCacheBackend, SQLiteCacheBackend
+
+
+def by_question(key):
+    return key.split(':', 1)[0]
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path, monkeypatch):
+    backend = SQLiteCacheBackend(str(tmp_path / 'cache.sqlite3'))
+    monkeypatch.setattr(cache_service, 'get_shared_backend', lambda: backend)
+    return backend
+
+
+@pytest.fixture
+def redis_backend(monkeypatch):
+    fakeredis = pytest.importorskip('fakeredis')
+    backend = RedisCacheBackend(None, client=fakeredis.FakeRedis())
+    monkeypatch.setattr(cache_service, 'get_shared_backend', lambda: backend)
+    return backend
+
+
+def test_local_namespace_counts_hits_misses_and_evictions(monkeypatch):
+    monkeypatch.setattr(cache_service, 'get_shared_backend', lambda: None)
+    namespace = CacheNamespace('local', maxsize=2, ttl=60)
+    namespace.set_many({'a': 1, 'b': 2})
+    assert namespace.get_many(['a', 'b', 'c']) == {'a': 1, 'b': 2}
+    namespace.set('c', 3)
+
+    stats = namespace.get_stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (2, 1, 1)
+    assert stats['size'] == 2 and stats['shared'] is False
+    assert stats['hit_rate'] == round(2 / 3, 4)
+
+
+def test_delete_groups_drops_every_key_of_the_group_locally(monkeypatch):
+    monkeypatch.setattr(cache_service, 'get_shared_backend', lambda: None)
+    namespace = CacheNamespace('grouped', maxsize=10, ttl=60, group_of=by_question)
+    namespace.set_many({'1:': 'a', '1:file.pdf': 'b', '2:': 'c', '12:': 'd'})
+    namespace.delete_groups([1])
+    assert namespace.get_many(['1:', '1:file.pdf', '2:', '12:']) == {'2:': 'c', '12:': 'd'}
+    assert namespace.get_stats()['invalidations'] == 2
+
+
+@pytest.mark.parametrize('backend', ['sqlite_backend', 'redis_backend'])
+def test_shared_tier_promotes_entries_written_by_another_worker(backend, request):
+    request.getfixturevalue(backend)
+    writer = CacheNamespace('details', maxsize=10, ttl=60, group_of=by_question)
+    reader = CacheNamespace('details', maxsize=10, ttl=60, group_of=by_question)
+    writer.set_many({'1:': {'id': 1}, 'k': [1, 2]})
+
+    assert reader.get_many(['1:', 'k', 'missing']) == {'1:': {'id': 1}, 'k': [1, 2]}
+    # The second lookup is served from the reader's own local tier
+    assert reader.get('1:') == {'id': 1}
+    stats = reader.get_stats()
+    assert (stats['hits'], stats['shared_hits'], stats['misses']) == (1, 2, 1)
+
+
+@pytest.mark.parametrize('backend', ['sqlite_backend', 'redis_backend'])
+def test_group_invalidation_reaches_the_shared_tier(backend, request):
+    request.getfixturevalue(backend)
+    writer = CacheNamespace('details', maxsize=10, ttl=60, group_of=by_question)
+    reader = CacheNamespace('details', maxsize=10, ttl=60, group_of=by_question)
+    writer.set_many({'1:': 'a', '1:file.pdf': 'b', '2:': 'c', '3:': 'd'})
+
+    writer.delete_groups([1, 3])
+    assert reader.get_many(['1:', '1:file.pdf', '2:', '3:']) == {'2:': 'c'}
+
+    writer.clear()
+    assert CacheNamespace('details', maxsize=10, ttl=60, group_of=by_question).get('2:') is None
+
+
+@pytest.mark.parametrize('backend', ['sqlite_backend', 'redis_backend'])
+def test_single_key_delete_reaches_the_shared_tier(backend, request):
+    request.getfixturevalue(backend)
+    writer = CacheNamespace('details', maxsize=10, ttl=60, group_of=by_question)
+    writer.set_many({'1:': 'a', '1:file.pdf': 'b'})
+    writer.delete('1:')
+    assert CacheNamespace('details', maxsize=10, ttl=60, group_of=by_question).get_many(
+        ['1:', '1:file.pdf']) == {'1:file.pdf': 'b'}
+
+
+def test_namespaces_do_not_share_entries(sqlite_backend):
+    CacheNamespace('one', maxsize=10, ttl=60).set('k', 1)
+    assert CacheNamespace('two', maxsize=10, ttl=60).get('k') is None
+
+
+def test_expired_shared_entries_are_not_returned(sqlite_backend, monkeypatch):
+    sqlite_backend.set_many('scope', {(None, 'k'): '1'}, ttl=10)
+    now = cache_service.time.time()
+    monkeypatch.setattr(cache_service.time, 'time', lambda: now + 11)
+    assert sqlite_backend.get_many('scope', [(None, 'k')]) == {}
+
+
+def test_shared_tier_outage_falls_back_to_local(monkeypatch):
+    class BrokenBackend:
+        def __getattr__(self, name):
+            def fail(*args):
+                raise ConnectionError('down')
+            return fail
+
+    monkeypatch.setattr(cache_service, 'get_shared_backend', lambda: BrokenBackend())
+    namespace = CacheNamespace('broken', maxsize=10, ttl=60)
+    namespace.set('k', 'a')
+    assert namespace.get('k') == 'a'
+    assert namespace.get('other') is None
+    assert namespace.get_stats()['shared_errors'] == 2
+
+
+def test_grouped_entries_are_not_served_while_generations_are_unavailable(monkeypatch):
+    class BrokenBackend:
+        def __getattr__(self, name):
+            def fail(*args):
+                raise ConnectionError('down')
+            return fail
+
+    monkeypatch.setattr(cache_service, 'get_shared_backend', lambda: BrokenBackend())
+    namespace = CacheNamespace('broken', maxsize=10, ttl=60, group_of=by_question)
+    namespace.set('1:', 'a')
+    # Another worker may have invalidated the group, so the caller goes to the database
+    assert namespace.get('1:') is None
+
+
+@pytest.mark.parametrize('backend', ['sqlite_backend', 'redis_backend'])
+def test_invalidation_retires_copies_other_workers_hold_locally(backend, request):
+    request.getfixturevalue(backend)
+    writer = CacheNamespace('details', maxsize=10, ttl=60, group_of=by_question)
+    reader = CacheNamespace('details', maxsize=10, ttl=60, group_of=by_question)
+    writer.set_many({'5:': 'old', '6:': 'other'})
+    assert reader.get_many(['5:', '6:']) == {'5:': 'old', '6:': 'other'}
+    assert reader.get_stats()['size'] == 2
+
+    writer.delete_groups([5])
+    assert reader.get_many(['5:', '6:']) == {'6:': 'other'}
+    assert reader.get_stats()['stale'] == 1
+
+    writer.clear()
+    assert reader.get('6:') is None
+
+
+@pytest.mark.parametrize('backend', [None, 'sqlite_backend', 'redis_backend'])
+def test_a_load_that_races_an_invalidation_is_not_served(backend, request, monkeypatch):
+    if backend:
+        request.getfixturevalue(backend)
+    else:
+        monkeypatch.setattr(cache_service, 'get_shared_backend', lambda: None)
+    namespace = CacheNamespace('details', maxsize=10, ttl=60, group_of=by_question)
+    found, tokens = namespace.get_many_versioned(['5:'])
+    assert found == {}
+    # The document is read from the database, then an edit commits and invalidates
+    namespace.delete_groups([5])
+    namespace.set_many({'5:': 'old'}, tokens)
+    assert namespace.get('5:') is None
+
+    found, tokens = namespace.get_many_versioned(['5:'])
+    namespace.set_many({'5:': 'new'}, tokens)
+    assert namespace.get('5:') == 'new'
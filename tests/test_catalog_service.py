@@ -0,0 +1,79 @@
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from services import catalog_service
+from services.catalog_service import ensure_image_source_aliases
+
+
+class FakeEngine:
+    def __init__(self):
+        self.versions = {'file_catalog': 1, 'image_sources': 1}
+        self.version_reads = 0
+
+    @contextmanager
+    def connect(self):
+        yield self
+
+    def execute(self, query):
+        self.version_reads += 1
+        return [SimpleNamespace(name=name, version=version) for name, version in self.versions.items()]
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(catalog_service, '_aliases', {'versions': None, 'checked_at': None, 'refreshing': False})
+    monkeypatch.setattr(catalog_service.Config, 'IMAGE_ALIAS_CHECK_INTERVAL', 30)
+    engine = FakeEngine()
+    engine.rebuilds = []
+    engine.rebuilt = threading.Event()
+
+    def refresh(engine_):
+        engine.rebuilds.append(dict(engine.versions))
+        engine.rebuilt.set()
+        return 0
+
+    monkeypatch.setattr(catalog_service, 'refresh_image_source_aliases', refresh)
+    return engine
+
+
+def wait_for_rebuild(engine):
+    assert engine.rebuilt.wait(5)
+    engine.rebuilt.clear()
+    # The worker clears the flag just after the rebuild returns
+    while catalog_service._aliases['refreshing']:
+        time.sleep(0.001)
+
+
+def test_versions_are_read_at_most_once_per_interval(engine, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(catalog_service.time, 'monotonic', lambda: clock[0])
+
+    ensure_image_source_aliases(engine)
+    wait_for_rebuild(engine)
+    for _ in range(5):
+        ensure_image_source_aliases(engine)
+    assert engine.version_reads == 1
+
+    clock[0] += 31
+    ensure_image_source_aliases(engine)
+    assert engine.version_reads == 2
+    # Nothing was imported, so no second rebuild
+    assert len(engine.rebuilds) == 1
+
+
+def test_an_import_triggers_one_background_rebuild(engine, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(catalog_service.time, 'monotonic', lambda: clock[0])
+    ensure_image_source_aliases(engine)
+    wait_for_rebuild(engine)
+
+    engine.versions['image_sources'] = 2
+    clock[0] += 31
+    ensure_image_source_aliases(engine)
+    wait_for_rebuild(engine)
+    assert engine.rebuilds[-1] == {'file_catalog': 1, 'image_sources': 2}
+    assert catalog_service._aliases['versions'] == {'file_catalog': 1, 'image_sources': 2}
@@ -0,0 +1,92 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from services import explanation_service
+from services.explanation_service import get_explanation_job, recover_explanation_jobs
+
+
+class FakeJobsConn:
+    """Answers the job queries from canned rows and records the updates it is sent."""
+
+    def __init__(self, claimed, inputs, job=None):
+        self.claimed = claimed
+        self.inputs = inputs
+        self.job = job
+        self.superseded = []
+        self.claims = []
+
+    def execute(self, query, params=None):
+        sql = str(query)
+        if 'FOR UPDATE SKIP LOCKED' in sql:
+            self.claims.append(params)
+            claimed, self.claimed = self.claimed, []
+            if self.job and claimed:
+                self.job['status'], self.job['stale'] = claimed[0].status, False
+            return SimpleNamespace(fetchall=lambda: claimed)
+        if 'json_agg' in sql:
+            return [row for row in self.inputs if row.id in params['question_ids']]
+        if "status = 'superseded'" in sql:
+            self.superseded += params['job_ids']
+            return None
+        if 'FROM explanation_jobs' in sql:
+            return SimpleNamespace(fetchone=lambda: SimpleNamespace(**self.job))
+        raise AssertionError(f"Unexpected query: {sql}")
+
+    @contextmanager
+    def begin(self):
+        yield self
+
+    connect = begin
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    submitted = []
+    monkeypatch.setattr(explanation_service, 'submit_explanation_job',
+                        lambda engine, job_id, question_id, question_text, choices, correct_index, on_written=None:
+                        submitted.append((job_id, question_id, question_text, choices, correct_index)))
+    return submitted
+
+
+def job_row(job_id, question_id, status='pending'):
+    return SimpleNamespace(id=job_id, question_id=question_id, status=status)
+
+
+def test_stale_jobs_are_requeued_from_the_current_question(submitted):
+    conn = FakeJobsConn(
+        claimed=[job_row('a', 1), job_row('b', 2), job_row('c', 3, status='failed')],
+        inputs=[
+            SimpleNamespace(id=1, enhanced_text='Q1', choices=['x', 'y'], flags=[False, True]),
+            # Question 2 has no correct choice any more, so its job has nothing to do
+            SimpleNamespace(id=2, enhanced_text='Q2', choices=['x', 'y'], flags=[False, False]),
+        ]
+    )
+    stats = recover_explanation_jobs(conn)
+
+    assert stats == {'requeued': 1, 'failed': 1, 'superseded': 1}
+    assert submitted == [('a', 1, 'Q1', ['x', 'y'], 1)]
+    assert conn.superseded == ['b']
+
+
+def test_recovery_with_nothing_stale_submits_nothing(submitted):
+    assert recover_explanation_jobs(FakeJobsConn(claimed=[], inputs=[])) == \
+        {'requeued': 0, 'failed': 0, 'superseded': 0}
+    assert submitted == []
+
+
+def test_polling_a_stale_job_requeues_it(submitted):
+    job = dict(id='a', question_id=1, status='running', explanation=None, error=None, stale=True,
+               created_at=SimpleNamespace(isoformat=lambda: 'created'),
+               updated_at=SimpleNamespace(isoformat=lambda: 'updated'))
+    conn = FakeJobsConn(
+        claimed=[job_row('a', 1)],
+        inputs=[SimpleNamespace(id=1, enhanced_text='Q1', choices=['x', 'y'], flags=[True, False])],
+        job=job
+    )
+    result = get_explanation_job(conn, 'a')
+
+    assert result['status'] == 'pending'
+    assert conn.claims[0]['job_ids'] == ['a']
+    assert submitted == [('a', 1, 'Q1', ['x', 'y'], 0)]
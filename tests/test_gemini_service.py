@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from services import gemini_service
+from services.gemini_service import generate_text
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Fake _call_model that holds every call until `release` is set."""
+    monkeypatch.setattr(gemini_service, 'in_flight', {})
+    monkeypatch.setattr(gemini_service, 'gemini_stats', {'calls': 0, 'coalesced': 0})
+    model = {'prompts': [], 'release': threading.Event(), 'error': None}
+
+    def call_model(prompt):
+        model['prompts'].append(prompt)
+        model['release'].wait(5)
+        if model['error']:
+            raise model['error']
+        return f"explained: {prompt}"
+
+    monkeypatch.setattr(gemini_service, '_call_model', call_model)
+    return model
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def run_concurrently(prompt, callers):
+    results = []
+
+    def call():
+        try:
+            results.append(generate_text(prompt))
+        except Exception as e:
+            results.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    # The first caller leads; the rest start once its call is in flight
+    threads[0].start()
+    wait_for(lambda: gemini_service.in_flight)
+    for thread in threads[1:]:
+        thread.start()
+    wait_for(lambda: gemini_service.gemini_stats['coalesced'] == callers - 1)
+    return threads, results
+
+
+def test_concurrent_identical_prompts_share_one_call(model):
+    threads, results = run_concurrently('prompt', 4)
+    model['release'].set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ['explained: prompt'] * 4
+    assert model['prompts'] == ['prompt']
+    assert gemini_service.get_gemini_stats() == {'calls': 1, 'coalesced': 3, 'in_flight': 0}
+
+
+def test_after_a_failure_the_next_caller_starts_a_fresh_call(model):
+    model['error'] = RuntimeError('quota exceeded')
+    threads, results = run_concurrently('prompt', 3)
+    model['release'].set()
+    for thread in threads:
+        thread.join(5)
+
+    # Waiters see the leader's failure rather than retrying behind it
+    assert len(results) == 3 and all(isinstance(result, RuntimeError) for result in results)
+    assert not gemini_service.in_flight
+
+    model['error'] = None
+    assert generate_text('prompt') == 'explained: prompt'
+    assert model['prompts'] == ['prompt', 'prompt']
+    assert gemini_service.get_gemini_stats() == {'calls': 2, 'coalesced': 2, 'in_flight': 0}
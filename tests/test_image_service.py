@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from services import image_service
+from services.image_service import create_image_upload
+
+SHA256 = 'ab' * 32
+
+
+@pytest.fixture
+def known_image(monkeypatch):
+    monkeypatch.setattr(image_service, 'find_image_by_hash', lambda engine, sha256: 'https://cdn/existing.png')
+    attached = []
+
+    def set_question_image(engine, question_id, image_url):
+        attached.append((question_id, image_url))
+        return 1 if question_id == 1 else 0
+
+    monkeypatch.setattr(image_service, '_set_question_image', set_question_image)
+    return attached
+
+
+def test_known_image_is_attached_without_an_upload(known_image):
+    result = create_image_upload(None, 1, {'content_type': 'image/png', 'sha256': SHA256})
+    assert result == {'image_url': 'https://cdn/existing.png', 'deduplicated': True}
+    assert known_image == [(1, 'https://cdn/existing.png')]
+
+
+def test_known_image_for_a_missing_question_is_an_error(known_image):
+    result = create_image_upload(None, 99, {'content_type': 'image/png', 'sha256': SHA256})
+    assert result == {'error': 'Question not found'}
+
+
+@pytest.mark.parametrize('image_count, cache', [(0, 'image_miss_cache'), (2, 'image_cache')])
+def test_empty_manifest_is_only_cached_briefly(image_count, cache, monkeypatch):
+    monkeypatch.setattr(image_service, 'ensure_image_source_aliases', lambda engine: None)
+    pages = [{'page_number': 1, 'image_count': image_count, 'images': []}] if image_count else []
+    row = SimpleNamespace(source_file='a.pdf' if image_count else None, image_count=image_count, pages=pages)
+
+    class FakeEngine:
+        @contextmanager
+        def connect(self):
+            yield SimpleNamespace(execute=lambda query, params: SimpleNamespace(fetchone=lambda: row))
+
+    file_path = f'jsons/manifest-{image_count}.json'
+    result = image_service.get_file_manifest(FakeEngine(), file_path)
+    assert result['manifest']['image_count'] == image_count
+    assert getattr(image_service, cache).get(f'manifest_{file_path}') == result
+    other = 'image_cache' if cache == 'image_miss_cache' else 'image_miss_cache'
+    assert getattr(image_service, other).get(f'manifest_{file_path}') is None
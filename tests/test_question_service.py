@@ -0,0 +1,230 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from services import cache_service, question_service
+from services.question_service import (
+    NULL_ARRAY_ORDER, _build_questions_query, _decode_cursor, _diff_choices, _encode_cursor,
+    _validate_bulk_update, bulk_update_question_status, get_question_details, get_questions,
+    recompute_consensus
+)
+
+
+@pytest.mark.parametrize('item, error', [
+    ({'id': 1, 'enhanced_text': 42}, 'enhanced_text must be a string'),
+    ({'id': 1, 'category': ['a']}, 'category must be a string'),
+    ({'id': 1, 'explanation': {'text': 'x'}}, 'explanation must be a string'),
+    ({'id': 1, 'category': ''}, 'category must not be empty'),
+    ({'id': 1, 'choices': [{'text': 3}]}, 'All choices must have non-empty text'),
+    ({'id': 1, 'requires_image': 'yes'}, 'requires_image must be a boolean'),
+    ({'id': True, 'category': 'x'}, 'Missing or invalid id'),
+])
+def test_bulk_update_rejects_wrongly_typed_fields(item, error):
+    assert _validate_bulk_update(item) == error
+
+
+def test_bulk_update_accepts_string_fields():
+    assert _validate_bulk_update({
+        'id': 1, 'enhanced_text': 'Text', 'category': 'Cardiology', 'explanation': '',
+        'choices': [{'text': 'A', 'is_correct': True}]
+    }) is None
+
+
+@pytest.mark.parametrize('filters', [['status'], 'pending', 3, {'category': ['a', 'b']}])
+def test_bulk_status_update_rejects_malformed_filters(filters):
+    # Validation fails before the engine is touched
+    result = bulk_update_question_status(None, 'needs_review', filters=filters)
+    assert result['error'].startswith('Invalid filter')
+
+
+@pytest.mark.parametrize('thresholds', [[0.9], 'strict', 0.5, {'verified': 'high'}, {'unknown': 0.5}])
+def test_recompute_consensus_rejects_malformed_thresholds(thresholds):
+    result = recompute_consensus(None, thresholds)
+    assert result['error'].startswith('Invalid thresholds')
+
+
+def test_cursor_round_trips():
+    assert _decode_cursor(_encode_cursor([3, 17]), 2) == [3, 17]
+
+
+@pytest.mark.parametrize('cursor, size', [
+    ('not base64!', 1),
+    (_encode_cursor([1, 2]), 1),
+    (_encode_cursor({'id': 1}), 1),
+    (_encode_cursor(['1']), 1),
+    (_encode_cursor([True]), 1),
+    (_encode_cursor([None, 2]), 2),
+])
+def test_malformed_cursors_are_rejected(cursor, size):
+    assert _decode_cursor(cursor, size) is None
+
+
+def test_query_builder_adds_filters_and_keyset_condition():
+    query, params = _build_questions_query(
+        'jsons/a.json',
+        {'status': 'verified', 'category': 'all', 'requires_image': 'yes', 'search': '50%'},
+        [4, 10], 25
+    )
+    sql = str(query)
+    assert 'eq.status = :status' in sql and ':category' not in sql
+    assert 'COALESCE(eq.requires_image, FALSE) = :requires_image' in sql
+    assert f'(COALESCE(q_direct.array_order, d.array_order, {NULL_ARRAY_ORDER}), eq.id) > (:cursor_0, :cursor_1)' in sql
+    assert sql.rstrip().endswith('LIMIT :limit')
+    assert params == {
+        'file_path': 'jsons/a.json', 'status': 'verified', 'requires_image': True,
+        'search': '%50\\%%', 'cursor_0': 4, 'cursor_1': 10, 'limit': 26
+    }
+
+
+def test_query_builder_matches_numeric_search_against_ids():
+    query, params = _build_questions_query(None, {'search': '42'}, None, None)
+    assert 'eq.id = :search_id' in str(query) and 'LIMIT' not in str(query)
+    assert params['search_id'] == 42
+
+
+def test_next_cursor_for_a_row_without_array_order_is_accepted(monkeypatch):
+    rows = [{'id': 7, 'array_order': 5}, {'id': 8, 'array_order': None}, {'id': 9, 'array_order': None}]
+
+    class FakeConn:
+        def execute(self, query, params):
+            return [SimpleNamespace(_mapping=row) for row in rows]
+
+    class FakeEngine:
+        @contextmanager
+        def connect(self):
+            yield FakeConn()
+
+    monkeypatch.setattr(question_service, '_attach_available_files', lambda result, conn, etag=None: result)
+    result = get_questions(FakeEngine(), 'jsons/a.json', page_size=2)
+    assert _decode_cursor(result['next_cursor'], 2) == [NULL_ARRAY_ORDER, 8]
+
+
+def test_first_page_carries_the_files_facets_when_asked(monkeypatch):
+    executed = []
+
+    class FakeConn:
+        def execute(self, query, params):
+            executed.append(params)
+            if 'statuses' in str(query):
+                return SimpleNamespace(fetchone=lambda: SimpleNamespace(
+                    statuses=['needs_review', 'verified'], categories=['Cardiology']))
+            return [SimpleNamespace(_mapping={'id': 7, 'array_order': 1})]
+
+    class FakeEngine:
+        @contextmanager
+        def connect(self):
+            yield FakeConn()
+
+    monkeypatch.setattr(question_service, '_attach_available_files', lambda result, conn, etag=None: result)
+    result = get_questions(FakeEngine(), 'jsons/a.json', {'status': 'verified'}, page_size=10, include_facets=True)
+    assert result['facets'] == {'statuses': ['needs_review', 'verified'], 'categories': ['Cardiology']}
+    # Facets ignore the list filters, so the dropdowns keep offering every value
+    assert executed[-1] == {'file_path': 'jsons/a.json'}
+
+    later = get_questions(FakeEngine(), 'jsons/a.json', cursor=_encode_cursor([1, 7]), include_facets=True)
+    assert 'facets' not in later
+
+
+class CountingEngine:
+    def __init__(self):
+        self.connections = 0
+
+    @contextmanager
+    def connect(self):
+        self.connections += 1
+        yield None
+
+
+@pytest.fixture
+def details_store(monkeypatch):
+    monkeypatch.setattr(cache_service, 'get_shared_backend', lambda: None)
+    question_service.clear_question_details_cache()
+    store = {'documents': {7: {'id': 7, 'enhanced_text': 'old'}}, 'during_fetch': None}
+
+    def fetch(conn, question_ids, file_path_filter=None):
+        documents = {qid: dict(store['documents'][qid]) for qid in question_ids if qid in store['documents']}
+        if store['during_fetch']:
+            store['during_fetch']()
+            store['during_fetch'] = None
+        return documents
+
+    monkeypatch.setattr(question_service, '_fetch_question_details', fetch)
+    yield store
+    question_service.clear_question_details_cache()
+
+
+def test_details_loaded_before_a_concurrent_edit_are_not_cached(details_store):
+    engine = CountingEngine()
+
+    def concurrent_edit():
+        # update_question commits and invalidates while this read is in flight
+        details_store['documents'][7] = {'id': 7, 'enhanced_text': 'new'}
+        question_service.invalidate_question_details(7)
+
+    details_store['during_fetch'] = concurrent_edit
+    assert get_question_details(engine, 7)['enhanced_text'] == 'old'
+    assert get_question_details(engine, 7)['enhanced_text'] == 'new'
+    assert get_question_details(engine, 7)['enhanced_text'] == 'new'
+    assert engine.connections == 2
+
+
+def test_uncached_details_read_goes_to_the_database(details_store):
+    engine = CountingEngine()
+    get_question_details(engine, 7)
+    details_store['documents'][7] = {'id': 7, 'enhanced_text': 'edited elsewhere'}
+    assert get_question_details(engine, 7)['enhanced_text'] == 'old'
+    assert get_question_details(engine, 7, use_cache=False)['enhanced_text'] == 'edited elsewhere'
+    assert engine.connections == 2
+
+
+def test_file_scoped_search_only_matches_that_files_duplicates():
+    query, params = _build_questions_query('jsons/a.json', {'search': 'heart'}, None, None)
+    sql = str(query)
+    assert 'question_search' not in sql
+    assert 'ds.file_path = :file_path' in sql and 'eq.enhanced_text ILIKE :search' in sql
+
+    query, _ = _build_questions_query(None, {'search': 'heart'}, None, None)
+    assert 'qs.search_text ILIKE :search' in str(query)
+
+
+def stored_choices(*choices):
+    return [SimpleNamespace(id=10 + i, choice_text=text, is_correct=correct)
+            for i, (text, correct) in enumerate(choices)]
+
+
+STORED = stored_choices(('Aspirin', True), ('Heparin', False), ('Warfarin', False))
+
+
+def submitted_choices(*choices):
+    return [{'text': text, 'is_correct': correct} for text, correct in choices]
+
+
+def test_resubmitting_the_same_choices_writes_nothing():
+    choices = submitted_choices(('Aspirin', True), ('Heparin', False), ('Warfarin', False))
+    assert _diff_choices(7, STORED, choices) == ([], [], [])
+
+
+def test_a_typo_fix_updates_only_that_row():
+    choices = submitted_choices(('Aspirin', True), ('Heparin', False), ('Warfarin sodium', False))
+    assert _diff_choices(7, STORED, choices) == (
+        [{'id': 12, 'choice_text': 'Warfarin sodium', 'is_correct': False}], [], [])
+
+
+def test_moving_the_correct_flag_updates_both_rows():
+    choices = submitted_choices(('Aspirin', False), ('Heparin', True), ('Warfarin', False))
+    assert _diff_choices(7, STORED, choices) == ([
+        {'id': 10, 'choice_text': 'Aspirin', 'is_correct': False},
+        {'id': 11, 'choice_text': 'Heparin', 'is_correct': True},
+    ], [], [])
+
+
+def test_an_appended_choice_is_inserted():
+    choices = submitted_choices(('Aspirin', True), ('Heparin', False), ('Warfarin', False), ('Clopidogrel', False))
+    assert _diff_choices(7, STORED, choices) == (
+        [], [{'question_id': 7, 'choice_text': 'Clopidogrel', 'is_correct': False}], [])
+
+
+def test_a_removed_trailing_choice_is_deleted():
+    choices = submitted_choices(('Aspirin', True), ('Heparin', False))
+    assert _diff_choices(7, STORED, choices) == ([], [], [12])